@@ -0,0 +1,130 @@
+"""
+Endpoint de métricas de Prometheus (/metrics, fuera de la API versionada)
+"""
+from typing import Dict, Optional
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.circuit_breaker import CLOSED, HALF_OPEN, OPEN
+from app.core.crm_client import crm_breaker, crm_rate_limiter
+from app.core.idempotency import idempotency_store
+from app.core.metrics import LabelValues, registry
+from app.db.base import get_pool_stats
+from app.repositories.contact_repository import crm_search_cache
+from app.services.contact_service import search_flights
+from app.services.crm_sync_worker import crm_sync_worker
+from app.services.crm_webhooks import person_webhooks
+
+router = APIRouter(tags=["metrics"])
+
+# PlainTextResponse agrega "; charset=utf-8"
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def _pool_connections() -> Optional[Dict[LabelValues, float]]:
+    stats = get_pool_stats()
+    if "checked_out" not in stats:
+        return None
+    return {
+        ("checked_out",): stats["checked_out"],
+        ("checked_in",): stats["checked_in"],
+        ("overflow",): stats["overflow"],
+    }
+
+
+def _pool_utilization() -> Optional[float]:
+    stats = get_pool_stats()
+    if "checked_out" not in stats:
+        return None
+    capacity = stats["pool_size"] + stats["max_overflow"]
+    return stats["checked_out"] / capacity if capacity else 0.0
+
+
+# Pool de conexiones de BD (NullPool no expone estos valores)
+registry.callback(
+    "db_pool_connections", "Conexiones del pool por estado", _pool_connections, labelnames=("state",)
+)
+registry.callback(
+    "db_pool_utilization", "Conexiones en uso / (pool_size + max_overflow)", _pool_utilization
+)
+registry.callback(
+    "db_pool_checkouts_total", "Conexiones entregadas por el pool", lambda: get_pool_stats()["checkouts"],
+    kind="counter"
+)
+registry.callback(
+    "db_pool_connections_opened_total", "Conexiones nuevas abiertas contra la BD",
+    lambda: get_pool_stats()["connections_opened"], kind="counter"
+)
+
+# Cachés y coalescencia de búsquedas
+registry.callback(
+    "crm_cache_lookups_total", "Consultas a la caché de búsquedas de Pipedrive por resultado",
+    lambda: {("hit",): crm_search_cache.hits, ("miss",): crm_search_cache.misses},
+    kind="counter", labelnames=("result",)
+)
+registry.callback(
+    "crm_cache_hit_ratio", "Proporción de aciertos de la caché de búsquedas de Pipedrive",
+    lambda: crm_search_cache.stats()["hit_rate"]
+)
+registry.callback(
+    "crm_cache_entries", "Búsquedas guardadas en la caché de Pipedrive", lambda: crm_search_cache.stats()["size"]
+)
+registry.callback(
+    "search_flights_total", "Búsquedas recibidas y unidas a una búsqueda idéntica en curso",
+    lambda: {("calls",): search_flights.calls, ("coalesced",): search_flights.coalesced},
+    kind="counter", labelnames=("result",)
+)
+registry.callback(
+    "idempotency_requests_total", "Peticiones con Idempotency-Key por resultado",
+    lambda: {
+        ("stored",): idempotency_store.stored,
+        ("replayed",): idempotency_store.replays,
+        ("conflict",): idempotency_store.conflicts,
+    },
+    kind="counter", labelnames=("result",)
+)
+
+# Protección de Pipedrive (circuit breaker y rate limiter)
+registry.callback(
+    "crm_circuit_state", "Estado del circuit breaker de Pipedrive (1 = estado actual)",
+    lambda: {(state,): float(crm_breaker.state == state) for state in (CLOSED, OPEN, HALF_OPEN)},
+    labelnames=("state",)
+)
+registry.callback(
+    "crm_circuit_rejected_total", "Llamadas rechazadas con el circuito abierto", lambda: crm_breaker.rejected,
+    kind="counter"
+)
+registry.callback(
+    "crm_rate_limit_tokens", "Tokens disponibles del rate limiter de Pipedrive",
+    lambda: crm_rate_limiter.stats()["tokens"]
+)
+registry.callback(
+    "crm_rate_limit_events_total", "Búsquedas descartadas (shed) y respuestas 429 (throttled)",
+    lambda: {("shed",): crm_rate_limiter.shed, ("throttled",): crm_rate_limiter.throttled},
+    kind="counter", labelnames=("event",)
+)
+
+# Sincronización en segundo plano
+registry.callback(
+    "crm_sync_operations_total", "Operaciones del outbox y notas procesadas por el worker",
+    lambda: {
+        ("outbox", "processed"): crm_sync_worker.processed,
+        ("outbox", "retried"): crm_sync_worker.retried,
+        ("outbox", "failed"): crm_sync_worker.failed,
+        ("notes", "synced"): crm_sync_worker.notes_synced,
+        ("notes", "failed"): crm_sync_worker.notes_failed,
+    },
+    kind="counter", labelnames=("queue", "result")
+)
+registry.callback(
+    "crm_webhook_events_total", "Eventos de webhooks de Pipedrive recibidos", lambda: person_webhooks.events,
+    kind="counter"
+)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Métricas de la aplicación en formato de texto de Prometheus
+    """
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
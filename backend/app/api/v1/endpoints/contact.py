@@ -1,28 +1,84 @@
 """
 Endpoints de contactos (API v1)
 """
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+import codecs
+import csv
+import json
 import logging
 from datetime import datetime
 
 from app.schemas.contact import (
     ContactCreate, ContactUpdate, ContactResponse, 
-    NoteCreate, HealthResponse
+    NoteCreate, HealthResponse, SyncStatusResponse, BulkImportResponse, ContactListResponse,
+    SearchBatchRequest, SearchBatchResponse,
+    ContactBulkUpdate, NoteBulkCreate, BulkOperationResponse
 )
-from app.services.contact_service import ContactService
+from app.services.contact_service import ContactService, search_flights
+from app.services.crm_sync_worker import crm_sync_worker
+from app.services.crm_mirror_sync import crm_mirror_sync
+from app.services.crm_webhooks import person_webhooks
 from app.core.dependencies import get_settings
 from app.db.session import get_db
-from app.core.config import Settings
+from app.db.base import get_pool_stats
+from app.db.profiler import query_profiler
+from app.repositories.contact_repository import crm_search_cache
+from app.repositories.note_repository import NoteRepository
+from app.repositories.outbox_repository import OutboxRepository
+from app.core.config import Settings, settings as app_settings
+from app.core.idempotency import (
+    IdempotencyConflict, IdempotencyInProgress, idempotency_store, request_fingerprint
+)
+from app.core.crm_client import crm_breaker, crm_rate_limiter
+from app.core.tracing import span_exporter
+from app.core.logging_config import logging_stats
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/contact", tags=["contacts"])
 
 
+async def run_idempotent(scope: str, idempotency_key: Optional[str], payload: Any, response: Response,
+                         db: AsyncSession, fn: Callable[[AsyncSession, bool], Awaitable[Any]]) -> Any:
+    """
+    Ejecuta fn(sesión, commit) respetando la cabecera Idempotency-Key
+    Una repetición devuelve la respuesta guardada (cabecera Idempotent-Replayed: true) sin repetir la operación
+    Sin clave fn usa la sesión de la petición (db) y confirma sus cambios. Con clave recibe una sesión propia
+    del almacén (la operación sigue en curso aunque el cliente se desconecte y la sesión de la petición
+    se cierre) y no confirma: el almacén confirma los cambios junto con la respuesta guardada
+    """
+    if not idempotency_key or not app_settings.IDEMPOTENCY_ENABLED:
+        return await fn(db, True)
+    if len(idempotency_key) > 255:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Idempotency-Key no puede superar 255 caracteres"
+        )
+    try:
+        result, replayed = await idempotency_store.run(
+            scope, idempotency_key, request_fingerprint(payload), lambda session: fn(session, False)
+        )
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except IdempotencyInProgress as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    if replayed:
+        logger.info("%s - respuesta repetida para Idempotency-Key %s", scope, idempotency_key)
+        response.headers["Idempotent-Replayed"] = "true"
+    else:
+        # Los cambios se confirmaron después de fn: el servicio no pudo avisar al worker
+        crm_sync_worker.notify()
+    return result
+
+
 @router.get("/health", response_model=HealthResponse)
 async def health_check(settings: Settings = Depends(get_settings)):
     """
     Verifica el estado de la API y disponibilidad del CRM
+    Solo lee estadísticas en memoria: no toma conexiones de BD, así que responde aunque el pool esté saturado
+    (los conteos del outbox y de las notas están en GET /contact/sync/status)
     
     Returns:
         HealthResponse con estado actual
@@ -31,12 +87,41 @@ async def health_check(settings: Settings = Depends(get_settings)):
     return HealthResponse(
         status="healthy",
         timestamp=datetime.utcnow().isoformat(),
-        crm_configured=settings.crm_configured
+        crm_configured=settings.crm_configured,
+        db_pool=get_pool_stats(),
+        crm_cache=crm_search_cache.stats(),
+        search_flights=search_flights.stats(),
+        crm_circuit=crm_breaker.stats() if settings.CRM_BREAKER_ENABLED else None,
+        crm_rate_limit=crm_rate_limiter.stats() if settings.CRM_RATE_LIMIT_ENABLED else None,
+        crm_mirror={**crm_mirror_sync.stats(), "webhooks": person_webhooks.stats()},
+        idempotency=idempotency_store.stats(),
+        tracing=span_exporter.stats() if settings.TRACING_ENABLED else None,
+        logging=logging_stats(),
+        db_profiler=query_profiler.stats() if settings.DB_PROFILING_ENABLED else None,
+        crm_sync={"worker": crm_sync_worker.stats()}
+    )
+
+
+@router.get("/sync/status", response_model=SyncStatusResponse)
+async def sync_status(db: AsyncSession = Depends(get_db)):
+    """
+    Diagnóstico de la sincronización con Pipedrive: outbox y notas por estado (consultas agregadas a la BD)
+    No usar como liveness/readiness probe: para eso está /health
+    
+    Returns:
+        SyncStatusResponse con los conteos del outbox, de las notas y del worker
+    """
+    logger.info("GET /contact/sync/status")
+    return SyncStatusResponse(
+        outbox=await OutboxRepository(db).stats(),
+        notes=await NoteRepository(db).stats(),
+        worker=crm_sync_worker.stats(),
+        timestamp=datetime.utcnow().isoformat()
     )
 
 
 @router.get("/search")
-async def search_contact(q: str, db: Session = Depends(get_db)):
+async def search_contact(q: str, db: AsyncSession = Depends(get_db)):
     """
     Busca un contacto por nombre, email o teléfono
     
@@ -47,18 +132,80 @@ async def search_contact(q: str, db: Session = Depends(get_db)):
     Returns:
         ContactResponse o 404 si no existe
     """
-    logger.info(f"GET /contact/search?q={q}")
+    logger.info("GET /contact/search?q=%s", q)
+    service = ContactService(db)
+    return await service.search_contact(q)
+
+
+@router.post("/search/batch", response_model=SearchBatchResponse)
+async def search_contacts_batch(request: SearchBatchRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Busca varios contactos (nombre, email o teléfono) en una sola llamada
+    
+    Args:
+        request: Lista de queries (máximo 100)
+        db: Dependencia de sesión de base de datos
+    
+    Returns:
+        SearchBatchResponse con un resultado por query
+    """
+    logger.info("POST /contact/search/batch - %s queries", len(request.queries))
     service = ContactService(db)
-    return service.search_contact(q)
+    return await service.search_contacts_batch(request.queries)
+
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+@router.get("", response_model=ContactListResponse)
+async def list_contacts(
+    cursor: int = Query(0, ge=0, description="ID del último contacto de la página anterior"),
+    limit: int = Query(100, ge=1, le=1000, description="Tamaño de página"),
+    export: Optional[str] = Query(None, pattern="^(ndjson|csv)$", description="Exportar todo: ndjson | csv"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Lista contactos con paginación por cursor, o los exporta todos en streaming
+    
+    Args:
+        cursor: ID del último contacto recibido (0 para la primera página)
+        limit: Tamaño de página
+        export: Si se indica, ignora cursor/limit y transmite todos los contactos
+        db: Dependencia de sesión de base de datos
+    
+    Returns:
+        ContactListResponse, o StreamingResponse (NDJSON/CSV) en modo exportación
+    """
+    service = ContactService(db)
+    
+    if export:
+        logger.info("GET /contact?export=%s", export)
+        return StreamingResponse(
+            service.export_contacts(export),
+            media_type=EXPORT_MEDIA_TYPES[export],
+            headers={"Content-Disposition": f"attachment; filename=contacts.{export}"}
+        )
+    
+    logger.info("GET /contact?cursor=%s&limit=%s", cursor, limit)
+    return await service.list_contacts(cursor=cursor, limit=limit)
 
 
 @router.post("", response_model=ContactResponse)
-async def create_contact(contact: ContactCreate, db: Session = Depends(get_db)):
+async def create_contact(
+    contact: ContactCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: AsyncSession = Depends(get_db)
+):
     """
     Crea un nuevo contacto en BD local y sincroniza con Pipedrive
     
     Args:
         contact: Datos del contacto (name, email, phone)
+        idempotency_key: Clave para repetir la petición sin duplicar el contacto (opcional)
         db: Dependencia de sesión de base de datos
     
     Returns:
@@ -69,18 +216,126 @@ async def create_contact(contact: ContactCreate, db: Session = Depends(get_db)):
         409: Contacto duplicado (email existe)
         502: Error comunicándose con el CRM
     """
-    logger.info(f"POST /contact - Creando contacto: {contact.name}")
+    logger.info("POST /contact - Creando contacto: %s", contact.name)
+    return await run_idempotent(
+        "POST /contact", idempotency_key, contact.model_dump(), response, db,
+        lambda session, commit: ContactService(session).create_contact(contact, commit=commit)
+    )
+
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+CSV_CONTENT_TYPES = ("text/csv", "application/csv")
+
+
+async def _iter_lines(request: Request) -> AsyncIterator[str]:
+    """
+    Lee el body del request línea por línea sin cargarlo completo en memoria
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    async for chunk in request.stream():
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer.strip():
+        yield buffer.rstrip("\r")
+
+
+async def _iter_ndjson(request: Request) -> AsyncIterator[Any]:
+    """
+    Un objeto JSON por línea; las líneas inválidas se reportan como error en el resultado
+    """
+    async for line in _iter_lines(request):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            yield line
+
+
+async def _iter_csv(request: Request) -> AsyncIterator[Any]:
+    """
+    CSV con cabecera (name,email,phone); las celdas vacías se tratan como nulas
+    No soporta campos entre comillas que contengan saltos de línea
+    """
+    header: List[str] = []
+    async for line in _iter_lines(request):
+        if not line.strip():
+            continue
+        values = next(csv.reader([line]))
+        if not header:
+            header = [column.strip().lower() for column in values]
+            continue
+        yield {
+            column: (value.strip() or None)
+            for column, value in zip(header, values)
+        }
+
+
+async def _iter_list(items: List[Any]) -> AsyncIterator[Any]:
+    for item in items:
+        yield item
+
+
+@router.post("/bulk", response_model=BulkImportResponse)
+async def bulk_create_contacts(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Importa contactos en bloque (BD local + Pipedrive)
+    
+    Formatos aceptados según Content-Type:
+        application/json: arreglo de objetos {name, email, phone}
+        application/x-ndjson: un objeto JSON por línea (se procesa en streaming)
+        text/csv: cabecera name,email,phone (se procesa en streaming)
+    
+    Args:
+        request: Request con el body a importar
+        db: Dependencia de sesión de base de datos
+    
+    Returns:
+        BulkImportResponse con el resultado de cada registro
+    
+    Raises:
+        400: Body inválido
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    logger.info("POST /contact/bulk - Importación masiva (%s)", content_type or 'sin content-type')
+    
+    if content_type in NDJSON_CONTENT_TYPES:
+        rows = _iter_ndjson(request)
+    elif content_type in CSV_CONTENT_TYPES:
+        rows = _iter_csv(request)
+    else:
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+        if not isinstance(body, list):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="El body debe ser un arreglo JSON de contactos"
+            )
+        rows = _iter_list(body)
+    
     service = ContactService(db)
-    return service.create_contact(contact)
+    return await service.import_contacts(rows)
 
 
 @router.post("/note", response_model=ContactResponse)
-async def add_note(note: NoteCreate, db: Session = Depends(get_db)):
+async def add_note(
+    note: NoteCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: AsyncSession = Depends(get_db)
+):
     """
     Agrega una nota a un contacto existente
     
     Args:
         note: Datos de la nota (contact_id, content)
+        idempotency_key: Clave para repetir la petición sin duplicar la nota (opcional)
         db: Dependencia de sesión de base de datos
     
     Returns:
@@ -90,13 +345,57 @@ async def add_note(note: NoteCreate, db: Session = Depends(get_db)):
         400: Validación fallida
         502: Error comunicándose con el CRM
     """
-    logger.info(f"POST /contact/note - Agregando nota a contacto: {note.contact_id}")
+    logger.info("POST /contact/note - Agregando nota a contacto: %s", note.contact_id)
+    return await run_idempotent(
+        "POST /contact/note", idempotency_key, note.model_dump(), response, db,
+        lambda session, commit: ContactService(session).add_note_to_contact(note, commit=commit)
+    )
+
+
+@router.post("/note/bulk", response_model=BulkOperationResponse)
+async def add_notes_bulk(
+    request: NoteBulkCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Agrega varias notas en una sola transacción
+    
+    Args:
+        request: Notas a crear (máximo 500)
+        idempotency_key: Clave para repetir la petición sin duplicar las notas (opcional)
+        db: Dependencia de sesión de base de datos
+    
+    Returns:
+        BulkOperationResponse con el resultado por nota
+    """
+    logger.info("POST /contact/note/bulk - %s notas", len(request.items))
+    return await run_idempotent(
+        "POST /contact/note/bulk", idempotency_key, request.model_dump(), response, db,
+        lambda session, commit: ContactService(session).add_notes_bulk(request.items, commit=commit)
+    )
+
+
+@router.patch("/bulk", response_model=BulkOperationResponse)
+async def update_contacts_bulk(request: ContactBulkUpdate, db: AsyncSession = Depends(get_db)):
+    """
+    Actualiza varios contactos en una sola transacción
+    
+    Args:
+        request: Actualizaciones (máximo 500)
+        db: Dependencia de sesión de base de datos
+    
+    Returns:
+        BulkOperationResponse con el resultado por actualización
+    """
+    logger.info("PATCH /contact/bulk - %s contactos", len(request.items))
     service = ContactService(db)
-    return service.add_note_to_contact(note)
+    return await service.update_contacts_bulk(request.items)
 
 
 @router.patch("", response_model=ContactResponse)
-async def update_contact(update: ContactUpdate, db: Session = Depends(get_db)):
+async def update_contact(update: ContactUpdate, db: AsyncSession = Depends(get_db)):
     """
     Actualiza un contacto existente
     
@@ -111,6 +410,6 @@ async def update_contact(update: ContactUpdate, db: Session = Depends(get_db)):
         400: Validación fallida
         502: Error comunicándose con el CRM
     """
-    logger.info(f"PATCH /contact - Actualizando contacto: {update.contact_id}")
+    logger.info("PATCH /contact - Actualizando contacto: %s", update.contact_id)
     service = ContactService(db)
-    return service.update_contact(update)
+    return await service.update_contact(update)
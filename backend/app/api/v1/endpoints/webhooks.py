@@ -0,0 +1,70 @@
+"""
+Endpoints de webhooks (API v1)
+"""
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.security import HTTPBasic, HTTPBasicCredentials
+import hmac
+import logging
+
+from app.core.config import settings
+from app.services.crm_webhooks import parse_person_event, person_webhooks
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/webhooks", tags=["webhooks"])
+
+# Pipedrive autentica sus webhooks con HTTP Basic (http_auth_user / http_auth_password)
+basic_auth = HTTPBasic(auto_error=False)
+
+
+def verify_pipedrive_webhook(credentials: Optional[HTTPBasicCredentials] = Depends(basic_auth)):
+    """
+    Verifica las credenciales Basic configuradas en el webhook de Pipedrive
+    """
+    if not settings.webhook_configured:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Webhook de Pipedrive no configurado"
+        )
+    # compare_digest en ambos campos: el tiempo de respuesta no revela cuál falló
+    valid = credentials is not None and all([
+        hmac.compare_digest(credentials.username.encode(), settings.PIPEDRIVE_WEBHOOK_USER.encode()),
+        hmac.compare_digest(credentials.password.encode(), settings.PIPEDRIVE_WEBHOOK_PASSWORD.encode()),
+    ])
+    if not valid:
+        logger.warning("Webhook de Pipedrive rechazado: credenciales inválidas")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Credenciales de webhook inválidas",
+            headers={"WWW-Authenticate": "Basic"}
+        )
+
+
+@router.post("/pipedrive", dependencies=[Depends(verify_pipedrive_webhook)])
+async def pipedrive_webhook(payload: Dict[str, Any]):
+    """
+    Recibe eventos de personas de Pipedrive (added/updated/deleted, webhooks v1 y v2)
+    y los aplica al espejo local por crm_id
+    
+    Args:
+        payload: Cuerpo del webhook
+    
+    Returns:
+        Acción aplicada o ignored=True si el evento no es de una persona
+    """
+    event = parse_person_event(payload)
+    if event is None:
+        logger.debug("Webhook de Pipedrive ignorado: %s", payload.get("meta"))
+        return {"success": True, "ignored": True}
+    
+    action, crm_id, _ = event
+    logger.info("POST /webhooks/pipedrive - %s persona %s", action, crm_id)
+    try:
+        await person_webhooks.submit(event)
+    except Exception as e:
+        # Pipedrive reintenta la entrega ante un error
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error aplicando el webhook: {e}"
+        )
+    return {"success": True, "action": action, "crm_id": crm_id}
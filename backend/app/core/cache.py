@@ -0,0 +1,88 @@
+"""
+Caché en memoria con expiración (TTL) y desalojo LRU
+"""
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+import time
+
+# Marca para distinguir "no está en caché" de un valor None cacheado
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Caché acotada con TTL y desalojo LRU
+    - Cada entrada expira tras `ttl` segundos (o el ttl indicado en set)
+    - Al superar `max_size` se desaloja la entrada usada hace más tiempo
+    - Lleva contadores de hits, misses, desalojos y expiraciones
+    """
+    
+    def __init__(self, max_size: int = 1024, ttl: float = 60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """
+        Retorna el valor cacheado o `default` si no existe o expiró
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+    
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """
+        Guarda un valor, desalojando la entrada LRU si se supera max_size
+        """
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+    
+    def delete(self, key: Hashable) -> bool:
+        return self._data.pop(key, MISSING) is not MISSING
+    
+    def delete_where(self, predicate: Callable[[Any], bool]) -> int:
+        """
+        Elimina las entradas cuyo valor cumple `predicate`
+        
+        Returns:
+            Número de entradas eliminadas
+        """
+        keys = [key for key, (_, value) in self._data.items() if predicate(value)]
+        for key in keys:
+            del self._data[key]
+        return len(keys)
+    
+    def clear(self):
+        self._data.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
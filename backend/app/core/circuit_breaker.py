@@ -0,0 +1,143 @@
+"""
+Circuit breaker para llamadas a servicios externos
+"""
+from collections import deque
+from typing import Any, Deque, Dict
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """
+    El circuito está abierto: la llamada se rechaza sin llegar al servicio
+    """
+    
+    def __init__(self, name: str, retry_in: float):
+        self.name = name
+        self.retry_in = retry_in
+        super().__init__(f"Circuito '{name}' abierto, reintento en {retry_in:.0f}s")
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por tasa de fallos
+    - closed: deja pasar todo y registra el resultado de las últimas `window_size` llamadas
+    - Si con al menos `min_calls` registradas la tasa de fallos llega a `failure_rate_threshold`, se abre
+    - open: rechaza todo durante `open_seconds`
+    - half_open: deja pasar hasta `half_open_max_calls` llamadas de prueba;
+      si todas salen bien se cierra, si una falla vuelve a abrirse
+    """
+    
+    def __init__(self, name: str, failure_rate_threshold: float = 0.5, window_size: int = 20,
+                 min_calls: int = 10, open_seconds: float = 30, half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.window_size = window_size
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        
+        self._state = CLOSED
+        self._window: Deque[bool] = deque(maxlen=window_size)
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        self._half_open_successes = 0
+        self.rejected = 0
+        self.times_opened = 0
+    
+    @property
+    def state(self) -> str:
+        # El paso de open a half_open ocurre al vencer open_seconds
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._half_open_in_flight = 0
+            self._half_open_successes = 0
+            logger.info("Circuito '%s' en half-open: probando el servicio", self.name)
+        return self._state
+    
+    @property
+    def is_open(self) -> bool:
+        return self.state == OPEN
+    
+    def retry_in(self) -> float:
+        """
+        Segundos que faltan para pasar a half-open (0 si no está abierto)
+        """
+        if self._state != OPEN:
+            return 0.0
+        return max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+    
+    def before_call(self):
+        """
+        Reserva el paso de una llamada
+        
+        Raises:
+            CircuitOpenError: Si el circuito está abierto o ya no admite más llamadas de prueba
+        """
+        state = self.state
+        if state == OPEN or (state == HALF_OPEN and self._half_open_in_flight >= self.half_open_max_calls):
+            self.rejected += 1
+            raise CircuitOpenError(self.name, self.retry_in())
+        if state == HALF_OPEN:
+            self._half_open_in_flight += 1
+    
+    def release(self):
+        """
+        Libera una llamada reservada sin registrar resultado (ej. cancelada)
+        """
+        if self._state == HALF_OPEN:
+            self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+    
+    def record_success(self):
+        if self._state == HALF_OPEN:
+            self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+            self._half_open_successes += 1
+            if self._half_open_successes >= self.half_open_max_calls:
+                self._close()
+            return
+        self._window.append(True)
+    
+    def record_failure(self):
+        if self._state == HALF_OPEN:
+            self._open()
+            return
+        self._window.append(False)
+        if self._state == CLOSED and len(self._window) >= self.min_calls \
+                and self.failure_rate() >= self.failure_rate_threshold:
+            self._open()
+    
+    def failure_rate(self) -> float:
+        if not self._window:
+            return 0.0
+        return self._window.count(False) / len(self._window)
+    
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._half_open_in_flight = 0
+        self.times_opened += 1
+        logger.warning(
+            "Circuito '%s' abierto durante %.0fs (tasa de fallos %.0f%%)",
+            self.name, self.open_seconds, self.failure_rate() * 100
+        )
+    
+    def _close(self):
+        self._state = CLOSED
+        self._window.clear()
+        logger.info("Circuito '%s' cerrado: el servicio responde de nuevo", self.name)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failure_rate": round(self.failure_rate(), 4),
+            "window_calls": len(self._window),
+            "retry_in": round(self.retry_in(), 1),
+            "rejected": self.rejected,
+            "times_opened": self.times_opened,
+        }
@@ -0,0 +1,252 @@
+"""
+Cliente HTTP asíncrono compartido para la API de Pipedrive
+Mantiene un pool de conexiones keep-alive para todo el proceso
+"""
+from typing import Any, Dict, Optional
+import asyncio
+import logging
+import time
+
+import httpx
+
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.core.config import settings
+from app.core.metrics import CRM_REQUEST_DURATION, add_stage_time
+from app.core.rate_limiter import HIGH, LOW, RateLimitExceeded, TokenBucket
+from app.core.tracing import KIND_CLIENT, start_span
+
+logger = logging.getLogger(__name__)
+
+# Status que justifican reintentar con backoff
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class PipedriveClient:
+    """
+    Cliente HTTP asíncrono para Pipedrive
+    - Reutiliza conexiones TLS (keep-alive) mediante httpx.AsyncClient
+    - Reintenta con backoff exponencial ante 429/5xx (respeta Retry-After)
+    - Un POST solo se reintenta ante 429: ante 5xx el recurso podría haberse creado
+    - Con circuit breaker, mientras está abierto las peticiones fallan al instante (CircuitOpenError)
+    - Con rate limiter, cada intento consume un token: los GET (búsquedas) tienen baja prioridad
+      y pueden descartarse (RateLimitExceeded); las escrituras esperan su turno
+    """
+    
+    def __init__(self, base_url: str, api_key: str, pool_size: int = 10,
+                 timeout: float = 10, max_retries: int = 3, backoff_factor: float = 0.5,
+                 breaker: Optional[CircuitBreaker] = None,
+                 rate_limiter: Optional[TokenBucket] = None):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.breaker = breaker
+        self.rate_limiter = rate_limiter
+        
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size
+            ),
+        )
+    
+    def _should_retry(self, method: str, status_code: int) -> bool:
+        if status_code not in RETRY_STATUSES:
+            return False
+        return method != "POST" or status_code == 429
+    
+    def _backoff(self, attempt: int, resp: Optional[httpx.Response] = None) -> float:
+        retry_after = resp.headers.get("Retry-After") if resp is not None else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.backoff_factor * (2 ** attempt)
+    
+    async def request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None,
+                      json: Optional[Dict[str, Any]] = None, priority: Optional[str] = None,
+                      operation: Optional[str] = None) -> httpx.Response:
+        """
+        Ejecuta una petición contra la API de Pipedrive
+        
+        Args:
+            method: Método HTTP
+            path: Ruta relativa a PIPEDRIVE_BASE_URL (ej. "/persons")
+            params: Query params adicionales (api_token se agrega automáticamente)
+            json: Payload JSON
+            priority: HIGH o LOW para el rate limiter (por defecto LOW solo para GET)
+            operation: Nombre de la operación en las métricas (ej. "search_in_crm")
+            
+        Returns:
+            httpx.Response
+            
+        Raises:
+            CircuitOpenError: Si el circuit breaker está abierto
+            RateLimitExceeded: Si una petición de baja prioridad se descarta por falta de presupuesto
+        """
+        method = method.upper()
+        priority = priority or (LOW if method == "GET" else HIGH)
+        # None fuera de una petición trazada
+        span = start_span(f"{method} {operation or path}", KIND_CLIENT, {
+            "http.request.method": method,
+            "url.full": f"{self.base_url}{path}",
+            "crm.operation": operation or "",
+        })
+        if not settings.METRICS_ENABLED and span is None:
+            return await self._guarded_request(method, path, params, json, priority)
+        
+        started = time.perf_counter()
+        status = "error"
+        try:
+            resp = await self._guarded_request(method, path, params, json, priority)
+            status = str(resp.status_code)
+            return resp
+        except CircuitOpenError:
+            status = "circuit_open"
+            raise
+        except RateLimitExceeded:
+            status = "rate_limited"
+            raise
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            if settings.METRICS_ENABLED:
+                CRM_REQUEST_DURATION.observe(elapsed, operation or method, status)
+                add_stage_time("crm", elapsed)
+            if span is not None:
+                if status.isdigit():
+                    span.set_attribute("http.response.status_code", int(status))
+                if not status.isdigit() or int(status) >= 400:
+                    span.set_error(status)
+                span.end()
+    
+    async def _guarded_request(self, method: str, path: str, params: Optional[Dict[str, Any]],
+                               json: Optional[Dict[str, Any]], priority: str) -> httpx.Response:
+        if self.breaker is None:
+            return await self._request(method, path, params, json, priority)
+        
+        self.breaker.before_call()
+        try:
+            resp = await self._request(method, path, params, json, priority)
+        except httpx.TransportError:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelaciones y errores ajenos al servicio no cuentan como fallo
+            self.breaker.release()
+            raise
+        if resp.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return resp
+    
+    async def _request(self, method: str, path: str, params: Optional[Dict[str, Any]],
+                       json: Optional[Dict[str, Any]], priority: str) -> httpx.Response:
+        query = {"api_token": self.api_key, **(params or {})}
+        
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire(priority)
+            try:
+                resp = await self.client.request(method, path, params=query, json=json)
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                # La petición no llegó a enviarse: seguro reintentar cualquier método
+                if attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+            
+            if self.rate_limiter is not None:
+                self.rate_limiter.observe(resp.status_code, resp.headers)
+            
+            if attempt < self.max_retries and self._should_retry(method, resp.status_code):
+                logger.warning("Pipedrive respondió %s en %s %s, reintentando...", resp.status_code, method, path)
+                await asyncio.sleep(self._backoff(attempt, resp))
+                attempt += 1
+                continue
+            
+            return resp
+    
+    async def get(self, path: str, params: Optional[Dict[str, Any]] = None,
+                  operation: Optional[str] = None) -> httpx.Response:
+        return await self.request("GET", path, params=params, operation=operation)
+    
+    async def post(self, path: str, json: Optional[Dict[str, Any]] = None,
+                   operation: Optional[str] = None) -> httpx.Response:
+        return await self.request("POST", path, json=json, operation=operation)
+    
+    async def put(self, path: str, json: Optional[Dict[str, Any]] = None,
+                  operation: Optional[str] = None) -> httpx.Response:
+        return await self.request("PUT", path, json=json, operation=operation)
+    
+    async def close(self):
+        await self.client.aclose()
+
+
+# Circuit breaker compartido por todas las llamadas a Pipedrive
+crm_breaker = CircuitBreaker(
+    "pipedrive",
+    failure_rate_threshold=settings.CRM_BREAKER_FAILURE_RATE,
+    window_size=settings.CRM_BREAKER_WINDOW_SIZE,
+    min_calls=settings.CRM_BREAKER_MIN_CALLS,
+    open_seconds=settings.CRM_BREAKER_OPEN_SECONDS,
+    half_open_max_calls=settings.CRM_BREAKER_HALF_OPEN_CALLS,
+)
+
+# Rate limiter compartido por todas las llamadas a Pipedrive
+crm_rate_limiter = TokenBucket(
+    "pipedrive",
+    rate=settings.CRM_RATE_LIMIT / settings.CRM_RATE_WINDOW,
+    capacity=settings.CRM_RATE_LIMIT,
+    low_priority_reserve=settings.CRM_RATE_WRITE_RESERVE,
+    low_priority_max_wait=settings.CRM_RATE_SEARCH_MAX_WAIT,
+)
+
+# Instancia global, creada en el lifespan de la aplicación
+_crm_client: Optional[PipedriveClient] = None
+
+
+def init_crm_client() -> PipedriveClient:
+    """
+    Crea el cliente compartido de Pipedrive
+    """
+    global _crm_client
+    if _crm_client is None:
+        _crm_client = PipedriveClient(
+            base_url=settings.PIPEDRIVE_BASE_URL,
+            api_key=settings.PIPEDRIVE_API_KEY,
+            pool_size=settings.CRM_POOL_SIZE,
+            timeout=settings.CRM_TIMEOUT,
+            max_retries=settings.CRM_MAX_RETRIES,
+            backoff_factor=settings.CRM_BACKOFF_FACTOR,
+            breaker=crm_breaker if settings.CRM_BREAKER_ENABLED else None,
+            rate_limiter=crm_rate_limiter if settings.CRM_RATE_LIMIT_ENABLED else None,
+        )
+        logger.info("Cliente Pipedrive inicializado (pool=%s)", settings.CRM_POOL_SIZE)
+    return _crm_client
+
+
+def get_crm_client() -> PipedriveClient:
+    """
+    Retorna el cliente compartido (lo crea si el lifespan no se ejecutó, ej. scripts)
+    """
+    return _crm_client or init_crm_client()
+
+
+async def close_crm_client():
+    """
+    Cierra las conexiones del cliente compartido
+    """
+    global _crm_client
+    if _crm_client is not None:
+        await _crm_client.close()
+        _crm_client = None
+        logger.info("Cliente Pipedrive cerrado")
@@ -3,8 +3,14 @@ Dependencias y middleware para FastAPI
 """
 from fastapi import Request
 from app.core.config import settings
-from app.core.security import generate_correlation_id
+from app.core.metrics import observe_request, request_stages
+from app.core.security import (
+    correlation_id_var, generate_correlation_id, parse_correlation_id, request_started_var
+)
+from app.core.tracing import current_span, start_trace
+from app.db.profiler import query_profile, query_profiler
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -12,11 +18,55 @@ logger = logging.getLogger(__name__)
 async def add_correlation_id(request: Request, call_next):
     """
     Middleware para agregar correlation_id a todos los requests
+    - Reutiliza el X-Correlation-ID recibido (ej. desde n8n) o genera uno nuevo
+    - Lo deja en un contextvar: servicios, repositorios y logs usan el mismo ID
+    - Con METRICS_ENABLED mide la latencia por ruta y el tiempo en Pipedrive y BD de la petición
+    - Con TRACING_ENABLED abre el span raíz de la petición (continúa el traceparent W3C si viene)
+    - Con DB_PROFILING_ENABLED registra las sentencias SQL de la petición y posibles N+1
     """
-    correlation_id = generate_correlation_id()
+    correlation_id = parse_correlation_id(request.headers.get("X-Correlation-ID")) or generate_correlation_id()
     request.state.correlation_id = correlation_id
-    response = await call_next(request)
+    correlation_token = correlation_id_var.set(correlation_id)
+    
+    span = start_trace(request.method, correlation_id, request.headers.get("traceparent"), {
+        "http.request.method": request.method,
+        "url.path": request.url.path,
+    })
+    span_token = current_span.set(span)
+    stages = {}
+    stages_token = request_stages.set(stages)
+    profile = query_profiler.start_request()
+    profile_token = query_profile.set(profile)
+    started = time.perf_counter()
+    started_token = request_started_var.set(started)
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        # Plantilla de la ruta (/api/v1/contact/search), no la URL: cardinalidad acotada
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        # Antes de restaurar los contextvars: el resumen SQL se registra con el correlation_id de la petición
+        if profile is not None:
+            query_profiler.finish_request(profile, request.method, route)
+        request_stages.reset(stages_token)
+        query_profile.reset(profile_token)
+        request_started_var.reset(started_token)
+        current_span.reset(span_token)
+        correlation_id_var.reset(correlation_token)
+        if settings.METRICS_ENABLED:
+            observe_request(request.method, route, status_code, time.perf_counter() - started, stages)
+        if span is not None:
+            span.name = f"{request.method} {route}"
+            span.set_attribute("http.route", route)
+            span.set_attribute("http.response.status_code", status_code)
+            if status_code >= 500:
+                span.set_error(f"HTTP {status_code}")
+            span.end()
+    
     response.headers["X-Correlation-ID"] = correlation_id
+    if span is not None:
+        response.headers["traceparent"] = span.traceparent
     return response
 
 
@@ -0,0 +1,175 @@
+"""
+Soporte de Idempotency-Key para endpoints de creación
+Las claves y sus respuestas se guardan en la BD (tabla idempotency_keys, única por scope y clave),
+compartida por todos los procesos: un reintento con la misma clave recibe la respuesta original
+aunque lo atienda otro worker. Cada proceso mantiene además una caché en memoria de las respuestas
+"""
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+import asyncio
+import hashlib
+import json
+import uuid
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.cache import MISSING, TTLCache
+from app.core.config import settings
+from app.db.base import SessionLocal
+from app.repositories.idempotency_repository import IdempotencyRepository
+
+
+class IdempotencyConflict(Exception):
+    """
+    La clave ya se usó con un cuerpo de petición distinto
+    """
+
+
+class IdempotencyInProgress(Exception):
+    """
+    Otro proceso está ejecutando la petición original con la misma clave
+    """
+
+
+def request_fingerprint(payload: Any) -> str:
+    """
+    Huella del cuerpo de la petición (JSON canónico)
+    """
+    body = json.dumps(payload, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Almacén de respuestas por (endpoint, Idempotency-Key)
+    - La fila de la clave se inserta antes de ejecutar la operación: la clave primaria garantiza
+      que solo un proceso la ejecuta
+    - La operación no confirma sus cambios: se confirman en una sola transacción junto con la respuesta
+    - Guarda solo respuestas exitosas (los errores liberan la clave y se pueden reintentar)
+    - Las claves vencen tras ttl segundos; una reserva sin respuesta tras lock_seconds se considera
+      abandonada (no confirmó nada). Si la operación original termina después, no confirma sus cambios
+    - Un reintento que llega al mismo proceso mientras la original sigue en curso espera su resultado;
+      si la original está en curso en otro proceso produce IdempotencyInProgress
+    - Reusar una clave con otro cuerpo produce IdempotencyConflict
+    La operación recibe su propia sesión de BD: sigue en ejecución (shield) aunque el cliente
+    se desconecte y la sesión de la petición se cierre
+    """
+    
+    def __init__(self, max_size: int = 10000, ttl: float = 86400, lock_seconds: float = 60,
+                 session_factory: async_sessionmaker = SessionLocal):
+        self._responses = TTLCache(max_size=max_size, ttl=ttl)
+        self._in_flight: Dict[Hashable, Tuple[str, asyncio.Task]] = {}
+        self._ttl = timedelta(seconds=ttl)
+        self._lock_timeout = timedelta(seconds=lock_seconds)
+        self._session_factory = session_factory
+        self.stored = 0
+        self.replays = 0
+        self.conflicts = 0
+        self.in_progress = 0
+    
+    async def run(self, scope: str, key: str, fingerprint: str,
+                  fn: Callable[[AsyncSession], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Ejecuta fn una sola vez por (scope, key) entre todos los procesos
+        
+        Args:
+            scope: Endpoint (ej. "POST /contact")
+            key: Valor de la cabecera Idempotency-Key
+            fingerprint: Huella del cuerpo de la petición
+            fn: Función que ejecuta la operación con la sesión de BD que recibe, sin confirmar la transacción
+        
+        Returns:
+            (respuesta, True si es una repetición)
+        
+        Raises:
+            IdempotencyConflict: Si la clave ya se usó con otro cuerpo
+            IdempotencyInProgress: Si otro proceso está ejecutando la petición original
+        """
+        store_key = (scope, key)
+        
+        cached = self._responses.get(store_key)
+        if cached is not MISSING:
+            self._check(cached[0], fingerprint)
+            self.replays += 1
+            return cached[1], True
+        
+        in_flight = self._in_flight.get(store_key)
+        if in_flight is not None:
+            self._check(in_flight[0], fingerprint)
+            self.replays += 1
+            result, _ = await asyncio.shield(in_flight[1])
+            return result, True
+        
+        async def execute():
+            token = uuid.uuid4().hex
+            async with self._session_factory() as db:
+                repository = IdempotencyRepository(db)
+                existing = await repository.claim(scope, key, fingerprint, token, self._ttl, self._lock_timeout)
+                if existing is not None:
+                    self._check(existing.fingerprint, fingerprint)
+                    if existing.response is None:
+                        self.in_progress += 1
+                        raise IdempotencyInProgress(
+                            "La petición original con esta Idempotency-Key sigue en curso, reintente más tarde"
+                        )
+                    # En memoria solo por lo que le queda de vida a la clave en la BD
+                    remaining = self._ttl - (datetime.utcnow() - existing.created_at)
+                    self._responses.set(
+                        store_key, (fingerprint, existing.response), ttl=max(remaining.total_seconds(), 0)
+                    )
+                    self.replays += 1
+                    return existing.response, True
+                
+                try:
+                    response = await fn(db)
+                    completed = await repository.complete(scope, key, token, jsonable_encoder(response))
+                except Exception:
+                    await repository.release(scope, key, token)
+                    raise
+                if not completed:
+                    self.in_progress += 1
+                    raise IdempotencyInProgress(
+                        "La reserva de esta Idempotency-Key venció y la tomó otra petición, reintente más tarde"
+                    )
+            self._responses.set(store_key, (fingerprint, response))
+            self.stored += 1
+            return response, False
+        
+        task = asyncio.ensure_future(execute())
+        self._in_flight[store_key] = (fingerprint, task)
+        task.add_done_callback(lambda _: self._in_flight.pop(store_key, None))
+        return await asyncio.shield(task)
+    
+    def _check(self, stored_fingerprint: str, fingerprint: str):
+        if stored_fingerprint != fingerprint:
+            self.conflicts += 1
+            raise IdempotencyConflict("La Idempotency-Key ya se usó con un cuerpo de petición distinto")
+    
+    def stats(self) -> Dict[str, Any]:
+        cache = self._responses.stats()
+        return {
+            "size": cache["size"],
+            "max_size": cache["max_size"],
+            "ttl": cache["ttl"],
+            "in_flight": len(self._in_flight),
+            "stored": self.stored,
+            "replays": self.replays,
+            "conflicts": self.conflicts,
+            "in_progress": self.in_progress,
+        }
+    
+    async def purge_expired(self) -> int:
+        """
+        Elimina de la BD las claves vencidas
+        """
+        async with self._session_factory() as db:
+            return await IdempotencyRepository(db).purge_expired(self._ttl)
+
+
+# Almacén compartido por los endpoints de creación (la caché en memoria es por proceso)
+idempotency_store = IdempotencyStore(
+    max_size=settings.IDEMPOTENCY_MAX_SIZE,
+    ttl=settings.IDEMPOTENCY_TTL,
+    lock_seconds=settings.IDEMPOTENCY_LOCK_SECONDS
+)
@@ -0,0 +1,199 @@
+"""
+Configuración del logging de la aplicación
+- Formato texto (por defecto) o JSON con correlation_id y tiempo transcurrido de la petición
+- Modo cola: los registros pasan a un hilo que formatea y escribe en stderr, sin bloquear el event loop
+- Muestreo por logger de los niveles < WARNING (los logs informativos por petición)
+"""
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List, Optional, Tuple
+import atexit
+import json
+import logging
+import queue
+import random
+import zlib
+
+from app.core.config import settings
+from app.core.security import CorrelationIdFilter
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(correlation_id)s] %(message)s"
+
+# Atributos propios de LogRecord: el resto son campos pasados con extra={...}
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message", "asctime", "correlation_id", "request_elapsed_ms", "taskName",
+}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Un objeto JSON por línea: timestamp, level, logger, message, correlation_id, request_elapsed_ms,
+    los campos de extra={...} y la traza de la excepción si la hay
+    """
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "correlation_id": getattr(record, "correlation_id", "-"),
+        }
+        elapsed = getattr(record, "request_elapsed_ms", None)
+        if elapsed is not None:
+            entry["request_elapsed_ms"] = elapsed
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def parse_sampling(value: str) -> List[Tuple[str, float]]:
+    """
+    Interpreta LOG_SAMPLING ("app.repositories=0.1,app.services=0.5")
+    
+    Returns:
+        Lista de (prefijo de logger, proporción a conservar), del prefijo más largo al más corto
+    
+    Raises:
+        ValueError: Si una entrada no tiene el formato logger=proporción o la proporción no está en [0, 1]
+    """
+    rules = []
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, sep, rate = item.partition("=")
+        if not sep or not name.strip():
+            raise ValueError(f"LOG_SAMPLING inválido: '{item}' (se espera logger=proporción)")
+        rate = float(rate)
+        if not 0.0 <= rate <= 1.0:
+            raise ValueError(f"LOG_SAMPLING inválido: '{item}' (la proporción debe estar entre 0 y 1)")
+        rules.append((name.strip(), rate))
+    return sorted(rules, key=lambda rule: len(rule[0]), reverse=True)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Conserva solo una proporción de los registros < WARNING de los loggers configurados
+    - El prefijo más específico gana ("app.repositories" aplica a "app.repositories.contact_repository")
+    - Dentro de una petición la decisión depende del correlation_id: se conservan o descartan
+      todos los logs de la misma petición, nunca una parte
+    - WARNING y superiores nunca se descartan
+    Debe ir después de CorrelationIdFilter
+    """
+    
+    def __init__(self, rules: List[Tuple[str, float]]):
+        super().__init__()
+        self.rules = rules
+        self._rates: Dict[str, Optional[float]] = {}
+        self.dropped = 0
+    
+    def _rate_for(self, name: str) -> Optional[float]:
+        if name not in self._rates:
+            self._rates[name] = next(
+                (rate for prefix, rate in self.rules if name == prefix or name.startswith(prefix + ".")), None
+            )
+        return self._rates[name]
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate_for(record.name)
+        if rate is None or rate >= 1.0:
+            return True
+        correlation_id = getattr(record, "correlation_id", "-")
+        if correlation_id != "-":
+            keep = (zlib.crc32(correlation_id.encode()) & 0xFFFFFFFF) / 2 ** 32 < rate
+        else:
+            keep = random.random() < rate
+        if not keep:
+            self.dropped += 1
+        return keep
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Pasa los registros al hilo del QueueListener sin formatearlos
+    - El mensaje (msg % args), el formato y la escritura ocurren en el hilo del listener
+    - Con la cola llena el registro se descarta y se cuenta, en lugar de bloquear la petición
+    Los args deben ser valores que no cambien después de emitir el log (ids, strings, números)
+    """
+    
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+    
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+_sampling: Optional[SamplingFilter] = None
+
+
+def _stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def configure_logging():
+    """
+    Configura el logger raíz según LOG_LEVEL, LOG_FORMAT, LOG_QUEUE_ENABLED y LOG_SAMPLING
+    Reemplaza los handlers existentes: se puede llamar de nuevo tras cambiar la configuración
+    """
+    global _listener, _queue_handler, _sampling
+    
+    _stop_listener()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel(getattr(logging, settings.LOG_LEVEL))
+    
+    stream = logging.StreamHandler()
+    stream.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+    
+    if settings.LOG_QUEUE_ENABLED:
+        _queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+        _listener = QueueListener(_queue_handler.queue, stream, respect_handler_level=True)
+        _listener.start()
+        handler = _queue_handler
+    else:
+        _queue_handler = None
+        handler = stream
+    
+    # Los filtros van en el handler del hilo que emite: ahí están los contextvars de la petición
+    handler.addFilter(CorrelationIdFilter())
+    rules = parse_sampling(settings.LOG_SAMPLING)
+    _sampling = SamplingFilter(rules) if rules else None
+    if _sampling is not None:
+        handler.addFilter(_sampling)
+    root.addHandler(handler)
+
+
+def logging_stats() -> Dict[str, Any]:
+    """
+    Estadísticas del pipeline de logging (para el health check)
+    """
+    return {
+        "format": settings.LOG_FORMAT,
+        "queue_enabled": _listener is not None,
+        "queued": _queue_handler.queue.qsize() if _queue_handler is not None else 0,
+        "dropped_queue_full": _queue_handler.dropped if _queue_handler is not None else 0,
+        "dropped_sampling": _sampling.dropped if _sampling is not None else 0,
+        "sampling": {prefix: rate for prefix, rate in _sampling.rules} if _sampling is not None else {},
+    }
+
+
+# Escribe los registros pendientes al salir del proceso
+atexit.register(_stop_listener)
@@ -0,0 +1,214 @@
+"""
+Métricas en formato de exposición de Prometheus (texto 0.0.4)
+Registro en memoria sin dependencias: contadores, histogramas y valores leídos al hacer scrape
+"""
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+# Buckets en segundos: peticiones HTTP y llamadas a Pipedrive
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Consultas SQL: la mayoría por debajo del milisegundo
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+LabelValues = Tuple[str, ...]
+# Un valor leído al hacer scrape: número o {valores de etiquetas: número}
+CallbackValue = Union[float, Dict[LabelValues, float]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """
+    Contador acumulado por combinación de etiquetas
+    """
+    
+    kind = "counter"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[LabelValues, float] = {}
+    
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+    
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in self._values.items()
+        ]
+
+
+class Histogram:
+    """
+    Histograma con buckets fijos por combinación de etiquetas
+    observe() solo hace un bisect y dos sumas; los acumulados por bucket se calculan al renderizar
+    """
+    
+    kind = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [conteo por bucket (+Inf al final), suma, total]
+        self._series: Dict[LabelValues, List[Any]] = {}
+    
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+    
+    def render(self) -> List[str]:
+        lines = []
+        bounds = self.buckets + (float("inf"),)
+        for labels, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Callback:
+    """
+    Métrica cuyo valor se lee al hacer scrape (ej. de los stats() de pool, caché o circuit breaker)
+    """
+    
+    def __init__(self, name: str, documentation: str, fn: Callable[[], CallbackValue],
+                 kind: str = "gauge", labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.fn = fn
+        self.kind = kind
+        self.labelnames = labelnames
+    
+    def render(self) -> List[str]:
+        value = self.fn()
+        if value is None:
+            return []
+        if not isinstance(value, dict):
+            value = {(): value}
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(sample)}"
+            for labels, sample in value.items()
+            if sample is not None
+        ]
+
+
+class MetricsRegistry:
+    """
+    Conjunto de métricas expuestas en /metrics
+    """
+    
+    def __init__(self):
+        self._metrics: Dict[str, Union[Counter, Histogram, Callback]] = {}
+    
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrica duplicada: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+    
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+    
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+    
+    def callback(self, name: str, documentation: str, fn: Callable[[], CallbackValue],
+                 kind: str = "gauge", labelnames: Tuple[str, ...] = ()) -> Callback:
+        return self._register(Callback(name, documentation, fn, kind, labelnames))
+    
+    def render(self) -> str:
+        """
+        Serializa todas las métricas en el formato de texto de Prometheus
+        """
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Registro global de la aplicación
+registry = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds",
+    "Latencia de las peticiones HTTP por ruta",
+    ("method", "route", "status"),
+)
+HTTP_REQUEST_STAGE = registry.histogram(
+    "http_request_stage_seconds",
+    "Tiempo de cada petición HTTP por etapa (crm, db, app = resto: validación, lógica y serialización)",
+    ("route", "stage"),
+)
+CRM_REQUEST_DURATION = registry.histogram(
+    "crm_request_duration_seconds",
+    "Latencia de las llamadas a Pipedrive (con reintentos) por método de ContactRepository",
+    ("operation", "status"),
+)
+DB_QUERY_DURATION = registry.histogram(
+    "db_query_duration_seconds",
+    "Latencia de las sentencias SQL por tipo",
+    ("statement",),
+    buckets=DB_BUCKETS,
+)
+DB_QUERY_ERRORS = registry.counter(
+    "db_query_errors_total",
+    "Sentencias SQL que fallaron por tipo",
+    ("statement",),
+)
+
+# Tiempo acumulado por etapa de la petición HTTP en curso (None fuera de una petición)
+request_stages: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_stages", default=None)
+
+
+def add_stage_time(stage: str, seconds: float):
+    """
+    Suma tiempo a una etapa (crm, db) de la petición HTTP en curso
+    """
+    stages = request_stages.get()
+    if stages is not None:
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+
+def observe_request(method: str, route: str, status: int, elapsed: float, stages: Dict[str, float]):
+    """
+    Registra la latencia total y por etapa de una petición HTTP
+    Las llamadas concurrentes dentro de una petición pueden sumar más que el total: "app" nunca es negativo
+    """
+    HTTP_REQUEST_DURATION.observe(elapsed, method, route, str(status))
+    crm = stages.get("crm", 0.0)
+    db = stages.get("db", 0.0)
+    HTTP_REQUEST_STAGE.observe(crm, route, "crm")
+    HTTP_REQUEST_STAGE.observe(db, route, "db")
+    HTTP_REQUEST_STAGE.observe(max(elapsed - crm - db, 0.0), route, "app")
@@ -0,0 +1,48 @@
+"""
+Normalización de teléfonos a formato E.164
+"""
+from typing import Optional
+
+from app.core.config import settings
+
+# Longitudes válidas (solo dígitos) según E.164
+MIN_PHONE_DIGITS = 7
+MAX_PHONE_DIGITS = 15
+
+
+def normalize_phone(raw: Optional[str], default_country_code: Optional[str] = None) -> Optional[str]:
+    """
+    Normaliza un teléfono a E.164 ("+573001234567")
+    - "+57 300 123 4567", "0057 300-123-4567" y "3001234567" generan la misma clave
+    - Números sin prefijo internacional usan PHONE_DEFAULT_COUNTRY_CODE
+    
+    Args:
+        raw: Teléfono tal como lo escribió el usuario
+        default_country_code: Código de país para números nacionales (sin "+")
+        
+    Returns:
+        Teléfono en E.164 o None si el texto no parece un teléfono
+    """
+    if not raw:
+        return None
+    
+    value = raw.strip()
+    if any(ch.isalpha() for ch in value):
+        return None
+    digits = "".join(ch for ch in value if ch.isdigit())
+    
+    if value.startswith("+"):
+        pass
+    elif digits.startswith("00"):
+        digits = digits[2:]
+    else:
+        country_code = default_country_code or settings.PHONE_DEFAULT_COUNTRY_CODE
+        digits = digits.lstrip("0")
+        # Más de 10 dígitos empezando por el código de país: ya es internacional
+        already_international = digits.startswith(country_code) and len(digits) > 10
+        if country_code and not already_international:
+            digits = f"{country_code}{digits}"
+    
+    if not MIN_PHONE_DIGITS <= len(digits) <= MAX_PHONE_DIGITS:
+        return None
+    return f"+{digits}"
@@ -0,0 +1,152 @@
+"""
+Rate limiter (token bucket) con prioridades para llamadas a APIs externas
+"""
+from typing import Any, Dict, Mapping, Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+HIGH = "high"
+LOW = "low"
+
+
+class RateLimitExceeded(Exception):
+    """
+    Llamada de baja prioridad descartada: no hubo presupuesto a tiempo
+    """
+    
+    def __init__(self, name: str, wait: float):
+        self.name = name
+        self.wait = wait
+        super().__init__(f"Límite de peticiones de '{name}' agotado, se liberaría en {wait:.1f}s")
+
+
+def _header_number(headers: Mapping[str, str], key: str) -> Optional[float]:
+    value = headers.get(key)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    """
+    Token bucket asíncrono compartido por todas las llamadas a un servicio
+    - Se rellena a `rate` tokens/segundo hasta `capacity`
+    - Las llamadas de alta prioridad (escrituras) esperan lo necesario
+    - Las de baja prioridad (búsquedas) no usan la reserva `low_priority_reserve` (fracción
+      de capacity), ceden el paso a escrituras en espera y se descartan si tendrían que esperar
+      más de `low_priority_max_wait` segundos
+    - Se ajusta con las cabeceras de rate limit del servidor y se bloquea ante un 429
+    """
+    
+    def __init__(self, name: str, rate: float, capacity: int,
+                 low_priority_reserve: float = 0.2, low_priority_max_wait: float = 2.0):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.low_priority_reserve = low_priority_reserve
+        self.low_priority_max_wait = low_priority_max_wait
+        
+        self.tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._high_waiting = 0
+        
+        self.server_limit: Optional[int] = None
+        self.server_remaining: Optional[int] = None
+        self.server_reset: Optional[float] = None
+        self.acquired = {HIGH: 0, LOW: 0}
+        self.shed = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+    
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    async def acquire(self, priority: str = HIGH):
+        """
+        Espera hasta disponer de un token
+        
+        Args:
+            priority: HIGH (escrituras) o LOW (búsquedas)
+        
+        Raises:
+            RateLimitExceeded: Si una llamada LOW tendría que esperar más de low_priority_max_wait
+        """
+        low = priority == LOW
+        started = time.monotonic()
+        floor = self.capacity * self.low_priority_reserve if low else 0.0
+        if not low:
+            self._high_waiting += 1
+        try:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                blocked = max(0.0, self._blocked_until - now)
+                yields = low and self._high_waiting > 0
+                if not blocked and not yields and self.tokens - 1 >= floor:
+                    self.tokens -= 1
+                    self.acquired[priority] += 1
+                    self.wait_seconds += now - started
+                    return
+                
+                wait = blocked or max((floor + 1 - self.tokens) / self.rate, 0.01)
+                if low and now + wait - started > self.low_priority_max_wait:
+                    self.shed += 1
+                    raise RateLimitExceeded(self.name, wait)
+                await asyncio.sleep(wait)
+        finally:
+            if not low:
+                self._high_waiting -= 1
+    
+    def observe(self, status_code: int, headers: Mapping[str, str]):
+        """
+        Ajusta el presupuesto con la respuesta del servidor
+        Lee x-ratelimit-limit / x-ratelimit-remaining / x-ratelimit-reset y Retry-After
+        """
+        now = time.monotonic()
+        limit = _header_number(headers, "x-ratelimit-limit")
+        remaining = _header_number(headers, "x-ratelimit-remaining")
+        reset = _header_number(headers, "x-ratelimit-reset")
+        
+        if limit is not None:
+            self.server_limit = int(limit)
+        if reset is not None:
+            self.server_reset = reset
+        if remaining is not None:
+            self.server_remaining = int(remaining)
+            # El servidor manda: puede haber otros clientes consumiendo el mismo token
+            self._refill(now)
+            self.tokens = min(self.tokens, remaining)
+        
+        if status_code == 429 or remaining == 0:
+            if status_code == 429:
+                self.throttled += 1
+            pause = _header_number(headers, "Retry-After") or reset or self.capacity / self.rate
+            self._blocked_until = max(self._blocked_until, now + pause)
+            logger.warning("Límite de peticiones de '%s' alcanzado, pausa de %.1fs", self.name, pause)
+    
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        self._refill(now)
+        return {
+            "rate": self.rate,
+            "capacity": self.capacity,
+            "tokens": round(self.tokens, 2),
+            "budget_used": round(1 - self.tokens / self.capacity, 4) if self.capacity else 0.0,
+            "blocked_for": round(max(0.0, self._blocked_until - now), 1),
+            "server_limit": self.server_limit,
+            "server_remaining": self.server_remaining,
+            "server_reset": self.server_reset,
+            "acquired_high": self.acquired[HIGH],
+            "acquired_low": self.acquired[LOW],
+            "shed": self.shed,
+            "throttled": self.throttled,
+            "wait_seconds": round(self.wait_seconds, 3),
+        }
@@ -1,11 +1,23 @@
 """
 Módulo de seguridad y utilidades de autenticación
 """
+from contextvars import ContextVar
+from typing import Optional
+import re
+import time
 import uuid
 import logging
 
 logger = logging.getLogger(__name__)
 
+# ID de correlación de la petición en curso (lo fija el middleware add_correlation_id)
+correlation_id_var: ContextVar[Optional[str]] = ContextVar("correlation_id", default=None)
+# Inicio (perf_counter) de la petición en curso, para el tiempo transcurrido en cada log
+request_started_var: ContextVar[Optional[float]] = ContextVar("request_started", default=None)
+
+# X-Correlation-ID aceptado desde el cliente (ej. n8n): hasta 128 caracteres seguros para logs
+VALID_CORRELATION_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
 
 def generate_correlation_id() -> str:
     """
@@ -17,6 +29,43 @@ def generate_correlation_id() -> str:
     return str(uuid.uuid4())
 
 
+def get_correlation_id() -> str:
+    """
+    Retorna el ID de correlación de la petición en curso
+    Fuera de una petición (scripts, workers) genera uno nuevo
+    
+    Returns:
+        str: ID de correlación
+    """
+    return correlation_id_var.get() or generate_correlation_id()
+
+
+def parse_correlation_id(value: Optional[str]) -> Optional[str]:
+    """
+    Valida un X-Correlation-ID recibido
+    
+    Returns:
+        El ID si es válido, None si no viene o no es seguro para logs
+    """
+    if value and VALID_CORRELATION_ID.match(value):
+        return value
+    return None
+
+
+class CorrelationIdFilter(logging.Filter):
+    """
+    Agrega record.correlation_id ("-" fuera de una petición) y record.request_elapsed_ms
+    (ms desde el inicio de la petición, None fuera de una) a todos los logs
+    Se ejecuta en el hilo que emite el log: los contextvars se leen antes de pasar a la cola
+    """
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.correlation_id = correlation_id_var.get() or "-"
+        started = request_started_var.get()
+        record.request_elapsed_ms = round((time.perf_counter() - started) * 1000, 2) if started is not None else None
+        return True
+
+
 def generate_mock_id(seed: str) -> int:
     """
     Genera un ID numérico para modo mock
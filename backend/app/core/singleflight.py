@@ -0,0 +1,47 @@
+"""
+Coalescencia de peticiones concurrentes idénticas (single-flight)
+"""
+from typing import Any, Awaitable, Callable, Dict, Hashable
+import asyncio
+
+
+class SingleFlight:
+    """
+    Ejecuta una sola vez las llamadas concurrentes con la misma clave
+    - La primera llamada lanza la tarea; las que llegan mientras está en curso esperan su resultado
+    - El resultado (o la excepción) se reparte entre todas; no se cachea al terminar
+    - La tarea no se cancela si se cancela una de las llamadas que la esperan
+    """
+    
+    def __init__(self):
+        self._flights: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+    
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Ejecuta fn o se une a la ejecución en curso con la misma clave
+        
+        Args:
+            key: Clave de la llamada (ej. query normalizada)
+            fn: Función que crea la corrutina a ejecutar
+        
+        Returns:
+            Resultado de fn, compartido con las llamadas concurrentes de la misma clave
+        """
+        self.calls += 1
+        task = self._flights.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._flights[key] = task
+            task.add_done_callback(lambda _: self._flights.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._flights),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+        }
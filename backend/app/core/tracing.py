@@ -0,0 +1,290 @@
+"""
+Trazas distribuidas compatibles con OpenTelemetry (modelo de spans y formato OTLP/JSON)
+Span raíz por petición HTTP y spans hijos por sentencia SQL y llamada a Pipedrive
+"""
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import time
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# SpanKind y StatusCode de OTLP
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+# Lote máximo por exportación
+EXPORT_BATCH_SIZE = 512
+
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+def _new_span_id() -> str:
+    return f"{random.getrandbits(64):016x}"
+
+
+def trace_id_for(correlation_id: str) -> str:
+    """
+    trace_id de la petición: el mismo correlation_id si es un UUID (une logs y trazas), o uno aleatorio
+    """
+    candidate = correlation_id.replace("-", "").lower()
+    if re.fullmatch(r"[0-9a-f]{32}", candidate) and candidate != "0" * 32:
+        return candidate
+    return f"{random.getrandbits(128):032x}"
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    """
+    Operación con inicio, fin, atributos y estado (mismo modelo que un span de OpenTelemetry)
+    """
+    
+    __slots__ = (
+        "trace_id", "span_id", "parent_span_id", "name", "kind",
+        "start_ns", "end_ns", "attributes", "status_code", "status_message",
+    )
+    
+    def __init__(self, trace_id: str, name: str, kind: int = KIND_INTERNAL,
+                 parent_span_id: Optional[str] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = trace_id
+        self.span_id = _new_span_id()
+        self.parent_span_id = parent_span_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = attributes or {}
+        self.status_code = STATUS_UNSET
+        self.status_message = ""
+    
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+    
+    def set_error(self, message: str):
+        self.status_code = STATUS_ERROR
+        self.status_message = message[:500]
+    
+    def end(self):
+        """
+        Cierra el span y lo encola para exportar
+        """
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            span_exporter.submit(self)
+    
+    @property
+    def traceparent(self) -> str:
+        """
+        Cabecera W3C traceparent que identifica este span
+        """
+        return f"00-{self.trace_id}-{self.span_id}-01"
+    
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": self.status_code, "message": self.status_message},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        return span
+
+
+# Span activo de la petición en curso (None si no hay traza o no se muestreó)
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def start_trace(name: str, correlation_id: str, traceparent: Optional[str] = None,
+                attributes: Optional[Dict[str, Any]] = None) -> Optional[Span]:
+    """
+    Abre el span raíz (SERVER) de una petición
+    
+    Args:
+        name: Nombre del span
+        correlation_id: ID de correlación de la petición (se usa como trace_id si es un UUID)
+        traceparent: Cabecera W3C recibida; si viene, la traza continúa la del cliente
+        attributes: Atributos iniciales
+    
+    Returns:
+        Span o None si el tracing está desactivado o la petición no se muestrea
+    """
+    if not settings.TRACING_ENABLED:
+        return None
+    
+    match = TRACEPARENT.match(traceparent.strip().lower()) if traceparent else None
+    if match:
+        trace_id, parent_span_id, flags = match.groups()
+        sampled = int(flags, 16) & 1
+    else:
+        trace_id, parent_span_id = trace_id_for(correlation_id), None
+        sampled = random.random() < settings.TRACING_SAMPLE_RATE
+    if not sampled:
+        return None
+    
+    span = Span(trace_id, name, KIND_SERVER, parent_span_id, attributes)
+    span.set_attribute("correlation_id", correlation_id)
+    return span
+
+
+def start_span(name: str, kind: int = KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None) -> Optional[Span]:
+    """
+    Abre un span hijo del span activo
+    Fuera de una petición trazada (ej. workers en segundo plano) retorna None
+    """
+    parent = current_span.get()
+    if parent is None:
+        return None
+    return Span(parent.trace_id, name, kind, parent.span_id, attributes)
+
+
+class SpanExporter:
+    """
+    Exporta los spans terminados en lotes desde una tarea en segundo plano
+    - file: una línea OTLP/JSON por lote en TRACING_FILE (formato del file exporter del OTel Collector)
+    - otlp: POST OTLP/HTTP JSON a TRACING_OTLP_ENDPOINT (ej. un OTel Collector local, Jaeger, Tempo)
+    - Si la cola supera TRACING_MAX_QUEUE, los spans nuevos se descartan (no bloquea las peticiones)
+    """
+    
+    def __init__(self):
+        self._queue: List[Span] = []
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._client: Optional[httpx.AsyncClient] = None
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+        self.last_error: Optional[str] = None
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def submit(self, span: Span):
+        if len(self._queue) >= settings.TRACING_MAX_QUEUE:
+            self.dropped += 1
+            return
+        self._queue.append(span)
+        if len(self._queue) >= EXPORT_BATCH_SIZE and self._wakeup is not None:
+            self._wakeup.set()
+    
+    def start(self):
+        """
+        Inicia la exportación en el event loop actual
+        """
+        if self.running:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        if settings.TRACING_EXPORTER == "otlp":
+            self._client = httpx.AsyncClient(timeout=10)
+        self._task = asyncio.create_task(self._run(), name="span-exporter")
+        logger.info("Exportación de trazas iniciada (%s)", settings.TRACING_EXPORTER)
+    
+    async def stop(self):
+        """
+        Detiene la exportación enviando los spans pendientes
+        """
+        if not self.running:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        logger.info("Exportación de trazas detenida")
+    
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.TRACING_EXPORT_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+        await self.flush()
+    
+    async def flush(self):
+        """
+        Exporta todos los spans encolados
+        """
+        while self._queue:
+            batch, self._queue = self._queue[:EXPORT_BATCH_SIZE], self._queue[EXPORT_BATCH_SIZE:]
+            try:
+                await self._export(batch)
+                self.exported += len(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                self.last_error = str(e)
+                logger.warning("Error exportando %s spans: %s", len(batch), e)
+    
+    async def _export(self, batch: List[Span]):
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": settings.TRACING_SERVICE_NAME}},
+                {"key": "service.version", "value": {"stringValue": settings.API_VERSION}},
+            ]},
+            "scopeSpans": [{
+                "scope": {"name": __name__},
+                "spans": [span.to_otlp() for span in batch],
+            }],
+        }]}
+        
+        if settings.TRACING_EXPORTER == "otlp":
+            resp = await self._client.post(settings.TRACING_OTLP_ENDPOINT, json=payload)
+            resp.raise_for_status()
+        else:
+            # Escritura en un hilo: no bloquea el event loop
+            await asyncio.to_thread(_append_line, settings.TRACING_FILE, json.dumps(payload))
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "exporter": settings.TRACING_EXPORTER,
+            "sample_rate": settings.TRACING_SAMPLE_RATE,
+            "running": self.running,
+            "queued": len(self._queue),
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "last_error": self.last_error,
+        }
+
+
+def _append_line(path: str, line: str):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+# Instancia global, iniciada en el lifespan de la aplicación
+span_exporter = SpanExporter()
@@ -1,56 +1,332 @@
 """
-Configuración de base de datos con SQLAlchemy
+Configuración de base de datos con SQLAlchemy (asíncrono)
 """
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
-from sqlalchemy.pool import NullPool
+from datetime import datetime
+from typing import Any, Dict, List
+from sqlalchemy import Index, bindparam, event, inspect, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 import logging
+import time
 
 from app.core.config import settings
+from app.core.metrics import DB_QUERY_DURATION, DB_QUERY_ERRORS, add_stage_time
+from app.core.tracing import KIND_CLIENT, start_span
+from app.db.profiler import query_profiler
+from app.core.phone import normalize_phone
 
 logger = logging.getLogger(__name__)
 
 # Crear base declarativa para modelos ORM
 Base = declarative_base()
 
-# Crear engine de SQLAlchemy
-# NullPool: Para desarrollo/testing (crea nueva conexión cada vez)
-# En producción usar: QueuePool con pool_size y max_overflow
-engine = create_engine(
-    settings.DATABASE_URL,
-    echo=False,  # Set True para ver SQL queries
-    poolclass=NullPool,  # Cambiar a QueuePool en producción
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
-)
+
+def _engine_options() -> Dict[str, Any]:
+    """
+    Construye las opciones del engine según DB_POOL_MODE
+    - "queue": QueuePool con pool_size, max_overflow, recycle, timeout y pre-ping (producción)
+    - "null": NullPool, abre una conexión nueva por sesión (solo dev/testing)
+    """
+    options: Dict[str, Any] = {
+        "echo": False,  # Set True para ver SQL queries
+        "connect_args": {"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {},
+    }
+    
+    if settings.DB_POOL_MODE == "null":
+        options["poolclass"] = NullPool
+        return options
+    
+    if settings.DB_POOL_MODE != "queue":
+        logger.warning("DB_POOL_MODE desconocido '%s', usando 'queue'", settings.DB_POOL_MODE)
+    
+    options.update(
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+    return options
+
+
+# Crear engine asíncrono de SQLAlchemy (asyncpg en PostgreSQL)
+engine = create_async_engine(settings.async_database_url, **_engine_options())
+
+# Contadores acumulados del pool (para dimensionar pool_size / max_overflow)
+_pool_counters = {
+    "connections_opened": 0,
+    "checkouts": 0,
+    "checked_out_peak": 0,
+}
+
+
+@event.listens_for(engine.sync_engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    _pool_counters["connections_opened"] += 1
+
+
+@event.listens_for(engine.sync_engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    _pool_counters["checkouts"] += 1
+    pool = engine.sync_engine.pool
+    checked_out = pool.checkedout() if hasattr(pool, "checkedout") else 0
+    if checked_out > _pool_counters["checked_out_peak"]:
+        _pool_counters["checked_out_peak"] = checked_out
+
+
+def _statement_type(statement: str) -> str:
+    """
+    Tipo de sentencia SQL para las métricas (etiqueta de cardinalidad acotada)
+    """
+    keyword = statement.lstrip()[:6].upper()
+    return keyword if keyword in ("SELECT", "INSERT", "UPDATE", "DELETE") else "OTHER"
+
+
+if settings.METRICS_ENABLED:
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+    
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_started
+        DB_QUERY_DURATION.observe(elapsed, _statement_type(statement))
+        add_stage_time("db", elapsed)
+    
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def _on_query_error(exception_context):
+        DB_QUERY_ERRORS.inc(_statement_type(exception_context.statement or ""))
+
+
+if settings.TRACING_ENABLED:
+    # Un span CLIENT por sentencia, hijo del span de la petición en curso
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _start_query_span(conn, cursor, statement, parameters, context, executemany):
+        operation = _statement_type(statement)
+        context._span = start_span(operation, KIND_CLIENT, {
+            "db.system": conn.dialect.name,
+            "db.operation": operation,
+            "db.statement": statement[:2000],
+        })
+    
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _end_query_span(conn, cursor, statement, parameters, context, executemany):
+        span = getattr(context, "_span", None)
+        if span is not None:
+            if cursor.rowcount is not None and cursor.rowcount >= 0:
+                span.set_attribute("db.rows_affected", cursor.rowcount)
+            span.end()
+    
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def _fail_query_span(exception_context):
+        span = getattr(exception_context.execution_context, "_span", None)
+        if span is not None:
+            span.set_error(str(exception_context.original_exception))
+            span.end()
+
+
+if settings.DB_PROFILING_ENABLED:
+    # Sentencias, tiempo y filas por petición; consultas lentas con su EXPLAIN (ver app/db/profiler.py)
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _start_query_profile(conn, cursor, statement, parameters, context, executemany):
+        context._profile_started = time.perf_counter()
+    
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _record_query_profile(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._profile_started
+        query_profiler.record_query(
+            conn, statement, parameters, executemany, _statement_type(statement), elapsed, cursor.rowcount
+        )
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """
+    Retorna estadísticas del pool de conexiones
+    
+    Returns:
+        Dict con modo, tamaño, conexiones en uso/libres, overflow y contadores acumulados
+    """
+    pool = engine.sync_engine.pool
+    stats: Dict[str, Any] = {
+        "mode": settings.DB_POOL_MODE,
+        "pool_class": type(pool).__name__,
+        **_pool_counters,
+    }
+    
+    # NullPool no mantiene conexiones, por lo que no expone estos métodos
+    if hasattr(pool, "checkedout"):
+        stats.update(
+            pool_size=pool.size(),
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=max(pool.overflow(), 0),
+        )
+    
+    return stats
+
 
 # Session factory
-SessionLocal = sessionmaker(
-    autocommit=False,
+# expire_on_commit=False: los objetos siguen accesibles tras commit sin lazy-load (no permitido en async)
+SessionLocal = async_sessionmaker(
+    bind=engine,
+    class_=AsyncSession,
     autoflush=False,
-    bind=engine
+    expire_on_commit=False
 )
 
 
-def init_db():
+def _add_missing_columns(connection):
+    """
+    Agrega a tablas existentes las columnas nuevas (nullable) declaradas en los modelos
+    """
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=connection.dialect)
+            logger.info("Agregando columna %s.%s", table.name, column.name)
+            connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+
+# Nombre en crm_sync_state que marca el backfill de phone_normalized como hecho
+PHONE_BACKFILL_STATE = "backfill_phone_normalized"
+
+
+def _backfill_phone_normalized(connection, batch_size: int = 1000):
+    """
+    Completa phone_normalized en filas creadas antes de existir la columna (una sola vez)
+    - Recorre los contactos por páginas de batch_size (keyset sobre id), sin cargarlos todos
+    - Al terminar deja una fila en crm_sync_state: los arranques siguientes no vuelven a recorrer
+      los teléfonos que no se pueden normalizar (quedan en NULL)
+    """
+    from app.models.sync_state import CRMSyncState
+    
+    state = CRMSyncState.__table__
+    if connection.execute(select(state.c.name).where(state.c.name == PHONE_BACKFILL_STATE)).first():
+        return
+    
+    contacts = Base.metadata.tables["contacts"]
+    stmt = (
+        update(contacts)
+        .where(contacts.c.id == bindparam("row_id"))
+        # Conservar updated_at: es un cambio de esquema, no una edición del contacto
+        .values(phone_normalized=bindparam("value"), updated_at=contacts.c.updated_at)
+    )
+    last_id = 0
+    normalized_count = 0
+    while True:
+        rows = connection.execute(
+            select(contacts.c.id, contacts.c.phone)
+            .where(
+                contacts.c.id > last_id,
+                contacts.c.phone.isnot(None),
+                contacts.c.phone_normalized.is_(None)
+            )
+            .order_by(contacts.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        updates = [
+            {"row_id": row.id, "value": normalized}
+            for row in rows
+            if (normalized := normalize_phone(row.phone))
+        ]
+        if updates:
+            connection.execute(stmt, updates)
+            normalized_count += len(updates)
+    
+    connection.execute(state.insert().values(name=PHONE_BACKFILL_STATE, updated_at=datetime.utcnow()))
+    if normalized_count:
+        logger.info("Teléfonos normalizados en %s contactos existentes", normalized_count)
+
+
+def _missing_indexes(connection) -> List[Index]:
+    """
+    Índices declarados en los modelos que aún no existen en la BD
+    """
+    inspector = inspect(connection)
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        missing.extend(index for index in table.indexes if index.name not in existing)
+    return missing
+
+
+def _create_missing_indexes(connection):
+    """
+    Crea los índices declarados en los modelos que aún no existen en la BD (salvo PostgreSQL,
+    donde se crean fuera de la transacción con _create_missing_indexes_concurrently)
+    """
+    if connection.dialect.name == "postgresql":
+        return
+    for index in _missing_indexes(connection):
+        index.create(connection)
+
+
+async def _create_missing_indexes_concurrently():
+    """
+    Crea en PostgreSQL los índices que faltan con CREATE INDEX CONCURRENTLY, en autocommit:
+    no bloquea las escrituras sobre la tabla mientras se construye (ej. trigram de contacts.name)
+    Un índice que quedó inválido por una creación concurrente interrumpida se elimina y se crea de nuevo
+    """
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        invalid = set((await conn.execute(text(
+            "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE NOT i.indisvalid"
+        ))).scalars().all())
+        declared = {index.name for table in Base.metadata.sorted_tables for index in table.indexes}
+        for name in invalid & declared:
+            logger.warning("Índice %s inválido (creación concurrente interrumpida), se crea de nuevo", name)
+            await conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+        
+        for index in await conn.run_sync(_missing_indexes):
+            logger.info("Creando índice %s (CONCURRENTLY)", index.name)
+            options = index.dialect_options["postgresql"]
+            concurrently = options["concurrently"]
+            options["concurrently"] = True
+            try:
+                await conn.run_sync(index.create)
+            finally:
+                options["concurrently"] = concurrently
+
+
+async def init_db():
     """
     Inicializa la base de datos creando todas las tablas
     """
     try:
         logger.info("Creando tablas en base de datos...")
-        Base.metadata.create_all(bind=engine)
+        async with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                # Necesaria para el índice trigram de búsqueda por nombre
+                await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            await conn.run_sync(Base.metadata.create_all)
+            # create_all no agrega columnas ni índices nuevos a tablas existentes
+            await conn.run_sync(_add_missing_columns)
+            await conn.run_sync(_backfill_phone_normalized)
+            await conn.run_sync(_create_missing_indexes)
+        if engine.dialect.name == "postgresql":
+            await _create_missing_indexes_concurrently()
         logger.info("Base de datos inicializada correctamente")
     except Exception as e:
-        logger.error(f"Error inicializando base de datos: {e}")
+        logger.error("Error inicializando base de datos: %s", e)
         raise
 
 
-def close_db():
+async def close_db():
     """
     Cierra la conexión a la base de datos
     """
     try:
         logger.info("Cerrando conexión a base de datos...")
-        engine.dispose()
+        await engine.dispose()
         logger.info("Conexión cerrada")
     except Exception as e:
-        logger.error(f"Error cerrando conexión: {e}")
+        logger.error("Error cerrando conexión: %s", e)
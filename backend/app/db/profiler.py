@@ -0,0 +1,245 @@
+"""
+Perfilado de sentencias SQL (DB_PROFILING_ENABLED)
+- Por petición HTTP: número de sentencias, tiempo y filas, con un resumen al terminar
+- Log de consultas lentas (> DB_SLOW_QUERY_MS) con su plan de ejecución (EXPLAIN)
+- Detección de patrones N+1: la misma sentencia o varias SELECT sobre una tabla repetidas en una petición
+Los hooks sobre los eventos del engine se registran en app/db/base.py
+"""
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+import logging
+import re
+
+from app.core.config import settings
+from app.core.security import correlation_id_var
+
+logger = logging.getLogger(__name__)
+
+# Máximo de caracteres de una sentencia en logs y estadísticas
+MAX_STATEMENT_LENGTH = 2000
+
+# Prefijo de EXPLAIN por dialecto (sin ANALYZE: no vuelve a ejecutar la sentencia)
+EXPLAIN_PREFIX = {
+    "postgresql": "EXPLAIN ",
+    "sqlite": "EXPLAIN QUERY PLAN ",
+    "mysql": "EXPLAIN ",
+}
+
+# Marcadores de parámetros ($1::VARCHAR, ?, %(name)s, :name) y listas IN expandidas
+_PARAMETER = re.compile(r"\$\d+(?:::[\w ]+(?:\[\])?)?|%\(\w+\)s|(?<!:):\w+|\?")
+_PARAMETER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_FROM_TABLE = re.compile(r"\bFROM\s+\"?(\w+)\"?", re.IGNORECASE)
+_LIMIT = re.compile(r"\bLIMIT\b", re.IGNORECASE)
+
+
+def fingerprint(statement: str) -> str:
+    """
+    Forma normalizada de una sentencia: mismos marcadores de parámetros y listas IN de cualquier largo
+    Dos ejecuciones con el mismo fingerprint solo difieren en los valores
+    """
+    normalized = _PARAMETER.sub("?", statement)
+    normalized = _PARAMETER_LIST.sub("(?, ...)", normalized)
+    return " ".join(normalized.split())
+
+
+def _truncate(statement: str) -> str:
+    statement = " ".join(statement.split())
+    if len(statement) > MAX_STATEMENT_LENGTH:
+        return statement[:MAX_STATEMENT_LENGTH] + "..."
+    return statement
+
+
+class QueryProfile:
+    """
+    Sentencias SQL ejecutadas durante una petición
+    """
+    
+    __slots__ = ("statements", "duration", "rows", "slow", "_fingerprints", "_tables")
+    
+    def __init__(self):
+        self.statements = 0
+        self.duration = 0.0
+        self.rows = 0
+        self.slow = 0
+        # fingerprint -> [ejecuciones, tiempo acumulado]
+        self._fingerprints: Dict[str, List[Any]] = {}
+        # tabla -> búsquedas puntuales (SELECT con LIMIT) ejecutadas sobre ella
+        self._tables: Dict[str, int] = {}
+    
+    def record(self, statement: str, operation: str, elapsed: float, rows: Optional[int]):
+        self.statements += 1
+        self.duration += elapsed
+        if rows is not None and rows >= 0:
+            self.rows += rows
+        entry = self._fingerprints.setdefault(fingerprint(statement), [0, 0.0])
+        entry[0] += 1
+        entry[1] += elapsed
+        if operation == "SELECT" and _LIMIT.search(statement):
+            match = _FROM_TABLE.search(statement)
+            if match:
+                table = match.group(1)
+                self._tables[table] = self._tables.get(table, 0) + 1
+    
+    def n_plus_one(self, threshold: int) -> List[Dict[str, Any]]:
+        """
+        Patrones N+1 de la petición
+        - "repeated_statement": la misma sentencia ejecutada threshold veces o más con distintos valores
+        - "repeated_table": threshold búsquedas puntuales (SELECT con LIMIT) o más sobre una tabla
+          (ej. buscar por email, luego por nombre, luego por teléfono) que podrían ser una sola consulta
+        Las consultas por lotes sin LIMIT (ej. search_local_many) no cuentan como búsquedas puntuales
+        """
+        patterns = []
+        repeated_tables = set()
+        for statement, (count, elapsed) in self._fingerprints.items():
+            if count >= threshold and statement.lstrip()[:6].upper() == "SELECT":
+                match = _FROM_TABLE.search(statement)
+                if match:
+                    repeated_tables.add(match.group(1))
+                patterns.append({
+                    "pattern": "repeated_statement",
+                    "count": count,
+                    "duration_ms": round(elapsed * 1000, 2),
+                    "statement": _truncate(statement),
+                })
+        for table, count in self._tables.items():
+            if count >= threshold and table not in repeated_tables:
+                patterns.append({"pattern": "repeated_table", "count": count, "table": table})
+        return patterns
+
+
+# Perfil de la petición HTTP en curso (None fuera de una petición o sin DB_PROFILING_ENABLED)
+query_profile: ContextVar[Optional[QueryProfile]] = ContextVar("query_profile", default=None)
+
+
+class QueryProfiler:
+    """
+    Acumula los perfiles de todas las peticiones y registra las consultas lentas
+    """
+    
+    def __init__(self):
+        self.requests = 0
+        self.statements = 0
+        self.slow_queries = 0
+        self.n_plus_one_requests = 0
+        self.slowest: Optional[Dict[str, Any]] = None
+    
+    def start_request(self) -> Optional[QueryProfile]:
+        """
+        Abre el perfil de una petición (None si el perfilado está desactivado)
+        """
+        if not settings.DB_PROFILING_ENABLED:
+            return None
+        return QueryProfile()
+    
+    def record_query(self, connection, statement: str, parameters: Any, executemany: bool,
+                     operation: str, elapsed: float, rows: Optional[int]):
+        """
+        Registra una sentencia ejecutada (desde after_cursor_execute)
+        
+        Args:
+            connection: Connection de SQLAlchemy que ejecutó la sentencia
+            statement: SQL enviado al driver
+            parameters: Parámetros enviados al driver
+            executemany: Si fue una ejecución por lotes
+            operation: Tipo de sentencia (SELECT, INSERT, UPDATE, DELETE, OTHER)
+            elapsed: Segundos de ejecución
+            rows: rowcount del driver (-1 o None si no lo informa, ej. SELECT en SQLite)
+        """
+        self.statements += 1
+        profile = query_profile.get()
+        if profile is not None:
+            profile.record(statement, operation, elapsed, rows)
+        
+        elapsed_ms = elapsed * 1000
+        if elapsed_ms < settings.DB_SLOW_QUERY_MS:
+            return
+        
+        self.slow_queries += 1
+        if profile is not None:
+            profile.slow += 1
+        if self.slowest is None or elapsed_ms > self.slowest["duration_ms"]:
+            self.slowest = {
+                "duration_ms": round(elapsed_ms, 2),
+                "statement": _truncate(statement),
+                "correlation_id": correlation_id_var.get(),
+            }
+        
+        plan = None
+        if settings.DB_SLOW_QUERY_EXPLAIN and not executemany and operation in ("SELECT", "UPDATE", "DELETE"):
+            plan = self._explain(connection, statement, parameters)
+        logger.warning(
+            "Consulta lenta (%.1f ms, %s filas): %s%s",
+            elapsed_ms, rows if rows is not None and rows >= 0 else "?", _truncate(statement),
+            f"\nPlan:\n{plan}" if plan else "",
+            extra={"db_duration_ms": round(elapsed_ms, 2), "db_statement_type": operation},
+        )
+    
+    def _explain(self, connection, statement: str, parameters: Any) -> Optional[str]:
+        """
+        Plan de ejecución de una sentencia con EXPLAIN en la misma conexión
+        Usa un cursor del driver: no dispara los eventos del engine ni vuelve a ejecutar la sentencia
+        """
+        prefix = EXPLAIN_PREFIX.get(connection.dialect.name)
+        if prefix is None:
+            return None
+        try:
+            cursor = connection.connection.cursor()
+            try:
+                cursor.execute(prefix + statement, parameters)
+                return "\n".join(str(row[-1]) for row in cursor.fetchall())
+            finally:
+                cursor.close()
+        except Exception as e:
+            logger.debug("No se pudo obtener el plan de la consulta: %s", e)
+            return None
+    
+    def finish_request(self, profile: QueryProfile, method: str, route: str):
+        """
+        Registra el resumen SQL de una petición y los patrones N+1 detectados
+        """
+        self.requests += 1
+        if not profile.statements:
+            return
+        
+        logger.info(
+            "SQL %s %s: %s sentencias, %.1f ms, %s filas, %s lentas",
+            method, route, profile.statements, profile.duration * 1000, profile.rows, profile.slow,
+            extra={
+                "db_statements": profile.statements,
+                "db_duration_ms": round(profile.duration * 1000, 2),
+                "db_rows": profile.rows,
+                "db_slow_queries": profile.slow,
+            },
+        )
+        
+        patterns = profile.n_plus_one(settings.DB_N_PLUS_ONE_THRESHOLD)
+        if patterns:
+            self.n_plus_one_requests += 1
+        for pattern in patterns:
+            if pattern["pattern"] == "repeated_statement":
+                logger.warning(
+                    "Posible N+1 en %s %s: la misma consulta se ejecutó %s veces (%.1f ms): %s",
+                    method, route, pattern["count"], pattern["duration_ms"], pattern["statement"],
+                    extra={"db_n_plus_one": pattern},
+                )
+            else:
+                logger.warning(
+                    "Posible N+1 en %s %s: %s búsquedas puntuales sobre la tabla %s en una sola petición",
+                    method, route, pattern["count"], pattern["table"],
+                    extra={"db_n_plus_one": pattern},
+                )
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "slow_query_ms": settings.DB_SLOW_QUERY_MS,
+            "n_plus_one_threshold": settings.DB_N_PLUS_ONE_THRESHOLD,
+            "requests": self.requests,
+            "statements": self.statements,
+            "slow_queries": self.slow_queries,
+            "n_plus_one_requests": self.n_plus_one_requests,
+            "slowest": self.slowest,
+        }
+
+
+# Instancia global (los hooks del engine y el middleware la comparten)
+query_profiler = QueryProfiler()
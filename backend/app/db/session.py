@@ -1,18 +1,15 @@
 """
 Gestión de sesiones de base de datos con SQLAlchemy
 """
-from typing import AsyncGenerator, Generator
-from sqlalchemy.orm import Session
+from typing import AsyncGenerator
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.base import SessionLocal, init_db, close_db
 
 
-def get_db() -> Generator[Session, None, None]:
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
-    Dependencia para inyectar la sesión de base de datos en endpoints
-    Uso: db: Session = Depends(get_db)
+    Dependencia para inyectar la sesión asíncrona de base de datos en endpoints
+    Uso: db: AsyncSession = Depends(get_db)
     """
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -9,14 +9,17 @@ from contextlib import asynccontextmanager
 
 from app.core.config import settings
 from app.core.dependencies import add_correlation_id
+from app.core.logging_config import configure_logging
+from app.core.tracing import span_exporter
 from app.api.v1 import router as v1_router
+from app.api.metrics import router as metrics_router
 from app.db.base import init_db, close_db
+from app.core.crm_client import init_crm_client, close_crm_client
+from app.services.crm_sync_worker import crm_sync_worker
+from app.services.crm_mirror_sync import crm_mirror_sync
 
-# Configurar logging
-logging.basicConfig(
-    level=getattr(logging, settings.LOG_LEVEL),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+# Configurar logging (LOG_FORMAT, LOG_QUEUE_ENABLED, LOG_SAMPLING)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 
@@ -25,32 +28,52 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     """
     Maneja el ciclo de vida de la aplicación
-    - Startup: Inicializa la base de datos PostgreSQL
-    - Shutdown: Cierra las conexiones
+    - Startup: Inicializa la base de datos PostgreSQL, el cliente HTTP de Pipedrive,
+      el worker de sincronización del outbox y la sincronización del espejo local
+    - Shutdown: Detiene los jobs en segundo plano y cierra las conexiones
     """
     # Startup
     logger.info("Iniciando aplicación...")
-    logger.info(f"CRM configurado: {settings.crm_configured}")
-    logger.info(f"Modo mock: {settings.is_mock_mode}")
+    logger.info("CRM configurado: %s", settings.crm_configured)
+    logger.info("Modo mock: %s", settings.is_mock_mode)
     logger.info("Inicializando base de datos PostgreSQL...")
     
     try:
         # Inicializar BD (crea tablas si no existen)
-        init_db()
+        await init_db()
         logger.info("✓ Base de datos inicializada correctamente")
     except Exception as e:
-        logger.error(f"✗ Error al inicializar base de datos: {e}")
+        logger.error("✗ Error al inicializar base de datos: %s", e)
         raise
     
+    # Cliente HTTP compartido (keep-alive) para Pipedrive
+    init_crm_client()
+    
+    # Exportación de trazas en segundo plano
+    if settings.TRACING_ENABLED:
+        span_exporter.start()
+    
+    # Worker que sincroniza el outbox con Pipedrive en segundo plano
+    if settings.OUTBOX_WORKER_ENABLED:
+        crm_sync_worker.start()
+    
+    # Job que trae a la BD local las personas modificadas en Pipedrive
+    if settings.CRM_MIRROR_SYNC_ENABLED:
+        crm_mirror_sync.start()
+    
     yield
     
     # Shutdown
     logger.info("Cerrando aplicación...")
+    await crm_mirror_sync.stop()
+    await crm_sync_worker.stop()
+    await close_crm_client()
+    await span_exporter.stop()
     try:
-        close_db()
+        await close_db()
         logger.info("✓ Conexiones de base de datos cerradas")
     except Exception as e:
-        logger.error(f"✗ Error al cerrar base de datos: {e}")
+        logger.error("✗ Error al cerrar base de datos: %s", e)
 
 
 # Crear aplicación FastAPI
@@ -77,6 +100,10 @@ app.middleware("http")(add_correlation_id)
 # Incluir routers
 app.include_router(v1_router)
 
+# Métricas de Prometheus
+if settings.METRICS_ENABLED:
+    app.include_router(metrics_router)
+
 
 # Endpoint raíz
 @app.get("/")
@@ -1,8 +1,10 @@
 """
 Modelos ORM para contactos usando SQLAlchemy
 """
-from sqlalchemy import Column, Integer, String, DateTime, func
+from sqlalchemy import Column, Integer, String, DateTime, Index, func
+from sqlalchemy.orm import validates
 from datetime import datetime
+from app.core.phone import normalize_phone
 from app.db.base import Base
 
 
@@ -12,15 +14,34 @@ class Contact(Base):
     Tabla: contacts
     """
     __tablename__ = "contacts"
+    __table_args__ = (
+        # Índice trigram (pg_trgm) para búsquedas parciales por nombre (ILIKE '%q%')
+        Index(
+            "ix_contacts_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+    # Recupera id/created_at/updated_at con RETURNING en el mismo INSERT/UPDATE
+    __mapper_args__ = {"eager_defaults": True}
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False, index=True)
     email = Column(String(255), unique=True, index=True, nullable=True)
     phone = Column(String(20), nullable=True)
+    phone_normalized = Column(String(20), nullable=True, index=True)  # E.164, clave de búsqueda
     crm_id = Column(Integer, unique=True, nullable=True, index=True)  # ID en Pipedrive
+    crm_update_time = Column(DateTime, nullable=True, index=True)  # update_time en Pipedrive (cursor del espejo)
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
     
+    @validates("phone")
+    def _normalize_phone(self, key, value):
+        """Mantiene phone_normalized sincronizado con el teléfono original"""
+        self.phone_normalized = normalize_phone(value)
+        return value
+    
     def __repr__(self):
         return f"<Contact(id={self.id}, name='{self.name}', email='{self.email}', crm_id={self.crm_id})>"
     
@@ -0,0 +1,28 @@
+"""
+Modelo ORM de las claves de idempotencia
+"""
+from sqlalchemy import Column, String, DateTime, JSON
+from datetime import datetime
+from app.db.base import Base
+
+
+class IdempotencyKey(Base):
+    """
+    Respuesta guardada de una petición con Idempotency-Key
+    Tabla: idempotency_keys
+    
+    La clave primaria (scope, key) es la restricción única que comparten todos los procesos:
+    solo el que inserta la fila ejecuta la operación. response es NULL mientras está en curso;
+    se guarda en la misma transacción que los cambios de la operación.
+    """
+    __tablename__ = "idempotency_keys"
+    
+    scope = Column(String(64), primary_key=True)  # ej. "POST /contact"
+    key = Column(String(255), primary_key=True)  # valor de la cabecera Idempotency-Key
+    fingerprint = Column(String(64), nullable=False)  # sha256 del cuerpo de la petición
+    token = Column(String(32), nullable=True)  # identifica la reserva: solo su dueño puede completarla
+    response = Column(JSON, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f"<IdempotencyKey(scope='{self.scope}', key='{self.key}', done={self.response is not None})>"
@@ -0,0 +1,43 @@
+"""
+Modelo ORM para notas de contactos
+"""
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
+from datetime import datetime
+from app.db.base import Base
+
+
+class Note(Base):
+    """
+    Nota de un contacto, guardada localmente y enviada a Pipedrive en segundo plano
+    Tabla: notes
+    """
+    __tablename__ = "notes"
+    __table_args__ = (
+        # El flusher busca status='pending' AND next_attempt_at <= ahora
+        Index("ix_notes_status_next_attempt", "status", "next_attempt_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    contact_id = Column(Integer, ForeignKey("contacts.id", ondelete="CASCADE"), nullable=False, index=True)
+    content = Column(Text, nullable=False)
+    crm_note_id = Column(Integer, nullable=True)  # ID de la nota en Pipedrive
+    status = Column(String(16), nullable=False, default="pending")  # pending | synced | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    synced_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<Note(id={self.id}, contact_id={self.contact_id}, status='{self.status}')>"
+    
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "contact_id": self.contact_id,
+            "content": self.content,
+            "crm_note_id": self.crm_note_id,
+            "status": self.status,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "synced_at": self.synced_at.isoformat() if self.synced_at else None,
+        }
@@ -0,0 +1,35 @@
+"""
+Modelo ORM del outbox de sincronización con el CRM
+"""
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, ForeignKey, Index
+from datetime import datetime
+from app.db.base import Base
+
+
+class CRMOutbox(Base):
+    """
+    Operación pendiente de sincronizar con Pipedrive
+    Tabla: crm_outbox
+    
+    Se escribe en la misma transacción que el cambio local del contacto;
+    el worker de sincronización la procesa después con reintentos.
+    """
+    __tablename__ = "crm_outbox"
+    __table_args__ = (
+        # El worker busca status='pending' AND next_attempt_at <= ahora
+        Index("ix_crm_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    contact_id = Column(Integer, ForeignKey("contacts.id", ondelete="CASCADE"), nullable=False, index=True)
+    operation = Column(String(32), nullable=False)  # create_person | update_person | add_note
+    payload = Column(JSON, nullable=True)
+    status = Column(String(16), nullable=False, default="pending")  # pending | done | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    processed_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<CRMOutbox(id={self.id}, operation='{self.operation}', contact_id={self.contact_id}, status='{self.status}')>"
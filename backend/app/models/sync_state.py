@@ -0,0 +1,26 @@
+"""
+Modelo ORM del estado de los jobs de sincronización con el CRM
+"""
+from sqlalchemy import Column, String, DateTime
+from datetime import datetime
+from app.db.base import Base
+
+
+class CRMSyncState(Base):
+    """
+    Marca de agua (high-water mark) de un job de sincronización
+    Tabla: crm_sync_state
+    
+    Solo la escribe el job dueño del cursor: webhooks y búsquedas también guardan
+    crm_update_time en contacts, por lo que el cursor no puede leerse de esa tabla.
+    También guarda las marcas de migraciones de datos de una sola vez (ej. "backfill_phone_normalized"),
+    sin cursor: la fila indica que ya se ejecutó.
+    """
+    __tablename__ = "crm_sync_state"
+    
+    name = Column(String(64), primary_key=True)  # ej. "persons_mirror"
+    cursor = Column(DateTime, nullable=True)  # update_time de Pipedrive (UTC) ya aplicado
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<CRMSyncState(name='{self.name}', cursor={self.cursor})>"
@@ -2,17 +2,167 @@
 Repository para contactos - Capa de acceso a datos
 Maneja tanto la base de datos local (PostgreSQL) como la API de Pipedrive
 """
-from typing import Optional, Dict, Any, List
-from sqlalchemy.orm import Session
+from typing import Optional, Dict, Any, AsyncIterator, Awaitable, Callable, Iterable, List, Tuple, Union
+from datetime import datetime, timezone
+from sqlalchemy import case, delete, false, insert, literal_column, or_, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
-import requests
 import logging
 
+from app.core.cache import MISSING, TTLCache
+from app.core.circuit_breaker import CircuitOpenError
 from app.core.config import settings
+from app.core.crm_client import get_crm_client
+from app.core.phone import normalize_phone
+from app.core.rate_limiter import HIGH, RateLimitExceeded
 from app.models.contact import Contact
+from app.models.note import Note
 
 logger = logging.getLogger(__name__)
 
+# Caché compartida de resultados de /persons/search (clave: query normalizada)
+crm_search_cache = TTLCache(
+    max_size=settings.CRM_CACHE_MAX_SIZE,
+    ttl=settings.CRM_CACHE_TTL
+)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normaliza una query de búsqueda para usarla como clave de caché
+    """
+    return " ".join(query.split()).lower()
+
+
+def invalidate_person_cache(crm_id: Optional[int] = None, *terms: Optional[str]) -> int:
+    """
+    Invalida las búsquedas cacheadas que contienen a una persona o coinciden con sus datos
+    
+    Args:
+        crm_id: ID en Pipedrive (elimina toda búsqueda cuyo resultado lo incluya)
+        *terms: Nombre, email, teléfono... (elimina las búsquedas con esa query, incluidas las negativas)
+        
+    Returns:
+        Número de entradas eliminadas
+    """
+    removed = 0
+    if crm_id is not None:
+        removed += crm_search_cache.delete_where(
+            lambda persons: any(person.get("id") == crm_id for person in persons)
+        )
+    for term in terms:
+        if term:
+            removed += int(crm_search_cache.delete(normalize_query(str(term))))
+    return removed
+
+
+def person_field_values(person: Dict[str, Any], *keys: str) -> List[str]:
+    """
+    Extrae los valores de emails/teléfonos de una persona de Pipedrive
+    Soporta listas de strings (/persons/search) y de dicts con "value" (/persons)
+    """
+    values = []
+    for key in keys:
+        for entry in person.get(key) or []:
+            value = entry.get("value") if isinstance(entry, dict) else entry
+            if value:
+                values.append(str(value))
+    return values
+
+
+def invalidate_persons_cache(crm_ids: Iterable[int]) -> int:
+    """
+    Invalida de una sola pasada las búsquedas cacheadas que incluyen alguna de las personas
+    
+    Returns:
+        Número de entradas eliminadas
+    """
+    crm_ids = set(crm_ids)
+    if not crm_ids:
+        return 0
+    return crm_search_cache.delete_where(
+        lambda persons: any(person.get("id") in crm_ids for person in persons)
+    )
+
+
+def parse_crm_time(value: Optional[str]) -> Optional[datetime]:
+    """
+    Convierte un update_time de Pipedrive ("2024-01-31 12:00:00" o ISO 8601) a datetime UTC sin zona
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+# Nombre de una persona de Pipedrive sin nombre (contacts.name es NOT NULL)
+UNNAMED_PERSON = "Sin nombre"
+
+
+def person_to_row(person: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convierte una persona de Pipedrive en los campos de la tabla contacts
+    """
+    return {
+        "crm_id": person["id"],
+        "name": person.get("name") or "",
+        "email": next(iter(person_field_values(person, "emails", "email")), None),
+        "phone": next(iter(person_field_values(person, "phones", "phone")), None),
+        "crm_update_time": parse_crm_time(person.get("update_time")),
+    }
+
+
+def _escape_like(value: str) -> str:
+    """
+    Escapa los comodines de LIKE para buscar el texto literal
+    """
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _digits(value: str) -> str:
+    return "".join(ch for ch in value if ch.isdigit())
+
+
+def match_email(persons: List[Dict[str, Any]], email: str) -> Optional[Dict[str, Any]]:
+    """
+    Retorna la persona con email exactamente igual (sin distinguir mayúsculas)
+    """
+    needle = email.strip().lower()
+    for person in persons:
+        if needle in (value.lower() for value in person_field_values(person, "emails", "email")):
+            return person
+    return None
+
+
+def match_phone(persons: List[Dict[str, Any]], phone: str) -> Optional[Dict[str, Any]]:
+    """
+    Retorna la persona cuyo teléfono coincide en dígitos (tolera prefijo de país)
+    """
+    needle = _digits(phone)
+    if len(needle) < 7:
+        return None
+    for person in persons:
+        for value in person_field_values(person, "phones", "phone"):
+            digits = _digits(value)
+            if len(digits) >= 7 and (digits.endswith(needle) or needle.endswith(digits)):
+                return person
+    return None
+
+
+def match_person(persons: List[Dict[str, Any]], query: str) -> Optional[Dict[str, Any]]:
+    """
+    Resuelve una búsqueda sobre un único resultado de Pipedrive
+    Prioridad: email exacto > teléfono > primer resultado por nombre
+    """
+    if not persons:
+        return None
+    return match_email(persons, query) or match_phone(persons, query) or persons[0]
+
 
 class ContactRepository:
     """
@@ -21,15 +171,17 @@ class ContactRepository:
     - Sincroniza con Pipedrive API cuando está disponible
     """
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
         self.base_url = settings.PIPEDRIVE_BASE_URL
         self.api_key = settings.PIPEDRIVE_API_KEY
+        self.crm = get_crm_client()
     
     # ================== OPERACIONES CON BD LOCAL ==================
     
-    def create_local(self, name: str, email: Optional[str] = None, 
-                    phone: Optional[str] = None, crm_id: Optional[int] = None) -> Contact:
+    async def create_local(self, name: str, email: Optional[str] = None, 
+                    phone: Optional[str] = None, crm_id: Optional[int] = None,
+                    commit: bool = True) -> Contact:
         """
         Crea un contacto en la base de datos local PostgreSQL
         
@@ -38,6 +190,7 @@ class ContactRepository:
             email: Email (opcional)
             phone: Teléfono (opcional)
             crm_id: ID en Pipedrive (opcional)
+            commit: Si es False solo hace flush (obtiene el id) y el llamador confirma la transacción
             
         Returns:
             Contact: Objeto Contact creado
@@ -49,122 +202,447 @@ class ContactRepository:
                 phone=phone,
                 crm_id=crm_id
             )
+            # eager_defaults: id y timestamps vuelven en el INSERT ... RETURNING, sin refresh()
             self.db.add(contact)
-            self.db.commit()
-            self.db.refresh(contact)
-            logger.info(f"Contacto creado en BD: {contact.id} - {name}")
+            if commit:
+                await self.db.commit()
+            else:
+                await self.db.flush()
+            logger.info("Contacto creado en BD: %s - %s", contact.id, name)
             return contact
         except IntegrityError as e:
-            self.db.rollback()
-            logger.error(f"Error de integridad al crear contacto: {e}")
+            await self.db.rollback()
+            logger.error("Error de integridad al crear contacto: %s", e)
             raise
         except Exception as e:
-            self.db.rollback()
-            logger.error(f"Error creando contacto en BD: {e}")
+            await self.db.rollback()
+            logger.error("Error creando contacto en BD: %s", e)
             raise
     
-    def get_by_id(self, contact_id: int) -> Optional[Contact]:
+    async def bulk_create_local(
+        self, rows: List[Dict[str, Any]],
+        before_commit: Optional[Callable[[List[int]], Awaitable[Any]]] = None
+    ) -> List[Optional[int]]:
+        """
+        Crea varios contactos con un INSERT multi-fila y un solo commit
+        Si el lote viola una restricción única, reintenta fila por fila para aislar las filas inválidas
+        
+        Args:
+            rows: Dicts con name, email, phone y crm_id
+            before_commit: Se llama con los IDs insertados antes de cada commit, en la misma
+                transacción (ej. para registrar las entradas del outbox junto con los contactos)
+            
+        Returns:
+            IDs creados en el mismo orden que `rows` (None para las filas que fallaron)
+        """
+        if not rows:
+            return []
+        
+        values = [
+            {
+                "name": row["name"],
+                "email": row.get("email"),
+                "phone": row.get("phone"),
+                "phone_normalized": normalize_phone(row.get("phone")),
+                "crm_id": row.get("crm_id"),
+            }
+            for row in rows
+        ]
+        
+        try:
+            result = await self.db.execute(
+                insert(Contact).returning(Contact.id, sort_by_parameter_order=True),
+                values
+            )
+            ids = list(result.scalars().all())
+            if before_commit is not None:
+                await before_commit(ids)
+            await self.db.commit()
+            logger.info("%s contactos creados en BD (inserción masiva)", len(ids))
+            return ids
+        except IntegrityError as e:
+            await self.db.rollback()
+            logger.warning("Conflicto en inserción masiva, reintentando fila por fila: %s", e)
+        
+        ids: List[Optional[int]] = []
+        for value in values:
+            try:
+                result = await self.db.execute(insert(Contact).returning(Contact.id), value)
+                contact_id = result.scalar_one()
+                if before_commit is not None:
+                    await before_commit([contact_id])
+                await self.db.commit()
+                ids.append(contact_id)
+            except IntegrityError as e:
+                await self.db.rollback()
+                logger.error("Error de integridad al crear contacto %s: %s", value['name'], e)
+                ids.append(None)
+        return ids
+    
+    async def get_by_id(self, contact_id: int) -> Optional[Contact]:
         """
         Obtiene un contacto por su ID en BD
         """
-        return self.db.query(Contact).filter(Contact.id == contact_id).first()
+        return await self.db.get(Contact, contact_id)
+    
+    async def get_many(self, contact_ids: Iterable[int]) -> Dict[int, Contact]:
+        """
+        Obtiene varios contactos por ID (una sola consulta IN)
+        """
+        contact_ids = list(set(contact_ids))
+        if not contact_ids:
+            return {}
+        result = await self.db.execute(select(Contact).where(Contact.id.in_(contact_ids)))
+        return {contact.id: contact for contact in result.scalars().all()}
+    
+    async def get_email_owners(self, emails: Iterable[str]) -> Dict[str, int]:
+        """
+        Retorna el ID del contacto dueño de cada email existente (una sola consulta IN)
+        Los emails que no están en BD no aparecen en el resultado (sirve también para detectar duplicados)
+        """
+        emails = list(set(emails))
+        if not emails:
+            return {}
+        result = await self.db.execute(select(Contact.email, Contact.id).where(Contact.email.in_(emails)))
+        return {email: contact_id for email, contact_id in result.all()}
     
-    def get_by_email(self, email: str) -> Optional[Contact]:
+    async def get_by_email(self, email: str) -> Optional[Contact]:
         """
         Obtiene un contacto por email en BD
         """
-        return self.db.query(Contact).filter(Contact.email == email).first()
+        result = await self.db.execute(select(Contact).where(Contact.email == email).limit(1))
+        return result.scalars().first()
     
-    def get_by_crm_id(self, crm_id: int) -> Optional[Contact]:
+    async def get_by_crm_id(self, crm_id: int) -> Optional[Contact]:
         """
         Obtiene un contacto por su ID en Pipedrive
         """
-        return self.db.query(Contact).filter(Contact.crm_id == crm_id).first()
+        result = await self.db.execute(select(Contact).where(Contact.crm_id == crm_id).limit(1))
+        return result.scalars().first()
+    
+    async def search_local(self, query: str) -> Optional[Contact]:
+        """
+        Busca un contacto en BD por email exacto, teléfono (E.164) o nombre parcial en una sola consulta
+        Prioridad: email > teléfono > nombre (el ILIKE usa el índice trigram en PostgreSQL)
+        
+        Args:
+            query: String de búsqueda
+            
+        Returns:
+            Contact con mejor coincidencia o None
+        """
+        name_pattern = f"%{_escape_like(query)}%"
+        # Si la query no parece un teléfono, la condición queda en falso y no se evalúa
+        phone_key = normalize_phone(query)
+        phone_match = Contact.phone_normalized == phone_key if phone_key else false()
+        rank = case(
+            (Contact.email == query, 0),
+            (phone_match, 1),
+            else_=2
+        )
+        result = await self.db.execute(
+            select(Contact)
+            .where(or_(
+                Contact.email == query,
+                phone_match,
+                Contact.name.ilike(name_pattern, escape="\\")
+            ))
+            .order_by(rank, Contact.id)
+            .limit(1)
+        )
+        return result.scalars().first()
     
-    def get_by_name(self, name: str) -> Optional[Contact]:
+    async def search_local_many(self, queries: List[str]) -> Dict[str, Contact]:
         """
-        Busca contactos por nombre (contiene)
+        Resuelve varias búsquedas con la misma prioridad que search_local, en máximo tres consultas
+        - Emails: un IN sobre email
+        - Teléfonos: un IN sobre phone_normalized
+        - Nombres (queries aún sin resultado): un UNION ALL de ILIKE con LIMIT 1 cada uno
+        
+        Args:
+            queries: Strings de búsqueda
+            
+        Returns:
+            Dict query -> Contact (solo las queries con resultado)
+        """
+        queries = list(dict.fromkeys(queries))
+        found: Dict[str, Contact] = {}
+        if not queries:
+            return found
+        
+        result = await self.db.execute(select(Contact).where(Contact.email.in_(queries)))
+        by_email = {contact.email: contact for contact in result.scalars().all()}
+        found.update({query: by_email[query] for query in queries if query in by_email})
+        
+        phone_keys = {
+            query: key for query in queries
+            if query not in found and (key := normalize_phone(query))
+        }
+        if phone_keys:
+            result = await self.db.execute(
+                select(Contact)
+                .where(Contact.phone_normalized.in_(set(phone_keys.values())))
+                .order_by(Contact.id)
+            )
+            by_phone: Dict[str, Contact] = {}
+            for contact in result.scalars().all():
+                by_phone.setdefault(contact.phone_normalized, contact)
+            found.update({query: by_phone[key] for query, key in phone_keys.items() if key in by_phone})
+        
+        pending = [query for query in queries if query not in found]
+        if pending:
+            # Una subconsulta por nombre (usa el índice trigram) con la posición de la query
+            # (entero literal: asyncpg no infiere el tipo de un parámetro dentro de UNION)
+            subqueries = [
+                select(Contact.id.label("contact_id"), literal_column(str(position)).label("position"))
+                .where(Contact.name.ilike(f"%{_escape_like(query)}%", escape="\\"))
+                .order_by(Contact.id)
+                .limit(1)
+                .subquery()
+                for position, query in enumerate(pending)
+            ]
+            matches = union_all(*[select(sub.c.contact_id, sub.c.position) for sub in subqueries]).subquery()
+            result = await self.db.execute(
+                select(Contact, matches.c.position).join(matches, Contact.id == matches.c.contact_id)
+            )
+            for contact, position in result.all():
+                found[pending[position]] = contact
+        
+        return found
+    
+    async def get_many_by_crm_ids(self, crm_ids: Iterable[int]) -> Dict[int, Contact]:
+        """
+        Obtiene varios contactos por su ID en Pipedrive (una sola consulta IN)
+        """
+        crm_ids = list(set(crm_ids))
+        if not crm_ids:
+            return {}
+        result = await self.db.execute(select(Contact).where(Contact.crm_id.in_(crm_ids)))
+        return {contact.crm_id: contact for contact in result.scalars().all()}
+    
+    async def get_all(self, after_id: int = 0, limit: int = 100) -> List[Contact]:
+        """
+        Obtiene contactos con paginación keyset (id > after_id), costo constante por página
+        
+        Args:
+            after_id: Último ID de la página anterior (0 para la primera)
+            limit: Tamaño de página
+        """
+        result = await self.db.execute(
+            select(Contact).where(Contact.id > after_id).order_by(Contact.id).limit(limit)
+        )
+        return list(result.scalars().all())
+    
+    async def stream_all(self, batch_size: int = 1000) -> AsyncIterator[Contact]:
+        """
+        Recorre todos los contactos con un cursor del lado del servidor
+        Trae `batch_size` filas por vez, la memoria no crece con el tamaño de la tabla
         """
-        return self.db.query(Contact).filter(
-            Contact.name.ilike(f"%{name}%")
-        ).first()
+        result = await self.db.stream(
+            select(Contact).order_by(Contact.id).execution_options(yield_per=batch_size)
+        )
+        async for contact in result.scalars():
+            yield contact
     
-    def get_by_phone(self, phone: str) -> Optional[Contact]:
+    async def upsert_from_crm(self, persons: List[Dict[str, Any]]) -> Dict[str, int]:
         """
-        Busca contacto por teléfono
+        Aplica al espejo local un lote de personas de Pipedrive, con un solo commit
+        - Actualiza la fila con el mismo crm_id (si el cambio no es más antiguo que el guardado)
+        - Si no existe, enlaza un contacto local sin crm_id con el mismo email o inserta uno nuevo
+        - Un email que ya pertenece a otro contacto no se copia (restricción única)
+        
+        Args:
+            persons: Personas de Pipedrive (/persons, /recents, /persons/search o webhooks)
+            
+        Returns:
+            Dict con el número de contactos inserted, updated, linked y skipped
         """
-        return self.db.query(Contact).filter(Contact.phone == phone).first()
+        rows: Dict[int, Dict[str, Any]] = {}
+        for person in persons:
+            if person.get("id"):
+                rows[person["id"]] = person_to_row(person)
+        counts = {"inserted": 0, "updated": 0, "linked": 0, "skipped": 0}
+        if not rows:
+            return counts
+        
+        try:
+            result = await self.db.execute(select(Contact).where(Contact.crm_id.in_(list(rows))))
+            by_crm_id = {contact.crm_id: contact for contact in result.scalars().all()}
+            emails = {row["email"] for row in rows.values() if row["email"]}
+            by_email: Dict[str, Contact] = {}
+            if emails:
+                result = await self.db.execute(select(Contact).where(Contact.email.in_(emails)))
+                by_email = {contact.email: contact for contact in result.scalars().all()}
+            
+            for crm_id, row in rows.items():
+                contact = by_crm_id.get(crm_id)
+                owner = by_email.get(row["email"]) if row["email"] else None
+                
+                if contact is not None and contact.crm_update_time and row["crm_update_time"] \
+                        and row["crm_update_time"] < contact.crm_update_time:
+                    counts["skipped"] += 1
+                    continue
+                
+                if contact is None and owner is not None and owner.crm_id is None:
+                    contact = owner
+                    counts["linked"] += 1
+                elif contact is None:
+                    contact = Contact(crm_id=crm_id)
+                    self.db.add(contact)
+                    counts["inserted"] += 1
+                else:
+                    counts["updated"] += 1
+                
+                if owner is not None and owner is not contact:
+                    # Email tomado por otro contacto: se conserva el actual
+                    row["email"] = contact.email
+                
+                contact.crm_id = crm_id
+                # Sin nombre en Pipedrive: se conserva el actual (o un placeholder si es nuevo) para
+                # no violar NOT NULL, que desharía el commit de todo el lote
+                contact.name = row["name"] or contact.name or UNNAMED_PERSON
+                contact.email = row["email"]
+                contact.phone = row["phone"]
+                contact.crm_update_time = row["crm_update_time"] or contact.crm_update_time
+                if contact.email:
+                    by_email[contact.email] = contact
+            
+            await self.db.commit()
+            return counts
+        except Exception as e:
+            await self.db.rollback()
+            logger.error("Error aplicando personas de Pipedrive en BD: %s", e)
+            raise
     
-    def get_all(self, skip: int = 0, limit: int = 100) -> List[Contact]:
+    async def delete_by_crm_ids(self, crm_ids: Iterable[int]) -> int:
         """
-        Obtiene todos los contactos con paginación
+        Elimina del espejo local las personas borradas en Pipedrive (un solo DELETE)
+        
+        Returns:
+            Número de contactos eliminados
         """
-        return self.db.query(Contact).offset(skip).limit(limit).all()
+        crm_ids = list(set(crm_ids))
+        if not crm_ids:
+            return 0
+        try:
+            result = await self.db.execute(delete(Contact).where(Contact.crm_id.in_(crm_ids)))
+            await self.db.commit()
+            return result.rowcount
+        except Exception as e:
+            await self.db.rollback()
+            logger.error("Error eliminando contactos borrados en Pipedrive: %s", e)
+            raise
     
-    def update(self, contact_id: int, **fields) -> Optional[Contact]:
+    async def update(self, contact: Union[Contact, int], commit: bool = True, **fields) -> Optional[Contact]:
         """
-        Actualiza un contacto en BD
+        Actualiza un contacto en BD con un único UPDATE ... RETURNING
         
         Args:
-            contact_id: ID del contacto
+            contact: Contacto ya cargado (evita otro SELECT) o su ID
+            commit: Si es False solo hace flush y el llamador confirma la transacción
             **fields: Campos a actualizar (name, email, phone, crm_id)
             
         Returns:
             Contact actualizado o None
         """
         try:
-            contact = self.get_by_id(contact_id)
-            if not contact:
-                return None
+            if not isinstance(contact, Contact):
+                contact = await self.get_by_id(contact)
+                if not contact:
+                    return None
             
             for key, value in fields.items():
                 if hasattr(contact, key) and key not in ['id', 'created_at']:
                     setattr(contact, key, value)
             
-            self.db.commit()
-            self.db.refresh(contact)
-            logger.info(f"Contacto actualizado: {contact_id}")
+            # eager_defaults: updated_at vuelve en el RETURNING, no hace falta refresh()
+            if commit:
+                await self.db.commit()
+            else:
+                await self.db.flush()
+            logger.info("Contacto actualizado: %s", contact.id)
             return contact
         except Exception as e:
-            self.db.rollback()
-            logger.error(f"Error actualizando contacto: {e}")
+            await self.db.rollback()
+            logger.error("Error actualizando contacto: %s", e)
             raise
     
-    def delete(self, contact_id: int) -> bool:
+    async def delete(self, contact_id: int) -> bool:
         """
-        Elimina un contacto de BD
+        Elimina un contacto de BD con un único DELETE (sin cargarlo antes)
         """
         try:
-            contact = self.get_by_id(contact_id)
-            if contact:
-                self.db.delete(contact)
-                self.db.commit()
-                logger.info(f"Contacto eliminado: {contact_id}")
+            result = await self.db.execute(delete(Contact).where(Contact.id == contact_id))
+            await self.db.commit()
+            if result.rowcount:
+                logger.info("Contacto eliminado: %s", contact_id)
                 return True
             return False
         except Exception as e:
-            self.db.rollback()
-            logger.error(f"Error eliminando contacto: {e}")
+            await self.db.rollback()
+            logger.error("Error eliminando contacto: %s", e)
             raise
     
-    def add_note(self, contact_id: int, content: str) -> Dict[str, Any]:
+    async def add_note(self, contact_id: int, content: str, commit: bool = True) -> Note:
         """
-        Agrega una nota a un contacto (intenta en Pipedrive si está disponible)
+        Guarda una nota en BD local; el worker de sincronización la envía luego a Pipedrive
+        
+        Args:
+            contact_id: ID local del contacto
+            content: Contenido de la nota
+            commit: Si es False solo hace flush (obtiene el id) y el llamador confirma la transacción
+            
+        Returns:
+            Note creada (status="pending")
         """
         try:
-            # Intentar agregar nota en Pipedrive si hay API key
-            return self.add_note_to_crm(contact_id, content)
+            note = Note(contact_id=contact_id, content=content, status="pending", attempts=0)
+            self.db.add(note)
+            if commit:
+                await self.db.commit()
+            else:
+                await self.db.flush()
+            logger.info("Nota %s guardada para contacto %s", note.id, contact_id)
+            return note
         except Exception as e:
-            logger.warning(f"No se pudo agregar nota en Pipedrive: {e}")
-            # Retornar respuesta mock si falla
-            return {
-                "id": contact_id,
-                "content": content
-            }
+            await self.db.rollback()
+            logger.error("Error guardando nota en BD: %s", e)
+            raise
+    
+    async def add_notes(self, notes: List[Tuple[int, str]], commit: bool = True) -> List[int]:
+        """
+        Guarda varias notas pendientes de enviar a Pipedrive con un INSERT multi-fila y un solo commit
+        
+        Args:
+            notes: Pares (contact_id, contenido)
+            commit: Si es False, el llamador confirma la transacción
+            
+        Returns:
+            IDs de las notas en el mismo orden
+        """
+        if not notes:
+            return []
+        try:
+            result = await self.db.execute(
+                insert(Note).returning(Note.id, sort_by_parameter_order=True),
+                [
+                    {"contact_id": contact_id, "content": content, "status": "pending", "attempts": 0}
+                    for contact_id, content in notes
+                ]
+            )
+            ids = list(result.scalars().all())
+            if commit:
+                await self.db.commit()
+            logger.info("%s notas guardadas (inserción masiva)", len(ids))
+            return ids
+        except Exception as e:
+            await self.db.rollback()
+            logger.error("Error guardando notas en BD: %s", e)
+            raise
     
     # ================== OPERACIONES CON PIPEDRIVE CRM ==================
     
-    def create_in_crm(self, name: str, email: Optional[str] = None, 
+    async def create_in_crm(self, name: str, email: Optional[str] = None, 
                      phone: Optional[str] = None) -> Dict[str, Any]:
         """
         Crea un contacto en Pipedrive
@@ -187,7 +665,6 @@ class ContactRepository:
             }
         
         try:
-            url = f"{self.base_url}/persons?api_token={self.api_key}"
             payload = {
                 "name": name
             }
@@ -197,82 +674,132 @@ class ContactRepository:
             if phone:
                 payload["phone"] = phone
             
-            resp = requests.post(url, json=payload, timeout=10)
+            resp = await self.crm.post("/persons", json=payload, operation="create_in_crm")
             resp.raise_for_status()
             data = resp.json()
             
             if not data.get("success"):
                 raise ValueError(f"Error en Pipedrive: {data.get('error')}")
             
-            logger.info(f"Contacto creado en Pipedrive: {data['data']['id']}")
+            invalidate_person_cache(None, name, email, phone)
+            logger.info("Contacto creado en Pipedrive: %s", data['data']['id'])
             return data["data"]
         
         except Exception as e:
-            logger.error(f"Error creando contacto en Pipedrive: {e}")
+            logger.error("Error creando contacto en Pipedrive: %s", e)
             raise
     
-    def get_by_email_from_crm(self, email: str) -> Optional[Dict[str, Any]]:
+    async def search_in_crm(self, term: str) -> List[Dict[str, Any]]:
         """
-        Busca un contacto por email en Pipedrive
+        Busca personas en Pipedrive con una sola llamada a /persons/search
+        
+        Args:
+            term: Término de búsqueda (nombre, email o teléfono)
+            
+        Returns:
+            Lista de personas (orden de relevancia de Pipedrive), vacía si no hay resultados
         """
         if not self.api_key:
-            logger.info(f"[MOCK] Buscando contacto en Pipedrive por email: {email}")
-            return None
+            logger.info("[MOCK] Buscando contacto en Pipedrive: %s", term)
+            return []
+        
+        cache_key = normalize_query(term)
+        if settings.CRM_CACHE_ENABLED:
+            cached = crm_search_cache.get(cache_key)
+            if cached is not MISSING:
+                logger.debug("Búsqueda en Pipedrive servida desde caché: %s", term)
+                return cached
         
         try:
-            url = f"{self.base_url}/persons/search"
             params = {
-                "term": email,
-                "api_token": self.api_key
+                "term": term
             }
             
-            resp = requests.get(url, params=params, timeout=10)
+            resp = await self.crm.get("/persons/search", params=params, operation="search_in_crm")
             resp.raise_for_status()
             data = resp.json()
             
+            persons = []
             if data.get("success") and data.get("data", {}).get("items"):
-                for item in data["data"]["items"]:
-                    contact = item.get("item", {})
-                    if contact.get("email"):
-                        for email_info in contact["email"]:
-                            if email_info.get("value") == email:
-                                return contact
+                persons = [item.get("item", {}) for item in data["data"]["items"]]
+            
+            if settings.CRM_CACHE_ENABLED:
+                # Caché negativa: las búsquedas sin resultado expiran antes
+                crm_search_cache.set(
+                    cache_key,
+                    persons,
+                    ttl=None if persons else settings.CRM_CACHE_NEGATIVE_TTL
+                )
             
-            return None
+            return persons
         
+        except (CircuitOpenError, RateLimitExceeded) as e:
+            logger.info("Búsqueda en Pipedrive omitida: %s", e)
+            return []
         except Exception as e:
-            logger.error(f"Error buscando contacto en Pipedrive por email: {e}")
-            return None
+            logger.error("Error buscando contacto en Pipedrive: %s", e)
+            return []
     
-    def get_by_name_from_crm(self, name: str) -> Optional[Dict[str, Any]]:
+    async def find_in_crm(self, query: str) -> Optional[Dict[str, Any]]:
         """
-        Busca un contacto por nombre en Pipedrive
+        Busca un contacto en Pipedrive por email, teléfono o nombre
+        Usa un único resultado de /persons/search y prioriza: email exacto > teléfono > nombre
+        """
+        return match_person(await self.search_in_crm(query), query)
+    
+    async def get_changed_persons_from_crm(
+        self, since: datetime, start: int = 0, limit: int = 500
+    ) -> Tuple[List[Dict[str, Any]], List[int], Optional[int]]:
+        """
+        Obtiene una página de personas modificadas en Pipedrive desde `since` (/recents)
+        
+        Args:
+            since: update_time mínimo (UTC)
+            start: Offset de la página
+            limit: Tamaño de página
+            
+        Returns:
+            (personas activas, crm_ids eliminados, start de la página siguiente o None)
         """
         if not self.api_key:
-            logger.info(f"[MOCK] Buscando contacto en Pipedrive por nombre: {name}")
-            return None
+            logger.info("[MOCK] Sincronizando personas desde Pipedrive")
+            return [], [], None
         
         try:
-            url = f"{self.base_url}/persons/search"
             params = {
-                "term": name,
-                "api_token": self.api_key
+                "since_timestamp": since.strftime("%Y-%m-%d %H:%M:%S"),
+                "items": "person",
+                "start": start,
+                "limit": limit
             }
             
-            resp = requests.get(url, params=params, timeout=10)
+            # Sincronización en segundo plano: no se descarta como una búsqueda
+            resp = await self.crm.request(
+                "GET", "/recents", params=params, priority=HIGH, operation="get_changed_persons_from_crm"
+            )
             resp.raise_for_status()
             data = resp.json()
             
-            if data.get("success") and data.get("data", {}).get("items"):
-                return data["data"]["items"][0]["item"]
+            if not data.get("success"):
+                raise ValueError(f"Error en Pipedrive: {data.get('error')}")
             
-            return None
+            persons, deleted = [], []
+            for item in data.get("data") or []:
+                person = item.get("data")
+                if not person or not person.get("active_flag", True):
+                    deleted.append(item.get("id"))
+                else:
+                    persons.append(person)
+            
+            pagination = (data.get("additional_data") or {}).get("pagination") or {}
+            next_start = pagination.get("next_start") if pagination.get("more_items_in_collection") else None
+            return persons, [crm_id for crm_id in deleted if crm_id], next_start
         
         except Exception as e:
-            logger.error(f"Error buscando contacto en Pipedrive por nombre: {e}")
-            return None
+            logger.error("Error obteniendo cambios de Pipedrive: %s", e)
+            raise
     
-    def add_note_to_crm(self, contact_id: int, content: str) -> Dict[str, Any]:
+    async def add_note_to_crm(self, contact_id: int, content: str) -> Dict[str, Any]:
         """
         Agrega una nota a un contacto en Pipedrive
         
@@ -284,7 +811,7 @@ class ContactRepository:
             Dict con datos de la nota creada
         """
         if not self.api_key:
-            logger.warning(f"[MOCK] Agregando nota a contacto {contact_id}")
+            logger.warning("[MOCK] Agregando nota a contacto %s", contact_id)
             return {
                 "id": hash(content) % 100000,
                 "person_id": contact_id,
@@ -292,27 +819,26 @@ class ContactRepository:
             }
         
         try:
-            url = f"{self.base_url}/notes?api_token={self.api_key}"
             payload = {
                 "content": content,
                 "person_id": contact_id
             }
             
-            resp = requests.post(url, json=payload, timeout=10)
+            resp = await self.crm.post("/notes", json=payload, operation="add_note_to_crm")
             resp.raise_for_status()
             data = resp.json()
             
             if not data.get("success"):
                 raise ValueError(f"Error en Pipedrive: {data.get('error')}")
             
-            logger.info(f"Nota agregada a contacto {contact_id}")
+            logger.info("Nota agregada a contacto %s", contact_id)
             return data["data"]
         
         except Exception as e:
-            logger.error(f"Error agregando nota en Pipedrive: {e}")
+            logger.error("Error agregando nota en Pipedrive: %s", e)
             raise
     
-    def update_in_crm(self, contact_id: int, fields: Dict[str, Any]) -> Dict[str, Any]:
+    async def update_in_crm(self, contact_id: int, fields: Dict[str, Any]) -> Dict[str, Any]:
         """
         Actualiza un contacto en Pipedrive
         
@@ -324,25 +850,25 @@ class ContactRepository:
             Dict con datos del contacto actualizado
         """
         if not self.api_key:
-            logger.warning(f"[MOCK] Actualizando contacto {contact_id}")
+            logger.warning("[MOCK] Actualizando contacto %s", contact_id)
             return {"id": contact_id, **fields}
         
         try:
-            url = f"{self.base_url}/persons/{contact_id}?api_token={self.api_key}"
             payload = {
                 **fields
             }
             
-            resp = requests.put(url, json=payload, timeout=10)
+            resp = await self.crm.put(f"/persons/{contact_id}", json=payload, operation="update_in_crm")
             resp.raise_for_status()
             data = resp.json()
             
             if not data.get("success"):
                 raise ValueError(f"Error en Pipedrive: {data.get('error')}")
             
-            logger.info(f"Contacto actualizado en Pipedrive: {contact_id}")
+            invalidate_person_cache(contact_id, fields.get("name"), fields.get("email"), fields.get("phone"))
+            logger.info("Contacto actualizado en Pipedrive: %s", contact_id)
             return data["data"]
         
         except Exception as e:
-            logger.error(f"Error actualizando contacto en Pipedrive: {e}")
+            logger.error("Error actualizando contacto en Pipedrive: %s", e)
             raise
@@ -0,0 +1,106 @@
+"""
+Repository de las claves de idempotencia
+"""
+from typing import Any, Optional
+from datetime import datetime, timedelta
+from sqlalchemy import delete, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
+import logging
+
+from app.models.idempotency_key import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyRepository:
+    """
+    Repositorio de las claves de idempotencia (una fila por scope y clave)
+    """
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def claim(self, scope: str, key: str, fingerprint: str, token: str,
+                    ttl: timedelta, lock_timeout: timedelta) -> Optional[IdempotencyKey]:
+        """
+        Reserva la clave insertando su fila (la clave primaria impide que otro proceso la reserve)
+        Una fila vencida (más vieja que ttl) o una reserva sin respuesta más vieja que lock_timeout
+        se reemplaza: la respuesta se guarda junto con los cambios de la operación, así que una reserva
+        sin respuesta no confirmó nada
+        
+        Returns:
+            None si la clave quedó reservada para este llamador, o la fila existente
+        """
+        for _ in range(2):
+            try:
+                await self.db.execute(insert(IdempotencyKey).values(
+                    scope=scope, key=key, fingerprint=fingerprint, token=token, created_at=datetime.utcnow()
+                ))
+                await self.db.commit()
+                return None
+            except IntegrityError:
+                await self.db.rollback()
+            
+            now = datetime.utcnow()
+            result = await self.db.execute(
+                delete(IdempotencyKey).where(
+                    IdempotencyKey.scope == scope,
+                    IdempotencyKey.key == key,
+                    or_(
+                        IdempotencyKey.created_at < now - ttl,
+                        IdempotencyKey.response.is_(None) & (IdempotencyKey.created_at < now - lock_timeout)
+                    )
+                )
+            )
+            await self.db.commit()
+            if not result.rowcount:
+                break
+            logger.info("Idempotency-Key %s de %s vencida o abandonada, se reserva de nuevo", key, scope)
+        
+        result = await self.db.execute(
+            select(IdempotencyKey).where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+        )
+        return result.scalars().first()
+    
+    async def complete(self, scope: str, key: str, token: str, response: Any) -> bool:
+        """
+        Guarda la respuesta (JSON) de una clave reservada y confirma la transacción,
+        que incluye los cambios pendientes de la operación
+        
+        Returns:
+            False si la reserva ya no es de este llamador (venció y otro la tomó): no se confirma nada
+        """
+        result = await self.db.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.scope == scope, IdempotencyKey.key == key, IdempotencyKey.token == token)
+            .values(response=response)
+        )
+        if result.rowcount != 1:
+            await self.db.rollback()
+            return False
+        await self.db.commit()
+        return True
+    
+    async def release(self, scope: str, key: str, token: str):
+        """
+        Libera una clave reservada cuya operación falló (los errores se pueden reintentar)
+        Descarta los cambios pendientes de la operación
+        """
+        await self.db.rollback()
+        await self.db.execute(
+            delete(IdempotencyKey).where(
+                IdempotencyKey.scope == scope, IdempotencyKey.key == key, IdempotencyKey.token == token
+            )
+        )
+        await self.db.commit()
+    
+    async def purge_expired(self, ttl: timedelta) -> int:
+        """
+        Elimina las claves más antiguas que `ttl`
+        """
+        result = await self.db.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.created_at < datetime.utcnow() - ttl)
+        )
+        await self.db.commit()
+        return result.rowcount or 0
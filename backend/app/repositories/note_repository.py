@@ -0,0 +1,87 @@
+"""
+Repository de notas pendientes de enviar a Pipedrive
+"""
+from typing import Any, Dict, List, Tuple
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+import logging
+
+from app.models.contact import Contact
+from app.models.note import Note
+
+logger = logging.getLogger(__name__)
+
+
+class NoteRepository:
+    """
+    Repositorio para la sincronización de notas con Pipedrive
+    """
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def claim_pending(self, limit: int, lease_seconds: float) -> List[Tuple[Note, int]]:
+        """
+        Toma notas pendientes cuyo contacto ya tiene crm_id
+        Las notas de contactos aún no creados en Pipedrive esperan sin consumir intentos
+        
+        Returns:
+            Lista de (nota, crm_id del contacto)
+        """
+        now = datetime.utcnow()
+        result = await self.db.execute(
+            select(Note, Contact.crm_id)
+            .join(Contact, Contact.id == Note.contact_id)
+            .where(
+                Note.status == "pending",
+                Note.next_attempt_at <= now,
+                Contact.crm_id.isnot(None)
+            )
+            .order_by(Note.id)
+            .limit(limit)
+            .with_for_update(of=Note, skip_locked=True)
+        )
+        claimed = [(note, crm_id) for note, crm_id in result.all()]
+        for note, _ in claimed:
+            note.next_attempt_at = now + timedelta(seconds=lease_seconds)
+        await self.db.commit()
+        return claimed
+    
+    async def get_many(self, note_ids: List[int]) -> List[Note]:
+        result = await self.db.execute(select(Note).where(Note.id.in_(note_ids)))
+        return list(result.scalars().all())
+    
+    @staticmethod
+    def mark_synced(note: Note, crm_note_id: Any):
+        note.status = "synced"
+        note.crm_note_id = crm_note_id
+        note.attempts += 1
+        note.last_error = None
+        note.synced_at = datetime.utcnow()
+    
+    @staticmethod
+    def mark_retry(note: Note, error: str, delay: float, max_attempts: int):
+        """
+        Programa un nuevo intento o marca la nota como fallida si agotó los intentos
+        """
+        note.attempts += 1
+        note.last_error = error[:2000]
+        if note.attempts >= max_attempts:
+            note.status = "failed"
+        else:
+            note.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+    
+    async def stats(self) -> Dict[str, Any]:
+        """
+        Retorna cantidad de notas por estado
+        """
+        result = await self.db.execute(
+            select(Note.status, func.count()).group_by(Note.status)
+        )
+        counts = {status: count for status, count in result.all()}
+        return {
+            "pending": counts.get("pending", 0),
+            "synced": counts.get("synced", 0),
+            "failed": counts.get("failed", 0),
+        }
@@ -0,0 +1,175 @@
+"""
+Repository del outbox de sincronización con el CRM
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+from sqlalchemy import delete, exists, func, select
+from sqlalchemy.orm import aliased
+from sqlalchemy.ext.asyncio import AsyncSession
+import logging
+
+from app.models.outbox import CRMOutbox
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxRepository:
+    """
+    Repositorio para las operaciones pendientes de sincronizar con Pipedrive
+    """
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def enqueue(self, operation: str, contact_id: int,
+                      payload: Optional[Dict[str, Any]] = None, commit: bool = True) -> CRMOutbox:
+        """
+        Registra una operación para el CRM en la transacción actual
+        
+        Args:
+            operation: create_person | update_person | add_note
+            contact_id: ID local del contacto
+            payload: Datos de la operación (campos a actualizar, contenido de la nota...)
+            commit: Si es False, el llamador confirma la transacción junto con su cambio local
+        """
+        entry = CRMOutbox(
+            operation=operation,
+            contact_id=contact_id,
+            payload=payload,
+            status="pending",
+            attempts=0,
+            next_attempt_at=datetime.utcnow()
+        )
+        self.db.add(entry)
+        if commit:
+            await self.db.commit()
+        return entry
+    
+    async def enqueue_many(self, operations: List[Tuple[str, int, Optional[Dict[str, Any]]]],
+                           commit: bool = True) -> List[CRMOutbox]:
+        """
+        Registra varias operaciones para el CRM en la transacción actual
+        
+        Args:
+            operations: Tuplas (operation, contact_id, payload), en el orden en que deben aplicarse
+            commit: Si es False, el llamador confirma la transacción junto con sus cambios locales
+        """
+        now = datetime.utcnow()
+        entries = [
+            CRMOutbox(
+                operation=operation,
+                contact_id=contact_id,
+                payload=payload,
+                status="pending",
+                attempts=0,
+                next_attempt_at=now
+            )
+            for operation, contact_id, payload in operations
+        ]
+        self.db.add_all(entries)
+        if commit:
+            await self.db.commit()
+        return entries
+    
+    async def claim_batch(self, limit: int, lease_seconds: float) -> List[CRMOutbox]:
+        """
+        Toma las operaciones pendientes cuyo próximo intento ya venció
+        - Solo la más antigua pendiente de cada contacto: una operación no se toma mientras otra anterior
+          del mismo contacto siga pendiente (en backoff o en curso en otro worker), así se aplican en orden
+        - En PostgreSQL usa FOR UPDATE SKIP LOCKED para que varios workers no tomen las mismas filas
+        - Corre next_attempt_at `lease_seconds` hacia adelante: si el worker muere, se retoman luego
+        """
+        now = datetime.utcnow()
+        earlier = aliased(CRMOutbox)
+        result = await self.db.execute(
+            select(CRMOutbox)
+            .where(
+                CRMOutbox.status == "pending",
+                CRMOutbox.next_attempt_at <= now,
+                ~exists().where(
+                    earlier.contact_id == CRMOutbox.contact_id,
+                    earlier.status == "pending",
+                    earlier.id < CRMOutbox.id
+                )
+            )
+            .order_by(CRMOutbox.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        entries = list(result.scalars().all())
+        for entry in entries:
+            entry.next_attempt_at = now + timedelta(seconds=lease_seconds)
+        await self.db.commit()
+        return entries
+    
+    async def purge_done(self, older_than: timedelta) -> int:
+        """
+        Elimina las operaciones ya sincronizadas más antiguas que `older_than`
+        """
+        result = await self.db.execute(
+            delete(CRMOutbox).where(
+                CRMOutbox.status == "done",
+                CRMOutbox.processed_at < datetime.utcnow() - older_than
+            )
+        )
+        await self.db.commit()
+        return result.rowcount or 0
+    
+    @staticmethod
+    def mark_done(entry: CRMOutbox):
+        entry.status = "done"
+        entry.attempts += 1
+        entry.last_error = None
+        entry.processed_at = datetime.utcnow()
+    
+    async def has_pending(self, contact_id: int, operation: str) -> bool:
+        """
+        Indica si el contacto tiene una operación `operation` pendiente en el outbox
+        """
+        result = await self.db.scalar(
+            select(exists().where(
+                CRMOutbox.contact_id == contact_id,
+                CRMOutbox.operation == operation,
+                CRMOutbox.status == "pending"
+            ))
+        )
+        return bool(result)
+    
+    @staticmethod
+    def mark_deferred(entry: CRMOutbox, reason: str, delay: float):
+        """
+        Programa un nuevo intento sin consumir uno de los intentos de la operación
+        """
+        entry.last_error = reason[:2000]
+        entry.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+    
+    @staticmethod
+    def mark_retry(entry: CRMOutbox, error: str, delay: float, max_attempts: int):
+        """
+        Programa un nuevo intento o marca la operación como fallida si agotó los intentos
+        """
+        entry.attempts += 1
+        entry.last_error = error[:2000]
+        if entry.attempts >= max_attempts:
+            entry.status = "failed"
+            entry.processed_at = datetime.utcnow()
+        else:
+            entry.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+    
+    async def stats(self) -> Dict[str, Any]:
+        """
+        Retorna cantidad de operaciones por estado y antigüedad de la pendiente más vieja
+        """
+        result = await self.db.execute(
+            select(CRMOutbox.status, func.count()).group_by(CRMOutbox.status)
+        )
+        counts = {status: count for status, count in result.all()}
+        oldest = await self.db.scalar(
+            select(func.min(CRMOutbox.created_at)).where(CRMOutbox.status == "pending")
+        )
+        return {
+            "pending": counts.get("pending", 0),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "oldest_pending_seconds": round((datetime.utcnow() - oldest).total_seconds(), 1) if oldest else None,
+        }
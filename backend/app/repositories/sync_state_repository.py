@@ -0,0 +1,45 @@
+"""
+Repository del estado de los jobs de sincronización con el CRM
+"""
+from typing import Optional
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import logging
+
+from app.models.sync_state import CRMSyncState
+
+logger = logging.getLogger(__name__)
+
+
+class SyncStateRepository:
+    """
+    Repositorio de los cursores de sincronización (una fila por job)
+    """
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def get_cursor(self, name: str) -> Optional[datetime]:
+        """
+        Retorna el cursor guardado del job o None si nunca terminó una sincronización
+        """
+        result = await self.db.execute(select(CRMSyncState.cursor).where(CRMSyncState.name == name))
+        return result.scalar()
+    
+    async def set_cursor(self, name: str, cursor: datetime, commit: bool = True):
+        """
+        Guarda el cursor del job
+        
+        Args:
+            name: Nombre del job
+            cursor: Nuevo cursor (update_time de Pipedrive, UTC)
+            commit: Si es False, el llamador confirma la transacción
+        """
+        state = await self.db.get(CRMSyncState, name)
+        if state is None:
+            self.db.add(CRMSyncState(name=name, cursor=cursor))
+        else:
+            state.cursor = cursor
+        if commit:
+            await self.db.commit()
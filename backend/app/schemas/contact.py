@@ -1,7 +1,7 @@
 """
 Schemas Pydantic para validación de requests/responses
 """
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from pydantic import BaseModel, EmailStr, Field
 
 
@@ -70,8 +70,103 @@ class NoteCreate(BaseModel):
         ]
 
 
+class BulkItemResult(BaseModel):
+    """Resultado de un registro dentro de una operación masiva"""
+    index: int = Field(..., description="Posición del registro en la entrada (desde 0)")
+    status: str = Field(..., description="created | updated | duplicate | not_found | invalid | error")
+    contact_id: Optional[int] = Field(None, description="ID del contacto en BD local")
+    crm_id: Optional[int] = Field(None, description="ID en el CRM")
+    email: Optional[str] = Field(None, description="Email del registro")
+    note_id: Optional[int] = Field(None, description="ID de la nota creada")
+    message: Optional[str] = Field(None, description="Detalle del resultado")
+
+
+class BulkImportResponse(BaseModel):
+    """Schema de respuesta de la importación masiva de contactos"""
+    success: bool = Field(..., description="Indica si la operación fue exitosa")
+    total: int = Field(..., description="Registros recibidos")
+    created: int = Field(..., description="Contactos creados")
+    duplicates: int = Field(..., description="Registros omitidos por email duplicado")
+    failed: int = Field(..., description="Registros con error")
+    results: List[BulkItemResult] = Field(default_factory=list, description="Resultado por registro")
+    correlation_id: str = Field(..., description="ID para rastrear la operación")
+
+
+class ContactBulkUpdate(BaseModel):
+    """Schema para actualizar varios contactos en una sola transacción"""
+    items: List[ContactUpdate] = Field(..., min_length=1, max_length=500, description="Actualizaciones (mismo formato que PATCH /contact)")
+
+
+class NoteBulkCreate(BaseModel):
+    """Schema para crear varias notas en una sola transacción"""
+    items: List[NoteCreate] = Field(..., min_length=1, max_length=500, description="Notas (mismo formato que POST /contact/note)")
+
+
+class BulkOperationResponse(BaseModel):
+    """Schema de respuesta de las actualizaciones y notas masivas"""
+    success: bool = Field(..., description="Indica si todos los registros se aplicaron")
+    total: int = Field(..., description="Registros recibidos")
+    succeeded: int = Field(..., description="Registros aplicados")
+    failed: int = Field(..., description="Registros rechazados")
+    results: List[BulkItemResult] = Field(default_factory=list, description="Resultado por registro")
+    correlation_id: str = Field(..., description="ID para rastrear la operación")
+
+
+class ContactListResponse(BaseModel):
+    """Schema de respuesta del listado paginado de contactos"""
+    items: List[Dict[str, Any]] = Field(default_factory=list, description="Contactos de la página")
+    count: int = Field(..., description="Cantidad de contactos en la página")
+    next_cursor: Optional[int] = Field(None, description="Cursor para la siguiente página (None si no hay más)")
+
+
+class SearchBatchRequest(BaseModel):
+    """Schema para buscar varios contactos en una sola llamada"""
+    queries: List[str] = Field(..., min_length=1, max_length=100, description="Nombres, emails o teléfonos a buscar")
+    
+    class Config:
+        examples = [
+            {
+                "queries": ["falcao@example.com", "+57 300 123 4567", "Juan Pérez"]
+            }
+        ]
+
+
+class SearchBatchItem(BaseModel):
+    """Resultado de una query dentro de la búsqueda en lote"""
+    query: str = Field(..., description="Query recibida")
+    found: bool = Field(..., description="¿Se encontró el contacto?")
+    contact: Optional[Dict[str, Any]] = Field(None, description="Contacto encontrado (mismo formato que /contact/search)")
+
+
+class SearchBatchResponse(BaseModel):
+    """Schema de respuesta de la búsqueda en lote"""
+    total: int = Field(..., description="Queries recibidas")
+    found: int = Field(..., description="Queries con resultado")
+    results: List[SearchBatchItem] = Field(default_factory=list, description="Resultado por query, en el orden recibido")
+    correlation_id: str = Field(..., description="ID para rastrear la operación")
+
+
 class HealthResponse(BaseModel):
     """Schema de respuesta del health check"""
     status: str = Field(..., description="Estado del servicio")
     timestamp: str = Field(..., description="Timestamp ISO")
     crm_configured: bool = Field(..., description="¿CRM está configurado?")
+    db_pool: Optional[Dict[str, Any]] = Field(None, description="Estadísticas del pool de conexiones de BD")
+    crm_cache: Optional[Dict[str, Any]] = Field(None, description="Estadísticas de la caché de búsquedas en el CRM")
+    search_flights: Optional[Dict[str, Any]] = Field(None, description="Búsquedas en curso y búsquedas concurrentes coalescidas")
+    crm_circuit: Optional[Dict[str, Any]] = Field(None, description="Estado del circuit breaker del CRM")
+    crm_rate_limit: Optional[Dict[str, Any]] = Field(None, description="Presupuesto del rate limiter del CRM")
+    crm_sync: Optional[Dict[str, Any]] = Field(None, description="Estado del worker de sincronización con el CRM (sin consultar la BD)")
+    crm_mirror: Optional[Dict[str, Any]] = Field(None, description="Modo de búsqueda y estado de la sincronización del espejo local")
+    idempotency: Optional[Dict[str, Any]] = Field(None, description="Estadísticas del almacén de Idempotency-Key")
+    tracing: Optional[Dict[str, Any]] = Field(None, description="Estadísticas de la exportación de trazas")
+    logging: Optional[Dict[str, Any]] = Field(None, description="Formato, cola y muestreo del logging")
+    db_profiler: Optional[Dict[str, Any]] = Field(None, description="Sentencias SQL perfiladas, consultas lentas y N+1")
+
+
+class SyncStatusResponse(BaseModel):
+    """Schema de respuesta del estado de la sincronización con el CRM (consulta la BD)"""
+    outbox: Dict[str, Any] = Field(..., description="Operaciones del outbox por estado y antigüedad de la pendiente más vieja")
+    notes: Dict[str, Any] = Field(..., description="Notas por estado de sincronización")
+    worker: Dict[str, Any] = Field(..., description="Contadores del worker de sincronización")
+    timestamp: str = Field(..., description="Timestamp ISO")
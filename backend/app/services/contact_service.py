@@ -1,17 +1,69 @@
 """
 Service para contactos (Lógica de negocio)
 """
-from typing import Optional, Dict, Any
-from sqlalchemy.orm import Session
+from typing import Optional, Dict, Any, AsyncIterator, List, Set, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import ValidationError
+import asyncio
+import csv
+import io
+import json
 import logging
 
-from app.repositories.contact_repository import ContactRepository
-from app.schemas.contact import ContactCreate, ContactUpdate, ContactResponse, NoteCreate
-from app.core.security import generate_correlation_id
+from app.core.config import settings
+from app.core.singleflight import SingleFlight
+from app.db.base import SessionLocal
+from app.models.contact import Contact
+from app.repositories.contact_repository import ContactRepository, normalize_query, person_field_values
+from app.repositories.outbox_repository import OutboxRepository
+from app.services.crm_sync_worker import crm_sync_worker
+from app.schemas.contact import (
+    ContactCreate, ContactUpdate, ContactResponse, NoteCreate,
+    BulkItemResult, BulkImportResponse, ContactListResponse,
+    SearchBatchItem, SearchBatchResponse, BulkOperationResponse
+)
+from app.core.security import get_correlation_id
 from fastapi import HTTPException, status
 
 logger = logging.getLogger(__name__)
 
+# Campos del contacto que se guardan en BD local (el resto solo se envía a Pipedrive)
+LOCAL_FIELDS = ("name", "email", "phone")
+
+# Columnas de la exportación CSV (mismas claves que Contact.to_dict)
+EXPORT_FIELDS = ["id", "name", "email", "phone", "crm_id", "created_at", "updated_at"]
+
+# Búsquedas en curso por query normalizada: las idénticas concurrentes comparten resultado
+search_flights = SingleFlight()
+
+
+def local_search_result(contact: Contact, source: str = "local") -> Dict[str, Any]:
+    """
+    Resultado de búsqueda para un contacto de la BD local
+    """
+    return {
+        "id": contact.id,
+        "name": contact.name,
+        "email": contact.email,
+        "phone": contact.phone,
+        "crm_id": contact.crm_id,
+        "source": source
+    }
+
+
+def crm_search_result(crm_contact: Dict[str, Any], local_contact: Optional[Contact] = None) -> Dict[str, Any]:
+    """
+    Resultado de búsqueda para una persona de Pipedrive (con el ID local si existe)
+    """
+    return {
+        "id": local_contact.id if local_contact else crm_contact.get('id'),
+        "name": crm_contact.get('name'),
+        "email": next(iter(person_field_values(crm_contact, 'emails', 'email')), None),
+        "phone": next(iter(person_field_values(crm_contact, 'phones', 'phone')), None),
+        "crm_id": crm_contact.get('id'),
+        "source": "pipedrive"
+    }
+
 
 class ContactService:
     """
@@ -19,14 +71,16 @@ class ContactService:
     Contiene la lógica de negocio y validaciones
     """
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
         self.repository = ContactRepository(db)
+        self.outbox = OutboxRepository(db)
     
-    def search_contact(self, query: str) -> Dict[str, Any]:
+    async def search_contact(self, query: str) -> Dict[str, Any]:
         """
         Busca un contacto por nombre, email o teléfono
-        Primero en Pipedrive, luego en BD local
+        Primero en Pipedrive, luego en BD local (con CRM_SEARCH_MODE=mirror, al revés)
+        Las búsquedas idénticas concurrentes (misma query normalizada) se resuelven con una sola consulta
         
         Args:
             query: String de búsqueda
@@ -34,48 +88,42 @@ class ContactService:
         Returns:
             Dict con datos del contacto o 404
         """
-        correlation_id = generate_correlation_id()
-        logger.info(f"[{correlation_id}] Buscar contacto: {query}")
+        logger.info("Buscar contacto: %s", query)
+        
+        async def fetch() -> Dict[str, Any]:
+            # Sesión propia: la búsqueda compartida no depende de la petición que la inició
+            async with SessionLocal() as db:
+                return await ContactService(db)._search_contact(query)
+        
+        return await search_flights.do(normalize_query(query), fetch)
+    
+    async def _search_contact(self, query: str) -> Dict[str, Any]:
+        """
+        Ejecuta la búsqueda: Pipedrive y, si no hay resultado, BD local
+        """
+        if settings.CRM_SEARCH_MODE == "mirror":
+            return await self._search_mirror(query)
         
         # PRIMERO: Intentar buscar en Pipedrive CRM
+        # Una sola llamada a /persons/search resuelve email exacto, teléfono y nombre
         try:
-            # Buscar por email en CRM
-            crm_contact = self.repository.get_by_email_from_crm(query)
-            
-            # Si no se encuentra, buscar por nombre
-            if not crm_contact:
-                crm_contact = self.repository.get_by_name_from_crm(query)
+            crm_contact = await self.repository.find_in_crm(query)
             
             if crm_contact:
-                logger.info(f"[{correlation_id}] Contacto encontrado en Pipedrive: {crm_contact.get('id')}")
+                logger.info("Contacto encontrado en Pipedrive: %s", crm_contact.get('id'))
                 
                 # Buscar en BD local si existe con ese crm_id
-                local_contact = self.repository.get_by_crm_id(crm_contact.get('id'))
+                local_contact = await self.repository.get_by_crm_id(crm_contact.get('id'))
                 
-                return {
-                    "id": local_contact.id if local_contact else crm_contact.get('id'),
-                    "name": crm_contact.get('name'),
-                    "email": crm_contact.get('emails', [{}])[0].get('value') if crm_contact.get('emails') else None,
-                    "phone": crm_contact.get('phones', [{}])[0].get('value') if crm_contact.get('phones') else None,
-                    "crm_id": crm_contact.get('id'),
-                    "source": "pipedrive"
-                }
+                return crm_search_result(crm_contact, local_contact)
         except Exception as e:
-            logger.warning(f"[{correlation_id}] Error buscando en Pipedrive: {e}")
+            logger.warning("Error buscando en Pipedrive: %s", e)
         
         # FALLBACK: Buscar en BD local PostgreSQL
-        logger.info(f"[{correlation_id}] Buscando en BD local...")
+        logger.info("Buscando en BD local...")
         
-        # Buscar por email exacto
-        contact = self.repository.get_by_email(query)
-        
-        # Si no se encuentra, buscar por nombre parcial
-        if not contact:
-            contact = self.repository.get_by_name(query)
-        
-        # Si no se encuentra, buscar por teléfono
-        if not contact:
-            contact = self.repository.get_by_phone(query)
+        # Una sola consulta: email exacto > teléfono > nombre parcial
+        contact = await self.repository.search_local(query)
         
         if not contact:
             raise HTTPException(
@@ -83,29 +131,154 @@ class ContactService:
                 detail=f"No se encontró contacto con: {query}"
             )
         
-        logger.info(f"[{correlation_id}] Contacto encontrado en BD local: {contact.id}")
+        logger.info("Contacto encontrado en BD local: %s", contact.id)
+        
+        return local_search_result(contact)
+    
+    async def _search_mirror(self, query: str) -> Dict[str, Any]:
+        """
+        Búsqueda en modo espejo: BD local indexada y Pipedrive solo si no hay resultado
+        Lo encontrado en Pipedrive se guarda en el espejo (read-through)
+        """
+        contact = await self.repository.search_local(query)
+        if contact:
+            logger.info("Contacto encontrado en espejo local: %s", contact.id)
+            return local_search_result(contact, source="mirror")
+        
+        logger.info("Sin resultado en espejo local, buscando en Pipedrive...")
+        try:
+            crm_contact = await self.repository.find_in_crm(query)
+            if crm_contact:
+                await self.repository.upsert_from_crm([crm_contact])
+                local_contact = await self.repository.get_by_crm_id(crm_contact.get('id'))
+                logger.info("Contacto encontrado en Pipedrive: %s", crm_contact.get('id'))
+                return crm_search_result(crm_contact, local_contact)
+        except Exception as e:
+            logger.warning("Error buscando en Pipedrive: %s", e)
+        
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No se encontró contacto con: {query}"
+        )
+    
+    async def search_contacts_batch(self, queries: List[str]) -> SearchBatchResponse:
+        """
+        Busca varios contactos en una sola llamada
+        - Aciertos locales: máximo tres consultas (email IN, teléfono IN, nombres en un UNION ALL)
+        - Las queries sin resultado local se buscan en Pipedrive en paralelo (BULK_CRM_CONCURRENCY)
+        - Queries repetidas se resuelven una sola vez
+        
+        Args:
+            queries: Nombres, emails o teléfonos
+            
+        Returns:
+            SearchBatchResponse con un resultado por query, en el orden recibido
+        """
+        correlation_id = get_correlation_id()
+        unique = list(dict.fromkeys(query.strip() for query in queries if query.strip()))
+        logger.info("Búsqueda en lote: %s queries (%s distintas)", len(queries), len(unique))
         
-        return {
-            "id": contact.id,
-            "name": contact.name,
-            "email": contact.email,
-            "phone": contact.phone,
-            "crm_id": contact.crm_id,
-            "source": "local"
+        source = "mirror" if settings.CRM_SEARCH_MODE == "mirror" else "local"
+        local = await self.repository.search_local_many(unique)
+        results: Dict[str, Dict[str, Any]] = {
+            query: local_search_result(contact, source) for query, contact in local.items()
         }
+        
+        misses = [query for query in unique if query not in results]
+        semaphore = asyncio.Semaphore(settings.BULK_CRM_CONCURRENCY)
+        
+        async def find_in_crm(query: str) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                try:
+                    return await self.repository.find_in_crm(query)
+                except Exception as e:
+                    logger.warning("Error buscando en Pipedrive '%s': %s", query, e)
+                    return None
+        
+        crm_contacts = await asyncio.gather(*(find_in_crm(query) for query in misses))
+        crm_hits = {query: person for query, person in zip(misses, crm_contacts) if person}
+        if crm_hits:
+            if settings.CRM_SEARCH_MODE == "mirror":
+                await self.repository.upsert_from_crm(list(crm_hits.values()))
+            by_crm_id = await self.repository.get_many_by_crm_ids(
+                person.get('id') for person in crm_hits.values()
+            )
+            for query, person in crm_hits.items():
+                results[query] = crm_search_result(person, by_crm_id.get(person.get('id')))
+        
+        items = [
+            SearchBatchItem(query=query, found=query.strip() in results, contact=results.get(query.strip()))
+            for query in queries
+        ]
+        found = sum(item.found for item in items)
+        logger.info(
+            "Búsqueda en lote: %s en BD local, %s en Pipedrive, %s sin resultado",
+            len(local), len(crm_hits), len(unique) - len(local) - len(crm_hits)
+        )
+        return SearchBatchResponse(total=len(items), found=found, results=items, correlation_id=correlation_id)
+    
+    async def list_contacts(self, cursor: int = 0, limit: int = 100) -> ContactListResponse:
+        """
+        Lista contactos con paginación keyset
+        
+        Args:
+            cursor: ID del último contacto recibido (0 para empezar)
+            limit: Tamaño de página
+            
+        Returns:
+            ContactListResponse con la página y el cursor siguiente
+        """
+        contacts = await self.repository.get_all(after_id=cursor, limit=limit)
+        return ContactListResponse(
+            items=[contact.to_dict() for contact in contacts],
+            count=len(contacts),
+            next_cursor=contacts[-1].id if len(contacts) == limit else None
+        )
+    
+    async def export_contacts(self, export_format: str = "ndjson") -> AsyncIterator[str]:
+        """
+        Exporta todos los contactos en streaming
+        
+        Args:
+            export_format: "ndjson" (un objeto JSON por línea) o "csv"
+            
+        Yields:
+            Fragmentos de texto listos para enviar al cliente
+        """
+        logger.info("Exportando contactos (%s)", export_format)
+        exported = 0
+        
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            yield buffer.getvalue()
+        
+        async for contact in self.repository.stream_all(batch_size=settings.EXPORT_BATCH_SIZE):
+            if export_format == "csv":
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerow(contact.to_dict())
+                yield buffer.getvalue()
+            else:
+                yield json.dumps(contact.to_dict(), ensure_ascii=False) + "\n"
+            exported += 1
+        
+        logger.info("Exportación finalizada: %s contactos", exported)
     
-    def create_contact(self, contact: ContactCreate) -> ContactResponse:
+    async def create_contact(self, contact: ContactCreate, commit: bool = True) -> ContactResponse:
         """
-        Crea un nuevo contacto en Pipedrive primero, y si falla guarda en BD local PostgreSQL
+        Crea un nuevo contacto en BD local PostgreSQL y encola su creación en Pipedrive
         
         Args:
             contact: Datos del contacto a crear
+            commit: Si es False, el llamador confirma la transacción (y avisa al worker de sincronización)
             
         Returns:
             ContactResponse con resultado de la operación
         """
-        correlation_id = generate_correlation_id()
-        logger.info(f"[{correlation_id}] Crear contacto: {contact.name}")
+        correlation_id = get_correlation_id()
+        logger.info("Crear contacto: %s", contact.name)
         
         # Validar nombre
         if not contact.name or len(contact.name.strip()) < 2:
@@ -116,72 +289,185 @@ class ContactService:
         
         # Verificar duplicados por email en BD local
         if contact.email:
-            existing = self.repository.get_by_email(contact.email)
+            existing = await self.repository.get_by_email(contact.email)
             if existing:
-                logger.warning(f"[{correlation_id}] Email duplicado: {contact.email}")
+                logger.warning("Email duplicado: %s", contact.email)
                 raise HTTPException(
                     status_code=status.HTTP_409_CONFLICT,
                     detail=f"Ya existe un contacto con email {contact.email}. ID: {existing.id}"
                 )
         
-        contact_id = None
-        crm_id = None
-        crm_success = False
-        
         try:
-            # PRIMERO: Intentar crear en Pipedrive CRM
-            logger.info(f"[{correlation_id}] Intentando crear contacto en Pipedrive...")
-            try:
-                crm_result = self.repository.create_in_crm(
-                    name=contact.name,
-                    email=contact.email,
-                    phone=contact.phone
-                )
-                crm_id = crm_result.get("id")
-                crm_success = True
-                logger.info(f"[{correlation_id}] Contacto creado en Pipedrive: CRM_ID={crm_id}")
-            except Exception as crm_err:
-                logger.warning(f"[{correlation_id}] CRM falló, guardando en PostgreSQL: {crm_err}")
-            
-            # FALLBACK: Guardar en BD local PostgreSQL
-            local_contact = self.repository.create_local(
+            # Guardar en BD local y registrar la sincronización en el outbox (misma transacción)
+            local_contact = await self.repository.create_local(
                 name=contact.name,
                 email=contact.email,
                 phone=contact.phone,
-                crm_id=crm_id if crm_success else None
+                commit=False
             )
+            await self.outbox.enqueue("create_person", local_contact.id, commit=commit)
+            if commit:
+                crm_sync_worker.notify()
             
             contact_id = local_contact.id
-            logger.info(f"[{correlation_id}] Contacto guardado en PostgreSQL: ID={contact_id}")
+            logger.info("Contacto guardado en PostgreSQL: ID=%s, sincronización con Pipedrive en cola", contact_id)
             
             return ContactResponse(
                 success=True,
-                message=f"Contacto '{contact.name}' creado exitosamente{'en Pipedrive' if crm_success else ' (guardado en BD local)'}",
+                message=f"Contacto '{contact.name}' creado exitosamente (sincronización con Pipedrive en cola)",
                 contact_id=contact_id,
-                crm_id=crm_id,
-                url=f"https://app.pipedrive.com/person/{crm_id}" if crm_id else None,
                 correlation_id=correlation_id
             )
         
         except Exception as e:
-            logger.error(f"[{correlation_id}] Error creando contacto: {e}")
+            await self.db.rollback()
+            logger.error("Error creando contacto: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_502_BAD_GATEWAY,
                 detail=str(e)
             )
     
-    def add_note_to_contact(self, note: NoteCreate) -> ContactResponse:
+    async def import_contacts(self, rows: AsyncIterator[Any]) -> BulkImportResponse:
         """
-        Agrega una nota a un contacto en Pipedrive primero, y si falla la guarda localmente
+        Importa contactos en bloque
+        - Deduplica emails en memoria y contra la BD con una consulta por lote
+        - Inserta en PostgreSQL con INSERT multi-fila cada BULK_CHUNK_SIZE registros
+        - Encola la creación en Pipedrive en el outbox, en la misma transacción que cada lote
+        
+        Args:
+            rows: Registros (dicts con name, email, phone) en orden de entrada
+            
+        Returns:
+            BulkImportResponse con el resultado de cada registro
+        """
+        correlation_id = get_correlation_id()
+        logger.info("Importación masiva de contactos")
+        
+        results: List[BulkItemResult] = []
+        seen_emails: Set[str] = set()
+        chunk: List[Tuple[int, Any]] = []
+        total = 0
+        
+        async for row in rows:
+            chunk.append((total, row))
+            total += 1
+            if len(chunk) >= settings.BULK_CHUNK_SIZE:
+                results.extend(await self._import_chunk(chunk, seen_emails))
+                chunk = []
+        if chunk:
+            results.extend(await self._import_chunk(chunk, seen_emails))
+        
+        results.sort(key=lambda item: item.index)
+        created = sum(1 for item in results if item.status == "created")
+        duplicates = sum(1 for item in results if item.status == "duplicate")
+        failed = sum(1 for item in results if item.status == "error")
+        logger.info(
+            "Importación finalizada: %s registros, %s creados, %s duplicados, %s con error",
+            total, created, duplicates, failed
+        )
+        
+        return BulkImportResponse(
+            success=failed == 0,
+            total=total,
+            created=created,
+            duplicates=duplicates,
+            failed=failed,
+            results=results,
+            correlation_id=correlation_id
+        )
+    
+    async def _import_chunk(self, chunk: List[Tuple[int, Any]], seen_emails: Set[str]) -> List[BulkItemResult]:
+        """
+        Valida, deduplica y crea un lote de contactos
+        """
+        results: List[BulkItemResult] = []
+        valid: List[Tuple[int, ContactCreate]] = []
+        
+        for index, row in chunk:
+            try:
+                if not isinstance(row, dict):
+                    raise ValueError("El registro debe ser un objeto con name, email y phone")
+                contact = ContactCreate(**row)
+            except (ValidationError, ValueError, TypeError) as e:
+                results.append(BulkItemResult(index=index, status="error", message=str(e)))
+                continue
+            
+            if len(contact.name.strip()) < 2:
+                results.append(BulkItemResult(
+                    index=index, status="error", email=contact.email,
+                    message="El nombre debe tener al menos 2 caracteres"
+                ))
+                continue
+            
+            if contact.email:
+                if contact.email in seen_emails:
+                    results.append(BulkItemResult(
+                        index=index, status="duplicate", email=contact.email,
+                        message="Email repetido en la importación"
+                    ))
+                    continue
+                seen_emails.add(contact.email)
+            
+            valid.append((index, contact))
+        
+        # Duplicados contra BD: una sola consulta por lote
+        existing = await self.repository.get_email_owners(
+            contact.email for _, contact in valid if contact.email
+        )
+        to_create = []
+        for index, contact in valid:
+            if contact.email in existing:
+                results.append(BulkItemResult(
+                    index=index, status="duplicate", email=contact.email,
+                    message=f"Ya existe un contacto con email {contact.email}"
+                ))
+            else:
+                to_create.append((index, contact))
+        
+        # Guardar en BD local y registrar create_person en el outbox en la misma transacción:
+        # el worker crea las personas en Pipedrive con reintentos, sin esperar a Pipedrive aquí
+        async def enqueue_creates(contact_ids: List[int]):
+            await self.outbox.enqueue_many(
+                [("create_person", contact_id, None) for contact_id in contact_ids], commit=False
+            )
+        
+        contact_ids = await self.repository.bulk_create_local(
+            [
+                {"name": contact.name, "email": contact.email, "phone": contact.phone}
+                for _, contact in to_create
+            ],
+            before_commit=enqueue_creates
+        )
+        if any(contact_id is not None for contact_id in contact_ids):
+            crm_sync_worker.notify()
+        
+        for (index, contact), contact_id in zip(to_create, contact_ids):
+            if contact_id is None:
+                results.append(BulkItemResult(
+                    index=index, status="error", email=contact.email,
+                    message="Error de integridad al guardar en BD"
+                ))
+            else:
+                results.append(BulkItemResult(
+                    index=index, status="created", email=contact.email, contact_id=contact_id,
+                    message="Sincronización con Pipedrive en cola"
+                ))
+        
+        return results
+    
+    async def add_note_to_contact(self, note: NoteCreate, commit: bool = True) -> ContactResponse:
+        """
+        Guarda una nota para un contacto y encola su envío a Pipedrive
         
         Args:
             note: Datos de la nota
+            commit: Si es False, el llamador confirma la transacción (y avisa al worker de sincronización)
             
         Returns:
             ContactResponse con resultado de la operación
         """
-        correlation_id = generate_correlation_id()
-        logger.info(f"[{correlation_id}] Crear nota para contacto: {note.contact_id}")
+        correlation_id = get_correlation_id()
+        logger.info("Crear nota para contacto: %s", note.contact_id)
         
         # Validar contenido
         if not note.content or len(note.content.strip()) < 1:
@@ -192,37 +478,24 @@ class ContactService:
         
         try:
             # Obtener el contacto de BD local para conseguir el crm_id
-            contact = self.repository.get_by_id(note.contact_id)
+            contact = await self.repository.get_by_id(note.contact_id)
             if not contact:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail=f"No se encontró el contacto con ID {note.contact_id}"
                 )
             
-            # PRIMERO: Intentar agregar nota en Pipedrive usando crm_id
-            logger.info(f"[{correlation_id}] Intentando agregar nota en Pipedrive...")
-            crm_success = False
-            note_id = None
+            # Guardar la nota localmente; el worker la envía a Pipedrive en lotes
+            saved_note = await self.repository.add_note(contact.id, note.content, commit=commit)
+            if commit:
+                crm_sync_worker.notify()
             
-            if contact.crm_id:
-                try:
-                    result = self.repository.add_note_to_crm(
-                        contact_id=contact.crm_id,  # Usar crm_id en lugar de ID local
-                        content=note.content
-                    )
-                    crm_success = True
-                    note_id = result.get("id")
-                    logger.info(f"[{correlation_id}] Nota agregada en Pipedrive: ID={note_id}")
-                except Exception as crm_err:
-                    logger.warning(f"[{correlation_id}] CRM falló: {crm_err}")
-            else:
-                logger.warning(f"[{correlation_id}] Contacto no tiene crm_id, solo se guarda localmente")
-            
-            logger.info(f"[{correlation_id}] Nota creada para contacto: {note.contact_id}")
+            logger.info("Nota %s guardada para contacto: %s, sincronización con Pipedrive en cola", saved_note.id, note.contact_id)
             
             return ContactResponse(
                 success=True,
-                message=f"Nota agregada al contacto {contact.name}{' en Pipedrive' if crm_success else ' (solo localmente)'}",
+                message=f"Nota agregada al contacto {contact.name} (sincronización con Pipedrive en cola)",
+                note_id=saved_note.id,
                 contact_id=note.contact_id,
                 crm_id=contact.crm_id,
                 url=f"https://app.pipedrive.com/person/{contact.crm_id}" if contact.crm_id else None,
@@ -232,26 +505,75 @@ class ContactService:
         except HTTPException:
             raise
         except Exception as e:
-            logger.error(f"[{correlation_id}] Error creando nota: {e}")
+            await self.db.rollback()
+            logger.error("Error creando nota: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_502_BAD_GATEWAY,
                 detail="Error al agregar la nota"
             )
     
-    def update_contact(self, update: ContactUpdate) -> ContactResponse:
+    async def add_notes_bulk(self, notes: List[NoteCreate], commit: bool = True) -> BulkOperationResponse:
         """
-        Actualiza un contacto en Pipedrive primero, y si falla actualiza en PostgreSQL
+        Guarda varias notas en una sola transacción y encola su envío a Pipedrive
+        Los contactos se validan con una sola consulta; el worker envía las notas en paralelo (NOTES_CONCURRENCY)
         
         Args:
-            update: Datos de actualización
+            notes: Notas a crear
+            commit: Si es False, el llamador confirma la transacción (y avisa al worker de sincronización)
             
         Returns:
-            ContactResponse con resultado de la operación
+            BulkOperationResponse con el resultado por nota
         """
-        correlation_id = generate_correlation_id()
-        logger.info(f"[{correlation_id}] Actualizar contacto: {update.contact_id}")
+        correlation_id = get_correlation_id()
+        logger.info("Crear %s notas en bloque", len(notes))
+        
+        results: List[BulkItemResult] = []
+        try:
+            contacts = await self.repository.get_many(note.contact_id for note in notes)
+            
+            valid = []
+            for index, note in enumerate(notes):
+                contact = contacts.get(note.contact_id)
+                if not note.content.strip():
+                    results.append(BulkItemResult(
+                        index=index, status="invalid", contact_id=note.contact_id,
+                        message="El contenido de la nota no puede estar vacío"
+                    ))
+                elif contact is None:
+                    results.append(BulkItemResult(
+                        index=index, status="not_found", contact_id=note.contact_id,
+                        message=f"No se encontró el contacto con ID {note.contact_id}"
+                    ))
+                else:
+                    valid.append((index, contact, note.content))
+            
+            note_ids = await self.repository.add_notes(
+                [(contact.id, content) for _, contact, content in valid], commit=commit
+            )
+            if note_ids and commit:
+                crm_sync_worker.notify()
+            
+            for (index, contact, _), note_id in zip(valid, note_ids):
+                results.append(BulkItemResult(
+                    index=index, status="created", contact_id=contact.id,
+                    crm_id=contact.crm_id, note_id=note_id
+                ))
+        except Exception as e:
+            await self.db.rollback()
+            logger.error("Error creando notas en bloque: %s", e)
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail="Error al agregar las notas"
+            )
         
-        # Construir fields desde los parámetros
+        logger.info("%s notas guardadas, sincronización con Pipedrive en cola", len(valid))
+        return self._bulk_response(results, len(notes), correlation_id)
+    
+    @staticmethod
+    def _update_fields(update: ContactUpdate) -> Dict[str, Any]:
+        """
+        Campos a actualizar a partir de los parámetros de la petición
+        """
         fields = {}
         if update.name:
             fields["name"] = update.name
@@ -263,6 +585,113 @@ class ContactService:
         # Agregar fields adicionales si se proporcionan
         if update.fields:
             fields.update(update.fields)
+        return fields
+    
+    @staticmethod
+    def _bulk_response(results: List[BulkItemResult], total: int, correlation_id: str) -> BulkOperationResponse:
+        results.sort(key=lambda item: item.index)
+        succeeded = sum(item.status in ("created", "updated") for item in results)
+        return BulkOperationResponse(
+            success=succeeded == total,
+            total=total,
+            succeeded=succeeded,
+            failed=total - succeeded,
+            results=results,
+            correlation_id=correlation_id
+        )
+    
+    async def update_contacts_bulk(self, updates: List[ContactUpdate]) -> BulkOperationResponse:
+        """
+        Actualiza varios contactos en una sola transacción y encola los cambios para Pipedrive
+        - Los contactos y los emails en uso se cargan con una consulta cada uno
+        - Los cambios locales y las entradas del outbox se confirman con un solo commit
+        - El worker aplica los cambios en Pipedrive en paralelo (OUTBOX_CONCURRENCY)
+        
+        Args:
+            updates: Actualizaciones (mismo formato que update_contact)
+            
+        Returns:
+            BulkOperationResponse con el resultado por actualización
+        """
+        correlation_id = get_correlation_id()
+        logger.info("Actualizar %s contactos en bloque", len(updates))
+        
+        results: List[BulkItemResult] = []
+        try:
+            contacts = await self.repository.get_many(update.contact_id for update in updates)
+            email_owners = await self.repository.get_email_owners(
+                update.email for update in updates if update.email
+            )
+            
+            operations = []
+            applied = []
+            for index, update in enumerate(updates):
+                fields = self._update_fields(update)
+                contact = contacts.get(update.contact_id)
+                if not fields:
+                    results.append(BulkItemResult(
+                        index=index, status="invalid", contact_id=update.contact_id,
+                        message="Debe proporcionar al menos un campo para actualizar"
+                    ))
+                    continue
+                if contact is None:
+                    results.append(BulkItemResult(
+                        index=index, status="not_found", contact_id=update.contact_id,
+                        message=f"No se encontró el contacto con ID {update.contact_id}"
+                    ))
+                    continue
+                owner = email_owners.get(update.email) if update.email else None
+                if owner is not None and owner != contact.id:
+                    results.append(BulkItemResult(
+                        index=index, status="duplicate", contact_id=contact.id, email=update.email,
+                        message=f"El email {update.email} ya pertenece a otro contacto"
+                    ))
+                    continue
+                
+                for key, value in fields.items():
+                    if key in LOCAL_FIELDS:
+                        setattr(contact, key, value)
+                if update.email:
+                    # Reservar el email para las siguientes actualizaciones del lote
+                    email_owners[update.email] = contact.id
+                operations.append(("update_person", contact.id, fields))
+                applied.append((index, contact))
+            
+            if operations:
+                await self.outbox.enqueue_many(operations, commit=False)
+                await self.db.commit()
+                crm_sync_worker.notify()
+            
+            for index, contact in applied:
+                results.append(BulkItemResult(
+                    index=index, status="updated", contact_id=contact.id,
+                    crm_id=contact.crm_id, email=contact.email
+                ))
+        except Exception as e:
+            await self.db.rollback()
+            logger.error("Error actualizando contactos en bloque: %s", e)
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail="Error al actualizar los contactos"
+            )
+        
+        logger.info("%s contactos actualizados, sincronización con Pipedrive en cola", len(applied))
+        return self._bulk_response(results, len(updates), correlation_id)
+    
+    async def update_contact(self, update: ContactUpdate) -> ContactResponse:
+        """
+        Actualiza un contacto en PostgreSQL y encola el cambio para Pipedrive
+        
+        Args:
+            update: Datos de actualización
+            
+        Returns:
+            ContactResponse con resultado de la operación
+        """
+        correlation_id = get_correlation_id()
+        logger.info("Actualizar contacto: %s", update.contact_id)
+        
+        fields = self._update_fields(update)
         
         # Validar que hay al menos un campo
         if not fields:
@@ -273,41 +702,24 @@ class ContactService:
         
         try:
             # Obtener el contacto de BD local para conseguir el crm_id
-            contact = self.repository.get_by_id(update.contact_id)
+            contact = await self.repository.get_by_id(update.contact_id)
             if not contact:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail=f"No se encontró el contacto con ID {update.contact_id}"
                 )
             
-            # PRIMERO: Intentar actualizar en Pipedrive usando crm_id
-            logger.info(f"[{correlation_id}] Intentando actualizar contacto en Pipedrive...")
-            crm_success = False
-            
-            if contact.crm_id:
-                try:
-                    crm_result = self.repository.update_in_crm(
-                        contact_id=contact.crm_id,  # Usar crm_id en lugar de ID local
-                        fields=fields
-                    )
-                    crm_success = True
-                    logger.info(f"[{correlation_id}] Contacto actualizado en Pipedrive")
-                except Exception as crm_err:
-                    logger.warning(f"[{correlation_id}] CRM falló: {crm_err}")
-            else:
-                logger.warning(f"[{correlation_id}] Contacto no tiene crm_id, solo se actualiza localmente")
-            
-            # SIEMPRE actualizar en PostgreSQL
-            result = self.repository.update(
-                contact_id=update.contact_id,
-                **fields
-            )
+            # Actualizar en PostgreSQL y encolar el cambio para Pipedrive (misma transacción)
+            local_fields = {key: value for key, value in fields.items() if key in LOCAL_FIELDS}
+            result = await self.repository.update(contact, commit=False, **local_fields)
+            await self.outbox.enqueue("update_person", contact.id, payload=fields)
+            crm_sync_worker.notify()
             
-            logger.info(f"[{correlation_id}] Contacto actualizado: ID={update.contact_id}")
+            logger.info("Contacto actualizado: ID=%s", update.contact_id)
             
             return ContactResponse(
                 success=True,
-                message=f"Contacto {result.name} actualizado{' en Pipedrive' if crm_success else ' (solo localmente)'}",
+                message=f"Contacto {result.name} actualizado (sincronización con Pipedrive en cola)",
                 contact_id=update.contact_id,
                 name=result.name,
                 email=result.email,
@@ -320,7 +732,8 @@ class ContactService:
         except HTTPException:
             raise
         except Exception as e:
-            logger.error(f"[{correlation_id}] Error actualizando contacto: {e}")
+            await self.db.rollback()
+            logger.error("Error actualizando contacto: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_502_BAD_GATEWAY,
                 detail="Error al actualizar el contacto"
@@ -0,0 +1,148 @@
+"""
+Sincronización incremental del espejo local de personas de Pipedrive
+Trae periódicamente las personas modificadas (por update_time, paginado) a la tabla contacts
+"""
+from datetime import datetime
+from typing import Any, Dict, Optional
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.core.crm_client import crm_breaker
+from app.db.base import SessionLocal
+from app.repositories.contact_repository import ContactRepository, invalidate_persons_cache, parse_crm_time
+from app.repositories.sync_state_repository import SyncStateRepository
+
+logger = logging.getLogger(__name__)
+
+# Cursor inicial: la primera sincronización trae todas las personas
+EPOCH = datetime(1970, 1, 1)
+
+# Fila de crm_sync_state con el cursor de este job
+SYNC_STATE_NAME = "persons_mirror"
+
+
+class CRMMirrorSync:
+    """
+    Job periódico que mantiene el espejo local de Pipedrive
+    - El cursor se guarda en crm_sync_state y solo este job lo avanza: el mayor update_time de las
+      páginas de /recents aplicadas, después de aplicar la última página. No se lee de contacts:
+      webhooks y búsquedas también escriben crm_update_time y adelantarían el cursor sobre cambios
+      que el job aún no trajo (ej. los de un webhook perdido)
+    - Cada página se aplica con upsert por crm_id y un solo commit
+    - Las personas eliminadas en Pipedrive se borran del espejo
+    """
+    
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self.runs = 0
+        self.upserted = 0
+        self.deleted = 0
+        self.last_sync_at: Optional[datetime] = None
+        self.last_cursor: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def start(self):
+        """
+        Inicia el job en el event loop actual
+        """
+        if self.running:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="crm-mirror-sync")
+        logger.info("Sincronización del espejo de Pipedrive iniciada")
+    
+    async def stop(self):
+        """
+        Detiene el job esperando a que termine la página en curso
+        """
+        if not self.running:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        logger.info("Sincronización del espejo de Pipedrive detenida")
+    
+    async def _run(self):
+        while not self._stopping:
+            try:
+                if not crm_breaker.is_open:
+                    await self.run_once()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error("Error sincronizando el espejo de Pipedrive: %s", e)
+            
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.CRM_MIRROR_SYNC_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+    
+    async def run_once(self) -> int:
+        """
+        Trae desde Pipedrive todas las personas modificadas desde el último cursor
+        
+        Returns:
+            Número de personas aplicadas (actualizadas, insertadas o eliminadas)
+        """
+        applied = 0
+        async with SessionLocal() as db:
+            repository = ContactRepository(db)
+            sync_state = SyncStateRepository(db)
+            since = await sync_state.get_cursor(SYNC_STATE_NAME) or EPOCH
+            self.last_cursor = since
+            high_water = since
+            
+            start: Optional[int] = 0
+            while start is not None and not self._stopping:
+                persons, deleted, start = await repository.get_changed_persons_from_crm(
+                    since, start=start, limit=settings.CRM_MIRROR_PAGE_SIZE
+                )
+                for person in persons:
+                    update_time = parse_crm_time(person.get("update_time"))
+                    if update_time and update_time > high_water:
+                        high_water = update_time
+                counts = await repository.upsert_from_crm(persons)
+                removed = await repository.delete_by_crm_ids(deleted)
+                if settings.CRM_CACHE_ENABLED:
+                    invalidate_persons_cache([person["id"] for person in persons] + deleted)
+                
+                changed = counts["inserted"] + counts["updated"] + counts["linked"]
+                self.upserted += changed
+                self.deleted += removed
+                applied += changed + removed
+            
+            # Solo con todas las páginas aplicadas: si el job se detuvo a mitad, la próxima vez se repite
+            if start is None and high_water > since:
+                await sync_state.set_cursor(SYNC_STATE_NAME, high_water)
+                self.last_cursor = high_water
+        
+        self.runs += 1
+        self.last_sync_at = datetime.utcnow()
+        if applied:
+            logger.info("Espejo de Pipedrive: %s personas sincronizadas desde %s", applied, since.isoformat())
+        return applied
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "search_mode": settings.CRM_SEARCH_MODE,
+            "running": self.running,
+            "runs": self.runs,
+            "upserted": self.upserted,
+            "deleted": self.deleted,
+            "last_cursor": self.last_cursor.isoformat() if self.last_cursor else None,
+            "last_sync_at": self.last_sync_at.isoformat() if self.last_sync_at else None,
+            "last_error": self.last_error,
+        }
+
+
+# Instancia global, iniciada en el lifespan de la aplicación
+crm_mirror_sync = CRMMirrorSync()
@@ -0,0 +1,303 @@
+"""
+Worker de sincronización con Pipedrive
+Procesa en segundo plano las operaciones registradas en el outbox (crm_outbox)
+y envía las notas pendientes (notes)
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.core.crm_client import crm_breaker
+from app.core.idempotency import idempotency_store
+from app.db.base import SessionLocal
+from app.models.contact import Contact
+from app.models.outbox import CRMOutbox
+from app.repositories.contact_repository import ContactRepository
+from app.repositories.note_repository import NoteRepository
+from app.repositories.outbox_repository import OutboxRepository
+
+logger = logging.getLogger(__name__)
+
+# Cada cuánto se eliminan del outbox las operaciones ya sincronizadas
+PURGE_INTERVAL = timedelta(minutes=10)
+
+
+class CRMIdPending(Exception):
+    """
+    La operación necesita el crm_id del contacto y su create_person sigue pendiente
+    """
+
+
+class CRMSyncWorker:
+    """
+    Worker que drena el outbox por lotes
+    - Las operaciones de un mismo contacto se aplican en orden (create antes que update): cada lote
+      toma solo la más antigua pendiente de cada contacto y la siguiente espera a que esa termine
+    - Contactos distintos se sincronizan en paralelo (OUTBOX_CONCURRENCY)
+    - Las notas se envían en lotes de NOTES_BATCH_SIZE (NOTES_CONCURRENCY POST /notes simultáneos)
+    - Los fallos se reintentan con backoff exponencial hasta OUTBOX_MAX_ATTEMPTS
+    """
+    
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._last_purge = datetime.min
+        self.processed = 0
+        self.retried = 0
+        self.failed = 0
+        self.notes_synced = 0
+        self.notes_failed = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def start(self):
+        """
+        Inicia el loop del worker en el event loop actual
+        """
+        if self.running:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="crm-sync-worker")
+        logger.info("Worker de sincronización CRM iniciado")
+    
+    async def stop(self):
+        """
+        Detiene el worker esperando a que termine el lote en curso
+        """
+        if not self.running:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        logger.info("Worker de sincronización CRM detenido")
+    
+    def notify(self):
+        """
+        Despierta al worker sin esperar al siguiente ciclo de polling
+        """
+        if self._wakeup is not None:
+            self._wakeup.set()
+    
+    async def _run(self):
+        while not self._stopping:
+            backlog = False
+            try:
+                # Con el circuito abierto no se consumen intentos del outbox hasta el half-open
+                if not crm_breaker.is_open:
+                    claimed = await self.run_once()
+                    # Tras el outbox: las notas de contactos recién creados ya tienen crm_id
+                    notes = await self.flush_notes()
+                    # Tras aplicar una operación puede quedar disponible la siguiente del mismo contacto
+                    backlog = claimed > 0 or notes >= settings.NOTES_BATCH_SIZE
+                await self._purge_if_due()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error("Error en worker de sincronización CRM: %s", e)
+            
+            # Quedan operaciones o notas disponibles: seguir sin esperar
+            if backlog or self._stopping:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+    
+    async def run_once(self) -> int:
+        """
+        Toma un lote del outbox y lo sincroniza con Pipedrive
+        
+        Returns:
+            Número de operaciones tomadas
+        """
+        self.last_run_at = datetime.utcnow()
+        async with SessionLocal() as db:
+            entries = await OutboxRepository(db).claim_batch(
+                settings.OUTBOX_BATCH_SIZE,
+                lease_seconds=settings.OUTBOX_LEASE_SECONDS
+            )
+        if not entries:
+            return 0
+        
+        # Una operación por contacto (claim_batch): se aplican en paralelo
+        semaphore = asyncio.Semaphore(settings.OUTBOX_CONCURRENCY)
+        await asyncio.gather(*(self._process_entry(entry.id, semaphore) for entry in entries))
+        logger.info("Outbox: %s operaciones procesadas", len(entries))
+        return len(entries)
+    
+    async def _process_entry(self, entry_id: int, semaphore: asyncio.Semaphore):
+        """
+        Aplica una operación del outbox en su propia transacción
+        Si falla queda pendiente con backoff; las siguientes del contacto no se toman hasta que termine
+        """
+        async with semaphore, SessionLocal() as db:
+            repository = ContactRepository(db)
+            entry = await db.get(CRMOutbox, entry_id)
+            if entry is None or entry.status != "pending":
+                return
+            try:
+                contact = await repository.get_by_id(entry.contact_id)
+                await self._apply(entry, contact, repository)
+                OutboxRepository.mark_done(entry)
+                await db.commit()
+                self.processed += 1
+            except CRMIdPending as e:
+                await db.rollback()
+                await db.refresh(entry)
+                OutboxRepository.mark_deferred(entry, str(e), settings.OUTBOX_RETRY_BASE_DELAY)
+                await db.commit()
+                logger.info("Outbox %s (%s) en espera: %s", entry.id, entry.operation, e)
+            except Exception as e:
+                await db.rollback()
+                await db.refresh(entry)
+                delay = min(
+                    settings.OUTBOX_RETRY_BASE_DELAY * (2 ** entry.attempts),
+                    settings.OUTBOX_RETRY_MAX_DELAY
+                )
+                OutboxRepository.mark_retry(entry, str(e), delay, settings.OUTBOX_MAX_ATTEMPTS)
+                await db.commit()
+                if entry.status == "failed":
+                    self.failed += 1
+                    logger.error(
+                        "Outbox %s (%s) falló definitivamente tras %s intentos: %s",
+                        entry.id, entry.operation, entry.attempts, e
+                    )
+                else:
+                    self.retried += 1
+                    logger.warning(
+                        "Outbox %s (%s) falló, reintento en %.0fs: %s", entry.id, entry.operation, delay, e
+                    )
+    
+    async def _apply(self, entry: CRMOutbox, contact: Optional[Contact], repository: ContactRepository):
+        """
+        Ejecuta una operación del outbox contra Pipedrive
+        """
+        if contact is None:
+            raise ValueError(f"El contacto {entry.contact_id} ya no existe")
+        
+        payload: Dict[str, Any] = entry.payload or {}
+        
+        if entry.operation == "create_person":
+            if contact.crm_id:
+                return
+            # Se envía el estado actual: incluye las actualizaciones posteriores a la creación
+            crm_result = await repository.create_in_crm(
+                name=contact.name,
+                email=contact.email,
+                phone=contact.phone
+            )
+            contact.crm_id = crm_result.get("id")
+            logger.info("Contacto %s sincronizado con Pipedrive: CRM_ID=%s", contact.id, contact.crm_id)
+            return
+        
+        if not contact.crm_id:
+            # Mientras su create_person siga pendiente la operación espera sin consumir intentos;
+            # si la creación ya falló definitivamente, el error cuenta como un intento más
+            if await OutboxRepository(repository.db).has_pending(contact.id, "create_person"):
+                raise CRMIdPending(f"El contacto {contact.id} aún no tiene crm_id (creación pendiente)")
+            raise ValueError(f"El contacto {contact.id} aún no tiene crm_id")
+        
+        if entry.operation == "update_person":
+            await repository.update_in_crm(contact_id=contact.crm_id, fields=payload)
+        elif entry.operation == "add_note":
+            # Notas encoladas antes de existir la tabla notes
+            await repository.add_note_to_crm(contact_id=contact.crm_id, content=payload["content"])
+        else:
+            raise ValueError(f"Operación de outbox desconocida: {entry.operation}")
+    
+    async def flush_notes(self) -> int:
+        """
+        Envía a Pipedrive un lote de notas pendientes
+        Las llamadas HTTP van en paralelo fuera de la transacción; los resultados se guardan con un solo commit
+        
+        Returns:
+            Número de notas tomadas
+        """
+        async with SessionLocal() as db:
+            claimed = await NoteRepository(db).claim_pending(
+                settings.NOTES_BATCH_SIZE,
+                lease_seconds=settings.OUTBOX_LEASE_SECONDS
+            )
+        if not claimed:
+            return 0
+        
+        semaphore = asyncio.Semaphore(settings.NOTES_CONCURRENCY)
+        
+        async def push(note_id: int, crm_id: int, content: str, repository: ContactRepository):
+            async with semaphore:
+                try:
+                    result = await repository.add_note_to_crm(contact_id=crm_id, content=content)
+                    return note_id, result.get("id"), None
+                except Exception as e:
+                    return note_id, None, e
+        
+        async with SessionLocal() as db:
+            repository = ContactRepository(db)
+            outcomes = await asyncio.gather(*(
+                push(note.id, crm_id, note.content, repository) for note, crm_id in claimed
+            ))
+            
+            note_repository = NoteRepository(db)
+            notes = {note.id: note for note in await note_repository.get_many([note_id for note_id, _, _ in outcomes])}
+            for note_id, crm_note_id, error in outcomes:
+                note = notes.get(note_id)
+                if note is None:
+                    continue
+                if error is None:
+                    NoteRepository.mark_synced(note, crm_note_id)
+                    self.notes_synced += 1
+                    continue
+                delay = min(
+                    settings.OUTBOX_RETRY_BASE_DELAY * (2 ** note.attempts),
+                    settings.OUTBOX_RETRY_MAX_DELAY
+                )
+                NoteRepository.mark_retry(note, str(error), delay, settings.OUTBOX_MAX_ATTEMPTS)
+                if note.status == "failed":
+                    self.notes_failed += 1
+                    logger.error("Nota %s no se pudo enviar a Pipedrive tras %s intentos: %s", note.id, note.attempts, error)
+                else:
+                    logger.warning("Nota %s falló, reintento en %.0fs: %s", note.id, delay, error)
+            await db.commit()
+        
+        logger.info("Notas: %s procesadas", len(claimed))
+        return len(claimed)
+    
+    async def _purge_if_due(self):
+        now = datetime.utcnow()
+        if now - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        async with SessionLocal() as db:
+            purged = await OutboxRepository(db).purge_done(
+                timedelta(hours=settings.OUTBOX_RETENTION_HOURS)
+            )
+        if purged:
+            logger.info("Outbox: %s operaciones sincronizadas eliminadas", purged)
+        expired = await idempotency_store.purge_expired()
+        if expired:
+            logger.info("Idempotency-Key: %s claves vencidas eliminadas", expired)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "processed": self.processed,
+            "retried": self.retried,
+            "failed": self.failed,
+            "notes_synced": self.notes_synced,
+            "notes_failed": self.notes_failed,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_error": self.last_error,
+        }
+
+
+# Instancia global, iniciada en el lifespan de la aplicación
+crm_sync_worker = CRMSyncWorker()
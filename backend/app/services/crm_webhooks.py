@@ -0,0 +1,150 @@
+"""
+Aplicación de webhooks de personas de Pipedrive al espejo local
+Los eventos concurrentes se agrupan y se aplican con upserts por lotes (group commit)
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.db.base import SessionLocal
+from app.repositories.contact_repository import (
+    ContactRepository, invalidate_person_cache, invalidate_persons_cache, person_to_row
+)
+
+logger = logging.getLogger(__name__)
+
+# Acciones de webhooks v1 (added/updated/...) y v2 (create/change/delete)
+UPSERT_ACTIONS = {"added", "updated", "merged", "create", "change"}
+DELETE_ACTIONS = {"deleted", "delete"}
+
+# (acción "upsert" | "delete", crm_id, persona)
+PersonEvent = Tuple[str, int, Optional[Dict[str, Any]]]
+
+
+def parse_person_event(payload: Dict[str, Any]) -> Optional[PersonEvent]:
+    """
+    Extrae el evento de persona de un webhook de Pipedrive (v1 o v2)
+    
+    Args:
+        payload: Cuerpo del webhook
+    
+    Returns:
+        (acción, crm_id, persona) o None si el evento no es de una persona o no se reconoce
+    """
+    meta = payload.get("meta") or {}
+    if (meta.get("object") or meta.get("entity")) != "person":
+        return None
+    
+    action = meta.get("action")
+    person = payload.get("current") or payload.get("data")
+    raw_id = meta.get("id") or meta.get("entity_id") or (person or {}).get("id")
+    try:
+        crm_id = int(raw_id)
+    except (TypeError, ValueError):
+        return None
+    
+    if action in DELETE_ACTIONS or (person and person.get("active_flag") is False):
+        return "delete", crm_id, None
+    if action in UPSERT_ACTIONS and person:
+        return "upsert", crm_id, {**person, "id": crm_id}
+    return None
+
+
+class PersonWebhookBatcher:
+    """
+    Agrupa los eventos recibidos en una ventana corta y los aplica juntos
+    - Cada petición espera a que su lote se confirme: Pipedrive solo recibe 200 tras el commit
+      (si falla recibe 500 y reintenta la entrega)
+    - Dentro de un lote gana el último evento de cada crm_id
+    - Tras aplicar, invalida las búsquedas cacheadas de esas personas
+    """
+    
+    def __init__(self):
+        self._pending: List[Tuple[PersonEvent, asyncio.Future]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._full: Optional[asyncio.Event] = None
+        self.events = 0
+        self.batches = 0
+        self.upserted = 0
+        self.deleted = 0
+        self.last_error: Optional[str] = None
+    
+    async def submit(self, event: PersonEvent):
+        """
+        Encola un evento y espera a que su lote quede aplicado
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((event, future))
+        self.events += 1
+        
+        if self._flush_task is None:
+            self._full = asyncio.Event()
+            self._flush_task = asyncio.create_task(self._flush_after_window(self._full))
+        if len(self._pending) >= settings.WEBHOOK_BATCH_SIZE:
+            self._full.set()
+        
+        await future
+    
+    async def _flush_after_window(self, full: asyncio.Event):
+        try:
+            await asyncio.wait_for(full.wait(), timeout=settings.WEBHOOK_BATCH_WINDOW)
+        except asyncio.TimeoutError:
+            pass
+        
+        # Los eventos que lleguen mientras se aplica este lote abren uno nuevo
+        batch, self._pending = self._pending, []
+        self._flush_task = None
+        
+        try:
+            await self._apply([event for event, _ in batch])
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error("Error aplicando %s eventos de webhook de Pipedrive: %s", len(batch), e)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for _, future in batch:
+            if not future.done():
+                future.set_result(None)
+    
+    async def _apply(self, events: List[PersonEvent]):
+        latest: Dict[int, PersonEvent] = {}
+        for event in events:
+            latest[event[1]] = event
+        persons = [person for action, _, person in latest.values() if action == "upsert"]
+        deleted = [crm_id for action, crm_id, _ in latest.values() if action == "delete"]
+        
+        async with SessionLocal() as db:
+            repository = ContactRepository(db)
+            counts = await repository.upsert_from_crm(persons)
+            removed = await repository.delete_by_crm_ids(deleted)
+        
+        if settings.CRM_CACHE_ENABLED:
+            invalidate_persons_cache(latest)
+            for person in persons:
+                row = person_to_row(person)
+                invalidate_person_cache(None, row["name"], row["email"], row["phone"])
+        
+        self.batches += 1
+        self.upserted += counts["inserted"] + counts["updated"] + counts["linked"]
+        self.deleted += removed
+        logger.info(
+            "Webhooks de Pipedrive: %s eventos aplicados (%s upserts, %s eliminaciones)",
+            len(events), len(persons), len(deleted)
+        )
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "events": self.events,
+            "batches": self.batches,
+            "pending": len(self._pending),
+            "upserted": self.upserted,
+            "deleted": self.deleted,
+            "last_error": self.last_error,
+        }
+
+
+# Instancia global compartida por el endpoint de webhooks
+person_webhooks = PersonWebhookBatcher()
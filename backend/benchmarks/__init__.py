@@ -0,0 +1,3 @@
+"""
+Suite de benchmarks de la API (app FastAPI en proceso + Pipedrive simulado + BD local)
+"""
@@ -0,0 +1,223 @@
+"""
+Servidor HTTP que simula la API de Pipedrive para los benchmarks
+Corre en un hilo propio con su event loop: su costo no compite con el de la app medida
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+import asyncio
+import itertools
+import json
+import random
+import threading
+import time
+
+# Prefijo de las rutas, igual que PIPEDRIVE_BASE_URL (https://api.pipedrive.com/v1)
+API_PREFIX = "/v1"
+
+
+class StubConfig:
+    """
+    Comportamiento del Pipedrive simulado
+    - latency / jitter: segundos de espera por petición (jitter uniforme adicional)
+    - error_rate: fracción de respuestas 503
+    - throttle_rate: fracción de respuestas 429 (con Retry-After = retry_after)
+    - rate_limit: valor de x-ratelimit-limit anunciado (Pipedrive: peticiones por ventana de 2s)
+    """
+    
+    def __init__(self, latency: float = 0.05, jitter: float = 0.0, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, retry_after: float = 1.0, rate_limit: int = 10000,
+                 seed: int = 42):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.rate_limit = rate_limit
+        self.seed = seed
+    
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+class PipedriveStub:
+    """
+    Pipedrive en memoria con las rutas que usa ContactRepository
+    (/persons/search, POST /persons, PUT /persons/{id}, POST /notes, /recents)
+    """
+    
+    def __init__(self, config: Optional[StubConfig] = None):
+        self.config = config or StubConfig()
+        self.persons: Dict[int, Dict[str, Any]] = {}
+        self._index: Dict[str, List[int]] = {}
+        self._ids = itertools.count(1)
+        self._note_ids = itertools.count(1)
+        self._random = random.Random(self.config.seed)
+        self.requests: Dict[str, int] = {}
+        self.port: Optional[int] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}{API_PREFIX}"
+    
+    # Datos
+    
+    def add_person(self, name: str, email: Optional[str] = None, phone: Optional[str] = None,
+                   person_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Agrega una persona (formato de /persons) y la indexa para /persons/search
+        """
+        person_id = person_id or next(self._ids)
+        person = {
+            "id": person_id,
+            "name": name,
+            "email": [{"value": email, "primary": True}] if email else [],
+            "phone": [{"value": phone, "primary": True}] if phone else [],
+            "update_time": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()),
+            "active_flag": True,
+        }
+        self.persons[person_id] = person
+        for term in filter(None, (name, email, phone)):
+            self._index.setdefault(term.strip().lower(), []).append(person_id)
+        return person
+    
+    def _search(self, term: str) -> List[Dict[str, Any]]:
+        items = []
+        for person_id in self._index.get(term.strip().lower(), [])[:10]:
+            person = self.persons.get(person_id)
+            if person:
+                items.append({"result_score": 1.0, "item": {
+                    "id": person["id"],
+                    "name": person["name"],
+                    "emails": [value["value"] for value in person["email"]],
+                    "phones": [value["value"] for value in person["phone"]],
+                }})
+        return items
+    
+    def _route(self, method: str, path: str, query: Dict[str, str],
+               body: Optional[Dict[str, Any]]) -> Tuple[int, Dict[str, Any]]:
+        if path == "/persons/search" and method == "GET":
+            return 200, {"success": True, "data": {"items": self._search(query.get("term", ""))}}
+        
+        if path == "/persons" and method == "POST":
+            person = self.add_person(body.get("name", ""), body.get("email"), body.get("phone"))
+            return 201, {"success": True, "data": person}
+        
+        if path.startswith("/persons/") and method == "PUT":
+            try:
+                person = self.persons.get(int(path.rsplit("/", 1)[1]))
+            except ValueError:
+                person = None
+            if person is None:
+                return 404, {"success": False, "error": "Person not found"}
+            person["name"] = body.get("name") or person["name"]
+            return 200, {"success": True, "data": person}
+        
+        if path == "/notes" and method == "POST":
+            note = {"id": next(self._note_ids), "person_id": body.get("person_id"), "content": body.get("content")}
+            return 201, {"success": True, "data": note}
+        
+        if path == "/recents" and method == "GET":
+            return 200, {"success": True, "data": [], "additional_data": {
+                "pagination": {"more_items_in_collection": False}
+            }}
+        
+        return 404, {"success": False, "error": f"Unknown route {method} {path}"}
+    
+    # Servidor HTTP/1.1 mínimo (keep-alive, Content-Length)
+    
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length") or 0)
+                raw_body = await reader.readexactly(length) if length else b""
+                
+                status, payload, extra = await self._respond(method, target, raw_body)
+                body = json.dumps(payload).encode()
+                head = [
+                    f"HTTP/1.1 {status} {'OK' if status < 400 else 'Error'}",
+                    "Content-Type: application/json",
+                    f"Content-Length: {len(body)}",
+                    f"x-ratelimit-limit: {self.config.rate_limit}",
+                    f"x-ratelimit-remaining: {self.config.rate_limit}",
+                    "x-ratelimit-reset: 2",
+                    *(f"{name}: {value}" for name, value in extra.items()),
+                ]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+    
+    async def _respond(self, method: str, target: str,
+                       raw_body: bytes) -> Tuple[int, Dict[str, Any], Dict[str, str]]:
+        config = self.config
+        url = urlsplit(target)
+        path = url.path[len(API_PREFIX):] if url.path.startswith(API_PREFIX) else url.path
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        key = f"{method} {path if not path[-1:].isdigit() else path.rsplit('/', 1)[0] + '/{id}'}"
+        
+        delay = config.latency + (self._random.uniform(0, config.jitter) if config.jitter else 0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        
+        roll = self._random.random()
+        if roll < config.throttle_rate:
+            status, payload = 429, {"success": False, "error": "Rate limit exceeded"}
+            extra = {"Retry-After": str(config.retry_after)}
+        elif roll < config.throttle_rate + config.error_rate:
+            status, payload, extra = 503, {"success": False, "error": "Service unavailable"}, {}
+        else:
+            body = json.loads(raw_body) if raw_body else {}
+            status, payload = self._route(method, path, query, body)
+            extra = {}
+        
+        counter = f"{key} {status}"
+        self.requests[counter] = self.requests.get(counter, 0) + 1
+        return status, payload, extra
+    
+    # Ciclo de vida
+    
+    def start(self):
+        """
+        Inicia el servidor en un hilo propio y espera a que escuche en un puerto libre
+        """
+        ready = threading.Event()
+        
+        def serve():
+            self._loop = asyncio.new_event_loop()
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle, "127.0.0.1", 0)
+            )
+            self.port = self._server.sockets[0].getsockname()[1]
+            ready.set()
+            self._loop.run_forever()
+            self._server.close()
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+        
+        self._thread = threading.Thread(target=serve, name="pipedrive-stub", daemon=True)
+        self._thread.start()
+        ready.wait()
+    
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
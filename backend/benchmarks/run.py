@@ -0,0 +1,332 @@
+"""
+Benchmark de la API contra un Pipedrive simulado y una BD local
+
+Ejecuta la app FastAPI en proceso (ASGI, con su lifespan: outbox, caché, rate limiter...) y mide
+GET /contact/search, POST /contact, PATCH /contact y POST /contact/note con concurrencia fija.
+Reporta req/s y p50/p95/p99 por endpoint y puede guardar o comparar contra un baseline.
+
+Uso (desde backend/):
+    python -m benchmarks.run --concurrency 20 --requests 2000 --output results.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+
+from benchmarks.pipedrive_stub import PipedriveStub, StubConfig
+
+API = "/api/v1/contact"
+ENDPOINTS = ("search", "create", "update", "note")
+
+# Status que no cuentan como error (404 en búsqueda = contacto no encontrado)
+EXPECTED_STATUSES = {"search": ("200", "404")}
+
+# Settings que cambian el resultado; se guardan junto a las métricas para comparar runs
+RELEVANT_SETTINGS = (
+    "CRM_CACHE_ENABLED", "CRM_SEARCH_MODE", "CRM_POOL_SIZE", "CRM_RATE_LIMIT_ENABLED", "CRM_RATE_LIMIT",
+    "CRM_BREAKER_ENABLED", "DB_POOL_MODE", "DB_POOL_SIZE", "DB_MAX_OVERFLOW",
+    "OUTBOX_WORKER_ENABLED", "IDEMPOTENCY_ENABLED", "LOG_LEVEL",
+)
+
+# (método, url, cuerpo JSON)
+Request = Tuple[str, str, Optional[Dict[str, Any]]]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark de la API de contactos")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS),
+                        help="Endpoints a medir, separados por coma (search,create,update,note)")
+    parser.add_argument("--concurrency", type=int, default=20, help="Peticiones simultáneas")
+    parser.add_argument("--requests", type=int, default=2000, help="Peticiones medidas por endpoint")
+    parser.add_argument("--warmup", type=int, default=100, help="Peticiones de calentamiento por endpoint")
+    parser.add_argument("--seed-contacts", type=int, default=1000, help="Contactos precargados en BD y Pipedrive")
+    parser.add_argument("--miss-rate", type=float, default=0.1, help="Fracción de búsquedas sin resultado")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla de los datos y del stub")
+    parser.add_argument("--database-url", default=None,
+                        help="BD a usar (por defecto un SQLite temporal nuevo)")
+    parser.add_argument("--crm-latency", type=float, default=0.05, help="Latencia del stub en segundos")
+    parser.add_argument("--crm-jitter", type=float, default=0.0, help="Jitter uniforme adicional en segundos")
+    parser.add_argument("--crm-error-rate", type=float, default=0.0, help="Fracción de respuestas 503")
+    parser.add_argument("--crm-429-rate", type=float, default=0.0, help="Fracción de respuestas 429")
+    parser.add_argument("--crm-retry-after", type=float, default=1.0, help="Retry-After de las respuestas 429")
+    parser.add_argument("--crm-rate-limit", type=int, default=10000,
+                        help="x-ratelimit-limit del stub y CRM_RATE_LIMIT de la app (si no está en el entorno)")
+    parser.add_argument("--output", default=None, help="Guarda el resultado en este archivo JSON")
+    parser.add_argument("--baseline", default=None, help="Compara contra este resultado JSON")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Variación tolerada frente al baseline (req/s y p95) antes de marcar regresión")
+    return parser.parse_args(argv)
+
+
+def configure_environment(args: argparse.Namespace, stub: PipedriveStub, database_url: str):
+    """
+    Apunta la app al stub y a la BD del benchmark (antes de importar app.*)
+    Las demás variables del entorno (CRM_CACHE_ENABLED, DB_POOL_SIZE, ...) se respetan
+    """
+    os.environ["PIPEDRIVE_BASE_URL"] = stub.base_url
+    os.environ["PIPEDRIVE_API_KEY"] = "benchmark"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["CRM_MIRROR_SYNC_ENABLED"] = "false"
+    os.environ.setdefault("CRM_RATE_LIMIT", str(args.crm_rate_limit))
+    # Los logs INFO por petición a stderr distorsionan la medición
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+def create_sqlite_database(path: str) -> str:
+    """
+    Crea el SQLite temporal en modo WAL (persistente en el archivo): las lecturas no bloquean
+    a la escritura en curso y se reducen los "database is locked" con escrituras concurrentes
+    """
+    with sqlite3.connect(path) as connection:
+        connection.execute("PRAGMA journal_mode=WAL")
+    return f"sqlite:///{path}"
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """
+    Percentil por rango más cercano sobre valores ordenados
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(fraction * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: List[float], statuses: Dict[str, int], elapsed: float,
+              expected: Tuple[str, ...] = ("200",)) -> Dict[str, Any]:
+    values = sorted(latencies)
+    errors = sum(count for status, count in statuses.items() if status not in expected)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "status_codes": dict(sorted(statuses.items())),
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(values) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+        "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+
+class Workload:
+    """
+    Genera las peticiones de cada endpoint de forma determinista (semilla fija)
+    """
+    
+    def __init__(self, contacts: List[Dict[str, Any]], miss_rate: float, seed: int):
+        self.contacts = contacts
+        self.miss_rate = miss_rate
+        self.random = random.Random(seed)
+        self.run_id = f"{seed}-{int(time.time())}"
+    
+    def search(self, i: int) -> Request:
+        if not self.contacts or self.random.random() < self.miss_rate:
+            query = f"missing-{i}@bench.test"
+        else:
+            contact = self.random.choice(self.contacts)
+            query = contact[self.random.choice(("name", "email", "phone"))]
+        return "GET", f"{API}/search?{urlencode({'q': query})}", None
+    
+    def create(self, i: int) -> Request:
+        return "POST", API, {
+            "name": f"Bench New {i}",
+            "email": f"new-{self.run_id}-{i}@bench.test",
+            "phone": f"+57 31{i:08d}",
+        }
+    
+    def update(self, i: int) -> Request:
+        contact = self.random.choice(self.contacts)
+        return "PATCH", API, {"contact_id": contact["id"], "phone": f"+57 32{i:08d}"}
+    
+    def note(self, i: int) -> Request:
+        contact = self.random.choice(self.contacts)
+        return "POST", f"{API}/note", {"contact_id": contact["id"], "content": f"Nota de benchmark {i}"}
+
+
+async def seed_contacts(stub: PipedriveStub, count: int) -> List[Dict[str, Any]]:
+    """
+    Crea las mismas personas en el stub y en la BD local (upsert del espejo)
+    """
+    from sqlalchemy import select
+    from app.db.base import SessionLocal
+    from app.models.contact import Contact
+    from app.repositories.contact_repository import ContactRepository
+    
+    persons = [
+        stub.add_person(f"Bench Person {i}", f"person{i}@bench.test", f"+57 30{i:08d}")
+        for i in range(count)
+    ]
+    async with SessionLocal() as db:
+        repository = ContactRepository(db)
+        for start in range(0, len(persons), 500):
+            await repository.upsert_from_crm(persons[start:start + 500])
+        rows = (await db.execute(
+            select(Contact.id, Contact.name, Contact.email, Contact.phone)
+            .where(Contact.crm_id.in_([person["id"] for person in persons]))
+            .order_by(Contact.id)
+        )).all()
+    return [{"id": row.id, "name": row.name, "email": row.email, "phone": row.phone} for row in rows]
+
+
+async def drive(client, make_request: Callable[[int], Request], total: int, concurrency: int,
+                offset: int = 0, expected: Tuple[str, ...] = ("200",)) -> Dict[str, Any]:
+    """
+    Envía `total` peticiones con `concurrency` workers y mide la latencia de cada una
+    """
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    indexes = itertools.count(offset)
+    end = offset + total
+    
+    async def worker():
+        for i in indexes:
+            if i >= end:
+                return
+            method, url, body = make_request(i)
+            started = time.perf_counter()
+            try:
+                resp = await client.request(method, url, json=body)
+                status = str(resp.status_code)
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, statuses, time.perf_counter() - started, expected)
+
+
+async def run_benchmark(args: argparse.Namespace, stub: PipedriveStub) -> Dict[str, Any]:
+    import httpx
+    from app.core.config import settings
+    from app.main import app
+    
+    endpoints = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        raise SystemExit(f"Endpoints desconocidos: {', '.join(sorted(unknown))}")
+    
+    results: Dict[str, Any] = {}
+    async with app.router.lifespan_context(app):
+        contacts = await seed_contacts(stub, args.seed_contacts)
+        workload = Workload(contacts, args.miss_rate, args.seed)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60) as client:
+            for name in endpoints:
+                make_request = getattr(workload, name)
+                expected = EXPECTED_STATUSES.get(name, ("200",))
+                if args.warmup:
+                    await drive(client, make_request, args.warmup, args.concurrency, offset=args.requests)
+                results[name] = await drive(
+                    client, make_request, args.requests, args.concurrency, expected=expected
+                )
+                print_row(name, results[name])
+    
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": settings.async_database_url.split(":", 1)[0],
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "seed_contacts": args.seed_contacts,
+            "miss_rate": args.miss_rate,
+            "seed": args.seed,
+            "stub": stub.config.as_dict(),
+            "settings": {name: getattr(settings, name) for name in RELEVANT_SETTINGS},
+        },
+        "endpoints": results,
+        "stub_requests": dict(sorted(stub.requests.items())),
+    }
+
+
+def print_row(name: str, result: Dict[str, Any]):
+    print(
+        f"{name:<8} {result['rps']:>9.1f} req/s  p50 {result['p50_ms']:>8.2f} ms  "
+        f"p95 {result['p95_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms  "
+        f"errores {result['errors']}",
+        flush=True
+    )
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> bool:
+    """
+    Imprime la variación frente al baseline
+    
+    Returns:
+        True si algún endpoint empeoró más que la tolerancia (req/s o p95)
+    """
+    regressed = False
+    print(f"\nComparación con baseline ({baseline['meta']['timestamp']}, tolerancia {tolerance:.0%}):")
+    comparable = ("database", "concurrency", "requests", "seed_contacts", "miss_rate", "seed", "stub", "settings")
+    differences = [key for key in comparable if result["meta"].get(key) != baseline["meta"].get(key)]
+    if differences:
+        print(f"AVISO: configuración distinta a la del baseline ({', '.join(differences)})")
+    for name, current in result["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(name)
+        if not base:
+            print(f"{name:<8} sin datos en el baseline")
+            continue
+        rps_delta = (current["rps"] - base["rps"]) / base["rps"] if base["rps"] else 0.0
+        p95_delta = (current["p95_ms"] - base["p95_ms"]) / base["p95_ms"] if base["p95_ms"] else 0.0
+        worse = rps_delta < -tolerance or p95_delta > tolerance
+        regressed = regressed or worse
+        print(
+            f"{name:<8} req/s {base['rps']:>9.1f} -> {current['rps']:>9.1f} ({rps_delta:+.1%})  "
+            f"p95 {base['p95_ms']:>8.2f} -> {current['p95_ms']:>8.2f} ms ({p95_delta:+.1%})"
+            f"{'  REGRESIÓN' if worse else ''}"
+        )
+    return regressed
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    stub = PipedriveStub(StubConfig(
+        latency=args.crm_latency,
+        jitter=args.crm_jitter,
+        error_rate=args.crm_error_rate,
+        throttle_rate=args.crm_429_rate,
+        retry_after=args.crm_retry_after,
+        rate_limit=args.crm_rate_limit,
+        seed=args.seed,
+    ))
+    stub.start()
+    
+    with tempfile.TemporaryDirectory(prefix="crm-bench-") as tmp:
+        database_url = args.database_url or create_sqlite_database(os.path.join(tmp, "benchmark.db"))
+        configure_environment(args, stub, database_url)
+        try:
+            result = asyncio.run(run_benchmark(args, stub))
+        finally:
+            stub.stop()
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResultado guardado en {args.output}")
+    
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(result, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
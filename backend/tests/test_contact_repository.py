@@ -0,0 +1,115 @@
+"""
+Sentencias SQL por operación de ContactRepository (create_local, update, delete)
+Cuenta las sentencias con before_cursor_execute sobre un engine aiosqlite en memoria
+"""
+from typing import List
+import asyncio
+import os
+
+# El engine global de la app no se usa en estas pruebas; evita depender de PostgreSQL al importarla
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.db.base import Base
+from app.repositories.contact_repository import UNNAMED_PERSON, ContactRepository
+
+
+class StatementCounter:
+    """
+    Sentencias enviadas al driver mientras está activo
+    """
+    
+    def __init__(self):
+        self.statements: List[str] = []
+        self.active = False
+    
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active:
+            self.statements.append(statement)
+
+
+@pytest.fixture
+def db():
+    """
+    Sesión sobre una BD SQLite en memoria con las tablas creadas y un contador de sentencias
+    """
+    loop = asyncio.new_event_loop()
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    counter = StatementCounter()
+    event.listen(engine.sync_engine, "before_cursor_execute", counter)
+    
+    async def setup() -> AsyncSession:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        return async_sessionmaker(engine, expire_on_commit=False)()
+    
+    session = loop.run_until_complete(setup())
+    yield loop, session, counter
+    loop.run_until_complete(session.close())
+    loop.run_until_complete(engine.dispose())
+    loop.close()
+
+
+def count_statements(loop, counter: StatementCounter, operation) -> List[str]:
+    counter.statements.clear()
+    counter.active = True
+    try:
+        loop.run_until_complete(operation)
+    finally:
+        counter.active = False
+    return list(counter.statements)
+
+
+def test_create_local_uses_one_statement(db):
+    loop, session, counter = db
+    repository = ContactRepository(session)
+    
+    statements = count_statements(loop, counter, repository.create_local(
+        name="Ana Gómez", email="ana@example.com", phone="+57 315 222 3344"
+    ))
+    
+    assert len(statements) == 1, statements
+    assert statements[0].lstrip().upper().startswith("INSERT")
+
+
+def test_update_loaded_contact_uses_one_statement(db):
+    loop, session, counter = db
+    repository = ContactRepository(session)
+    contact = loop.run_until_complete(repository.create_local(name="Ana Gómez", email="ana@example.com"))
+    
+    statements = count_statements(loop, counter, repository.update(contact, phone="+57 311 999 0000"))
+    
+    assert len(statements) == 1, statements
+    assert statements[0].lstrip().upper().startswith("UPDATE")
+    assert contact.phone == "+57 311 999 0000"
+
+
+def test_delete_uses_one_statement(db):
+    loop, session, counter = db
+    repository = ContactRepository(session)
+    contact = loop.run_until_complete(repository.create_local(name="Ana Gómez"))
+    
+    statements = count_statements(loop, counter, repository.delete(contact.id))
+    
+    assert len(statements) == 1, statements
+    assert statements[0].lstrip().upper().startswith("DELETE")
+    assert loop.run_until_complete(repository.get_by_id(contact.id)) is None
+
+
+def test_upsert_from_crm_keeps_batch_when_a_person_has_no_name(db):
+    loop, session, counter = db
+    repository = ContactRepository(session)
+    
+    counts = loop.run_until_complete(repository.upsert_from_crm([
+        {"id": 101, "name": None, "email": [{"value": "sin.nombre@example.com", "primary": True}]},
+        {"id": 102, "name": "Carlos Martín"},
+    ]))
+    
+    assert counts["inserted"] == 2
+    unnamed = loop.run_until_complete(repository.get_by_email("sin.nombre@example.com"))
+    assert unnamed.crm_id == 101
+    assert unnamed.name == UNNAMED_PERSON
@@ -0,0 +1,138 @@
+"""
+IdempotencyStore con las claves en la BD: dos almacenes sobre la misma BD simulan dos procesos (workers)
+"""
+import asyncio
+import os
+
+# El engine global de la app no se usa en estas pruebas; evita depender de PostgreSQL al importarla
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.core.idempotency import IdempotencyConflict, IdempotencyInProgress, IdempotencyStore
+from app.db.base import Base
+from app.models.contact import Contact
+from app.repositories.contact_repository import ContactRepository
+
+
+@pytest.fixture
+def stores():
+    """
+    Dos almacenes (dos procesos) que comparten una BD SQLite en memoria
+    """
+    loop = asyncio.new_event_loop()
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    
+    loop.run_until_complete(setup())
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    yield loop, session_factory
+    loop.run_until_complete(engine.dispose())
+    loop.close()
+
+
+def test_other_process_replays_stored_response(stores):
+    loop, session_factory = stores
+    first, second = IdempotencyStore(session_factory=session_factory), IdempotencyStore(session_factory=session_factory)
+    calls = []
+    
+    async def create(db):
+        calls.append(db)
+        return {"contact_id": len(calls)}
+    
+    assert loop.run_until_complete(first.run("POST /contact", "k1", "f1", create)) == ({"contact_id": 1}, False)
+    assert loop.run_until_complete(second.run("POST /contact", "k1", "f1", create)) == ({"contact_id": 1}, True)
+    assert len(calls) == 1
+    
+    with pytest.raises(IdempotencyConflict):
+        loop.run_until_complete(second.run("POST /contact", "k1", "f2", create))
+
+
+def test_key_in_progress_in_other_process_is_rejected(stores):
+    loop, session_factory = stores
+    first, second = IdempotencyStore(session_factory=session_factory), IdempotencyStore(session_factory=session_factory)
+    release = asyncio.Event()
+    
+    async def slow_create(db):
+        await release.wait()
+        return {"contact_id": 1}
+    
+    async def scenario():
+        original = asyncio.ensure_future(first.run("POST /contact", "k1", "f1", slow_create))
+        await asyncio.sleep(0.05)
+        with pytest.raises(IdempotencyInProgress):
+            await second.run("POST /contact", "k1", "f1", slow_create)
+        release.set()
+        return await original
+    
+    assert loop.run_until_complete(scenario()) == ({"contact_id": 1}, False)
+
+
+def test_failed_operation_releases_the_key(stores):
+    loop, session_factory = stores
+    first, second = IdempotencyStore(session_factory=session_factory), IdempotencyStore(session_factory=session_factory)
+    
+    async def failing(db):
+        raise RuntimeError("Pipedrive no disponible")
+    
+    async def create(db):
+        return {"contact_id": 1}
+    
+    with pytest.raises(RuntimeError):
+        loop.run_until_complete(first.run("POST /contact", "k1", "f1", failing))
+    assert loop.run_until_complete(second.run("POST /contact", "k1", "f1", create)) == ({"contact_id": 1}, False)
+
+
+def count_contacts(loop, session_factory) -> int:
+    async def count():
+        async with session_factory() as db:
+            return await db.scalar(select(func.count()).select_from(Contact))
+    return loop.run_until_complete(count())
+
+
+def test_failed_operation_commits_nothing(stores):
+    loop, session_factory = stores
+    store = IdempotencyStore(session_factory=session_factory)
+    
+    async def create_then_fail(db):
+        await ContactRepository(db).create_local(name="Ana Gómez", email="ana@example.com", commit=False)
+        raise RuntimeError("Error armando la respuesta")
+    
+    with pytest.raises(RuntimeError):
+        loop.run_until_complete(store.run("POST /contact", "k1", "f1", create_then_fail))
+    assert count_contacts(loop, session_factory) == 0
+
+
+def test_operation_slower_than_the_lock_does_not_duplicate(stores):
+    loop, session_factory = stores
+    slow = IdempotencyStore(lock_seconds=0.01, session_factory=session_factory)
+    retry = IdempotencyStore(lock_seconds=0.01, session_factory=session_factory)
+    release = asyncio.Event()
+    
+    async def slow_create(db):
+        await release.wait()
+        contact = await ContactRepository(db).create_local(name="Ana Gómez", commit=False)
+        return {"contact_id": contact.id}
+    
+    async def create(db):
+        contact = await ContactRepository(db).create_local(name="Ana Gómez", commit=False)
+        return {"contact_id": contact.id}
+    
+    async def scenario():
+        original = asyncio.ensure_future(slow.run("POST /contact", "k1", "f1", slow_create))
+        await asyncio.sleep(0.05)
+        # La reserva del original venció: el reintento la toma y crea el contacto
+        retried = await retry.run("POST /contact", "k1", "f1", create)
+        release.set()
+        with pytest.raises(IdempotencyInProgress):
+            await original
+        return retried
+    
+    assert loop.run_until_complete(scenario()) == ({"contact_id": 1}, False)
+    assert count_contacts(loop, session_factory) == 1
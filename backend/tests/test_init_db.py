@@ -0,0 +1,61 @@
+"""
+Backfill de phone_normalized en el arranque (_backfill_phone_normalized) sobre un engine aiosqlite en memoria
+"""
+from typing import List
+import asyncio
+import os
+
+# El engine global de la app no se usa en estas pruebas; evita depender de PostgreSQL al importarla
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from sqlalchemy import event, insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.db.base import Base, _backfill_phone_normalized
+from app.models.contact import Contact
+import app.models.sync_state  # noqa: F401  (tabla crm_sync_state)
+
+
+def test_phone_backfill_runs_once_in_pages():
+    loop = asyncio.new_event_loop()
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    statements: List[str] = []
+    
+    async def scenario():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            # Filas de antes de existir la columna: phone_normalized en NULL
+            await conn.execute(insert(Contact.__table__), [
+                {"name": "Ana", "phone": "+57 315 222 3344"},
+                {"name": "Luis", "phone": "sin teléfono"},
+                {"name": "Eva", "phone": None},
+                {"name": "Juan", "phone": "(315) 222-3345"},
+            ])
+        
+        event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        async with engine.begin() as conn:
+            await conn.run_sync(_backfill_phone_normalized, 2)
+        first_run = len(statements)
+        async with engine.begin() as conn:
+            await conn.run_sync(_backfill_phone_normalized, 2)
+        second_run = len(statements) - first_run
+        async with engine.begin() as conn:
+            rows = (await conn.execute(
+                select(Contact.name, Contact.phone_normalized).order_by(Contact.id)
+            )).all()
+        await engine.dispose()
+        return first_run, second_run, rows
+    
+    try:
+        first_run, second_run, rows = loop.run_until_complete(scenario())
+    finally:
+        loop.close()
+    
+    assert [tuple(row) for row in rows] == [
+        ("Ana", "+573152223344"), ("Luis", None), ("Eva", None), ("Juan", "+573152223345")
+    ]
+    # Páginas de 2 filas con teléfono: dos SELECT con datos y uno vacío
+    assert sum("FROM contacts" in statement for statement in statements[:first_run]) == 3
+    # El segundo arranque solo consulta la marca en crm_sync_state
+    assert second_run == 1, statements[first_run:]
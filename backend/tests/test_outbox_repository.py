@@ -0,0 +1,71 @@
+"""
+Orden por contacto de OutboxRepository.claim_batch sobre un engine aiosqlite en memoria
+"""
+from datetime import datetime, timedelta
+import asyncio
+import os
+
+# El engine global de la app no se usa en estas pruebas; evita depender de PostgreSQL al importarla
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.db.base import Base
+from app.repositories.contact_repository import ContactRepository
+from app.repositories.outbox_repository import OutboxRepository
+
+
+@pytest.fixture
+def db():
+    """
+    Sesión sobre una BD SQLite en memoria con las tablas creadas
+    """
+    loop = asyncio.new_event_loop()
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    
+    async def setup() -> AsyncSession:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        return async_sessionmaker(engine, expire_on_commit=False)()
+    
+    session = loop.run_until_complete(setup())
+    yield loop, session
+    loop.run_until_complete(session.close())
+    loop.run_until_complete(engine.dispose())
+    loop.close()
+
+
+def test_claim_batch_holds_later_entries_while_an_earlier_one_backs_off(db):
+    loop, session = db
+    contacts = ContactRepository(session)
+    outbox = OutboxRepository(session)
+    
+    async def scenario():
+        first = await contacts.create_local(name="Ana Gómez", email="ana@example.com")
+        second = await contacts.create_local(name="Luis Pérez", email="luis@example.com")
+        earlier, later, other = await outbox.enqueue_many([
+            ("update_person", first.id, {"name": "Ana G."}),
+            ("update_person", first.id, {"name": "Ana Gómez R."}),
+            ("update_person", second.id, {"name": "Luis P."}),
+        ])
+        
+        # El primer intento falla con un backoff más largo que el lease
+        claimed = await outbox.claim_batch(limit=10, lease_seconds=60)
+        assert [entry.id for entry in claimed] == [earlier.id, other.id]
+        OutboxRepository.mark_retry(earlier, "Pipedrive no disponible", 300, max_attempts=8)
+        OutboxRepository.mark_done(other)
+        await session.commit()
+        
+        # Vencido el lease, la operación posterior del contacto sigue esperando a la anterior
+        later.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        await session.commit()
+        assert await outbox.claim_batch(limit=10, lease_seconds=60) == []
+        
+        OutboxRepository.mark_done(earlier)
+        await session.commit()
+        claimed = await outbox.claim_batch(limit=10, lease_seconds=60)
+        assert [entry.id for entry in claimed] == [later.id]
+    
+    loop.run_until_complete(scenario())